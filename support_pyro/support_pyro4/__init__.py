@@ -1,3 +1,11 @@
-from .pyro4_server import *
+import logging
+
+module_logger = logging.getLogger(__name__)
+
+try:
+    from .pyro4_server import *
+except ImportError as err:
+    module_logger.error("support_pyro4: can't import pyro4_server: {}".format(err))
 from .pyro4_client import *
 from .util import *
+from .async_util import *
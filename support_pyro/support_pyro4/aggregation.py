@@ -0,0 +1,227 @@
+"""
+Subscriber-side aggregation of incoming samples.
+
+Keeping samples as a list of dicts costs a Python object per value, and
+every statistic over them is a Python loop. ColumnBuffer instead keeps the
+most recent samples in preallocated numpy arrays, one per field, used as a
+ring buffer, so memory stays fixed however long a subscriber runs, and
+window statistics are vectorized:
+
+.. code-block:: python
+
+    buffer = ColumnBuffer(["temperature", "pressure"], capacity=100000)
+
+    class Subscriber(Pyro4Subscriber):
+        def consume(self, data):
+            buffer.consume(data)
+
+    buffer.stats(seconds=10.0)["temperature"]["p99"]
+
+numpy is needed for ColumnBuffer, but not to import this module.
+"""
+import threading
+
+from .pubsub_util import monotonic
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = [
+    "ColumnBuffer"
+]
+
+
+class ColumnBuffer(object):
+    """
+    Thread-safe ring buffer of samples, stored column-wise.
+
+    Each sample gets a timestamp: the value of its time_field, if there is
+    one, or else the time it was added (``monotonic``). Windows of "the last
+    N seconds" are measured back from the newest sample's timestamp, so
+    timestamps should never decrease.
+
+    Attributes:
+        fields (list): names of the fields kept
+        capacity (int): max number of samples kept
+        time_field (str): field samples are timestamped with, if any
+    """
+    def __init__(self, fields, capacity=10000, dtype="f8", time_field=None):
+        """
+        Args:
+            fields (list): field names, or (name, dtype) pairs
+            capacity (int, optional): number of samples to keep (10000)
+            dtype (str, optional): dtype of fields given by name only ("f8")
+            time_field (str, optional): field to use as each sample's
+                timestamp, instead of the time it's added
+        """
+        if numpy is None:
+            raise ImportError("ColumnBuffer needs numpy")
+        fields = [field if isinstance(field, (list, tuple)) else (field, dtype)
+                  for field in fields]
+        self.fields = [name for name, field_dtype in fields]
+        self.capacity = capacity
+        self.time_field = time_field
+        self._columns = dict((name, numpy.zeros(capacity, dtype=field_dtype))
+                             for name, field_dtype in fields)
+        self._times = numpy.zeros(capacity, dtype="f8")
+        self._head = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_schema(cls, schema, capacity=10000, time_field=None):
+        """
+        Create a buffer with a column for each field of a
+        serializers.RecordSchema, of the same type.
+        """
+        if numpy is None:
+            raise ImportError("ColumnBuffer needs numpy")
+        return cls(schema.dtype.descr, capacity=capacity, time_field=time_field)
+
+    def __len__(self):
+        with self._lock:
+            return self._count
+
+    def append(self, sample, timestamp=None):
+        """
+        Args:
+            sample (dict): field name -> value. Other keys are ignored.
+            timestamp (float, optional): defaults to sample[time_field], or
+                monotonic()
+        """
+        if timestamp is None:
+            timestamp = sample[self.time_field] if self.time_field else monotonic()
+        with self._lock:
+            i = self._head
+            for name in self.fields:
+                self._columns[name][i] = sample[name]
+            self._times[i] = timestamp
+            self._head = (i + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def extend(self, columns, timestamps=None):
+        """
+        Add many samples at once.
+
+        Args:
+            columns (dict): field name -> sequence of values, one per sample
+            timestamps (sequence, optional): defaults to columns[time_field],
+                or the current time for every sample.
+        """
+        if timestamps is None and self.time_field:
+            timestamps = columns[self.time_field]
+        n = len(columns[self.fields[0]])
+        if timestamps is None:
+            timestamps = numpy.full(n, monotonic())
+        # only the newest capacity samples would survive anyway
+        skip = max(n - self.capacity, 0)
+        with self._lock:
+            start = self._head
+            end = start + n - skip
+            first = min(end, self.capacity) - start
+            for name in self.fields + [None]:
+                if name is None:
+                    target, values = self._times, numpy.asarray(timestamps)[skip:]
+                else:
+                    target, values = self._columns[name], numpy.asarray(columns[name])[skip:]
+                target[start:start + first] = values[:first]
+                target[:end - start - first] = values[first:]
+            self._head = end % self.capacity
+            self._count = min(self._count + n - skip, self.capacity)
+
+    def consume(self, data):
+        """
+        Add a sample, or a batch of samples (see pubsub_util.make_batch),
+        so that the buffer can be used as a consume callback directly.
+        """
+        if isinstance(data, dict) and "n" in data and "columns" in data:
+            if data["n"]:
+                self.extend(data["columns"])
+        elif isinstance(data, dict) and "n" in data and "rows" in data:
+            for sample in data["rows"]:
+                self.append(sample)
+        else:
+            self.append(data)
+
+    def _indexes(self, seconds, n):
+        count = self._count
+        if n is not None:
+            count = min(count, n)
+        indexes = (self._head - count + numpy.arange(count)) % self.capacity
+        if seconds is not None and count:
+            times = self._times[indexes]
+            start = numpy.searchsorted(times, times[-1] - seconds, side="left")
+            indexes = indexes[start:]
+        return indexes
+
+    def window(self, seconds=None, n=None):
+        """
+        Get the most recent samples, oldest first. The arrays are copies, so
+        they can be handed to a plotting library while samples keep coming.
+
+        Args:
+            seconds (float, optional): only samples at most this many seconds
+                older than the newest
+            n (int, optional): at most this many samples
+        Returns:
+            dict: field name -> numpy array, plus "time"
+        """
+        with self._lock:
+            indexes = self._indexes(seconds, n)
+            window = dict((name, self._columns[name][indexes]) for name in self.fields)
+            window["time"] = self._times[indexes]
+        return window
+
+    snapshot = window
+
+    def stats(self, seconds=None, n=None, percentiles=(50, 90, 99)):
+        """
+        Summarize a window (see ``window``).
+
+        Returns:
+            dict: "n", the number of samples in the window, and for each
+                field a dict with "mean", "min", "max" and "p<q>" for each
+                of percentiles. Values are None if the window is empty.
+        """
+        window = self.window(seconds=seconds, n=n)
+        count = len(window["time"])
+        stats = {"n": count}
+        for name in self.fields:
+            values = window[name]
+            field_stats = {"mean": None, "min": None, "max": None}
+            field_stats.update(("p{}".format(q), None) for q in percentiles)
+            if count:
+                field_stats["mean"] = float(values.mean())
+                field_stats["min"] = float(values.min())
+                field_stats["max"] = float(values.max())
+                for q, value in zip(percentiles, numpy.percentile(values, percentiles)):
+                    field_stats["p{}".format(q)] = float(value)
+            stats[name] = field_stats
+        return stats
+
+    def _column(self, field, seconds, n):
+        with self._lock:
+            return self._columns[field][self._indexes(seconds, n)]
+
+    def mean(self, field, seconds=None, n=None):
+        values = self._column(field, seconds, n)
+        return float(values.mean()) if len(values) else None
+
+    def min(self, field, seconds=None, n=None):
+        values = self._column(field, seconds, n)
+        return float(values.min()) if len(values) else None
+
+    def max(self, field, seconds=None, n=None):
+        values = self._column(field, seconds, n)
+        return float(values.max()) if len(values) else None
+
+    def percentile(self, field, q, seconds=None, n=None):
+        values = self._column(field, seconds, n)
+        return float(numpy.percentile(values, q)) if len(values) else None
+
+    def clear(self):
+        with self._lock:
+            self._head = 0
+            self._count = 0
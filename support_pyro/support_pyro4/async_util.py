@@ -0,0 +1,216 @@
+import asyncio
+import logging
+
+__all__ = [
+    "async_iterative_run",
+    "AsyncPause",
+    "PausableTask"
+]
+
+module_logger = logging.getLogger(__name__)
+
+
+def async_iterative_run(run_fn):
+    """
+    asyncio counterpart of ``iterative_run``. Decorates a PausableTask's
+    ``run`` coroutine so that it gets awaited over and over again until the
+    task is stopped. While the task is paused, the wrapper waits on an event
+    instead of polling.
+
+    Args:
+        run_fn (coroutine function): the overridden run method from PausableTask
+    Returns:
+        coroutine function: wrapped function
+    """
+    async def wrapper(self):
+        while True:
+            if self.stopped():
+                break
+            if self.paused():
+                await self._resume_event.wait()
+                continue
+            self._set_running(True)
+            try:
+                await run_fn(self)
+            finally:
+                self._set_running(False)
+    return wrapper
+
+
+class AsyncPause(object):
+    """
+    asyncio counterpart of ``Pause``. An asynchronous context manager for
+    pausing tasks.
+
+    .. code-block:: python
+
+        async with AsyncPause(task):
+            # task is paused, and not in the middle of an iteration
+            ...
+
+    Attributes:
+        task (dict): A collection of tasks to pause and unpause.
+        init_pause_status (dict): The initial state of the tasks in
+            the task attribute.
+    """
+    def __init__(self, pausable_task):
+        """
+        Args:
+            pausable_task (PausableTask/dict): task, or dict of tasks. None
+                values are ignored.
+        """
+        self.task = pausable_task
+        if not isinstance(self.task, dict):
+            self.task = {'task': self.task}
+
+        self.init_pause_status = {}
+        for name, task in self.task.items():
+            if task:
+                self.init_pause_status[name] = task.paused()
+            else:
+                self.init_pause_status[name] = None
+
+    async def __aenter__(self):
+        """
+        Pause the tasks, and wait until none of them is in the middle of
+        an iteration.
+        """
+        for name, task in self.task.items():
+            if task and not self.init_pause_status[name]:
+                task.pause_task()
+        for task in self.task.values():
+            if task:
+                await task.wait_idle()
+
+    async def __aexit__(self, *args):
+        """
+        Unpause the tasks that weren't paused to begin with.
+        """
+        for name, task in self.task.items():
+            if task and not self.init_pause_status[name]:
+                task.unpause_task()
+
+
+class PausableTask(object):
+    """
+    A pausable, stoppable asyncio task.
+
+    This is the asyncio counterpart of ``PausableThread`` and
+    ``PausableThreadCallback``. Either pass a coroutine function as
+    ``target``, which gets awaited over and over again, or subclass and
+    override ``run``, decorating it with ``async_iterative_run``.
+    Pausing, unpausing and stopping are done with asyncio events, so
+    nothing polls, and one event loop can drive many of these.
+
+    Attributes:
+        name (str): name of task
+        logger (logging.getLogger): logging instance.
+        task (asyncio.Task): the underlying task, once started.
+        _resume_event (asyncio.Event): set when task is not paused.
+        _stop_event (asyncio.Event): setting this stops task.
+        _idle_event (asyncio.Event): set when task is not currently
+            executing an iteration of its "run" method.
+    """
+    def __init__(self, target=None, args=None, kwargs=None,
+                 name="PausableTask", logger=None):
+        """
+        Args:
+            target (coroutine function, optional): awaited in each iteration
+            args (tuple, optional): passed to target
+            kwargs (dict, optional): passed to target
+            name (str, optional): name of task ("PausableTask")
+            logger (logging.getLogger, optional): logging instance.
+        """
+        if logger is None:
+            logger = module_logger.getChild(name)
+        if args is None: args = ()
+        if kwargs is None: kwargs = {}
+        self.name = name
+        self.logger = logger
+        self.callback = target
+        self.callback_args = args
+        self.callback_kwargs = kwargs
+        self.task = None
+        self._resume_event = asyncio.Event()
+        self._resume_event.set()
+        self._stop_event = asyncio.Event()
+        self._idle_event = asyncio.Event()
+        self._idle_event.set()
+
+    @async_iterative_run
+    async def run(self):
+        await self.callback(*self.callback_args, **self.callback_kwargs)
+
+    def start(self):
+        """
+        Schedule the task on the running event loop.
+
+        Returns:
+            asyncio.Task
+        """
+        self.task = asyncio.ensure_future(self.run())
+        return self.task
+
+    async def join(self):
+        """Wait for the task to finish."""
+        if self.task is not None:
+            await self.task
+
+    async def sleep(self, delay):
+        """
+        Sleep for delay seconds, or until the task is stopped.
+
+        Returns:
+            bool: False if task was stopped while sleeping, True otherwise.
+        """
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), delay)
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    async def wait_idle(self):
+        """Wait until the task isn't in the middle of an iteration."""
+        await self._idle_event.wait()
+
+    def _set_running(self, running):
+        if running:
+            self._idle_event.clear()
+        else:
+            self._idle_event.set()
+
+    def stop_task(self):
+        """
+        Set self._stop_event. A paused task is woken up so it can exit.
+        """
+        self._stop_event.set()
+        self._resume_event.set()
+
+    def stop(self):
+        """Alias for self.stop_task"""
+        return self.stop_task()
+
+    def pause_task(self):
+        """Clear self._resume_event"""
+        self._resume_event.clear()
+
+    def pause(self):
+        """Alias for self.pause_task"""
+        return self.pause_task()
+
+    def unpause_task(self):
+        """Set self._resume_event"""
+        self._resume_event.set()
+
+    def unpause(self):
+        """Alias for self.unpause_task"""
+        return self.unpause_task()
+
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def paused(self):
+        return not self._resume_event.is_set() and not self.stopped()
+
+    def running(self):
+        return not self._idle_event.is_set()
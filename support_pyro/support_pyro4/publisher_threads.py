@@ -0,0 +1,919 @@
+"""
+Threads that publish samples: on a zmq socket (ZmqPublisherThread), through
+a ZmqBroker shared by several publishers, in a shared memory ring buffer
+(ShmPublisherThread), or to Pyro4 callbacks (Pyro4PublisherThread). The
+receiving end is in subscriber_threads.
+"""
+from __future__ import print_function
+import collections
+import threading
+import time
+
+import zmq
+import Pyro4
+import Pyro5.socketutil
+
+from .util import (PausableThread, PausableThreadPool, FixedRateScheduler,
+                   iterative_run)
+from .pubsub_util import (topic_bytes, pack_message, send_frames,
+                          configure_socket, TopicCounters, SampleBatcher,
+                          LastValueCache, DeltaEncoder, encode_payload,
+                          SubscriptionTracker, verbose_xpub, remove_ipc_file,
+                          unpack_header, unpack_drop_report, monotonic,
+                          FLAG_BATCH, FLAG_DELTA)
+from .shm_ring import ShmRingWriter
+from .serializers import get_serializer
+
+__all__ = [
+    "ZmqPublisherThread",
+    "ZmqBroker",
+    "ShmPublisherThread",
+    "AsyncCallback",
+    "Pyro4PublisherThread"
+]
+
+
+class ZmqPublisherThread(PausableThread):
+    """
+    A Pausable Thread that publishes the result of data_cb on a zmq PUB socket.
+    Messages are multipart: a topic frame, a header frame and payload frames
+    (see pubsub_util). Large payloads, and plain buffers with a serializer
+    that supports buffers, are sent without copying them, so data_cb should
+    return a fresh object each time rather than modifying the previous one.
+
+    serializer names a registered serializer (see serializers), eg
+    "serpent", "json", "marshal", "pickle" or "numpy". Its codec id goes in
+    each message's header, so subscribers pick the matching decoder
+    themselves.
+
+    Sends never block. zmq keeps a queue per subscriber, and when a
+    subscriber's queue is at the send high-water mark, messages are dropped
+    for that subscriber only; the others still get everything. drop_policy
+    picks how much a lagging subscriber has waiting for it:
+
+    * None or "drop": up to sndhwm messages. Newer ones are dropped for it
+      until it catches up.
+    * "conflate": a single message (sndhwm is forced to 1), so a subscriber
+      that stalls is at most one stale sample behind once it catches up.
+      Pair it with ZmqSubscriberThread's conflate to only ever consume the
+      latest sample.
+
+    zmq doesn't tell the publisher which messages it dropped. Subscribers
+    see them as sequence gaps (see pubsub_util.SequenceTracker), and
+    ZmqSubscriberThread and ZmqSubscriberHub send them back upstream (see
+    pubsub_util.pack_drop_report). The thread publishes on an XPUB socket,
+    so that it can read those reports, and counts them under "dropped".
+    Other subscribers can pass drops back with ``report_drops``.
+
+    With batch_size and/or batch_interval set, samples are collected into
+    columnar batches (see pubsub_util.SampleBatcher), and each batch is sent
+    as a single message. Samples still waiting in the batcher when the thread
+    is stopped are discarded.
+
+    With delta set, dict samples are sent as a full keyframe every
+    keyframe_interval samples, and in between as just the fields that differ
+    from the keyframe (see pubsub_util.DeltaEncoder). ZmqSubscriberThread and
+    ZmqSubscriberHub rebuild the full sample before consuming it, and skip
+    deltas until they've got a keyframe. So that new subscribers don't wait
+    up to keyframe_interval samples for one, delta mode sends a keyframe
+    whenever a subscription to topic comes in on the XPUB socket.
+    Through a ZmqBroker, only the first subscription reaches the publisher,
+    so later subscribers wait for the next regular keyframe. Delta mode
+    can't be combined with batching.
+
+    Each message is stamped with a sequence number and publish time, so that
+    subscribers can tell when messages are being dropped (see
+    pubsub_util.SequenceTracker).
+
+    The latest sample is kept in a LastValueCache, whether or not it was sent
+    yet, so that subscribers that connect late can get it from ``snapshot``.
+    With replay_log set, every message sent is also appended to that
+    ReplayLog, under the sequence number in its header, so subscribers can
+    tell which logged samples they missed. Sequence numbers carry on from
+    the log's last one. Payloads are logged as they were sent, without
+    encoding them again, except for deltas, which are logged as the full
+    sample, and payloads split over several frames, which are logged as a
+    single buffer. Decimated samples aren't sent, so they aren't logged
+    either.
+
+    address can also be a list of addresses, to publish on several
+    transports at once (see pubsub_util.make_endpoints).
+
+    With connect set, the socket connects to address instead of binding it,
+    for publishing through a ZmqBroker.
+
+    With auto_pause set, the thread keeps track of subscriptions (see pubsub_util.SubscriptionTracker). While
+    nobody is subscribed to topic, data_cb isn't called at all, and the
+    thread just waits for a subscription to come in. ``idle`` tells whether
+    that's currently the case, and ``subscriber_counts`` how many
+    subscriptions there are. Through a ZmqBroker, the broker counts as a
+    single subscriber; its own ``subscriber_counts`` has the real numbers.
+
+    With rate_controller set (a pubsub_util.RateController), the thread
+    slows down, or only sends every so many samples, while drop reports
+    come in on its socket (or through ``report_drops``), and speeds back up
+    once they stop. ``rate_stats`` has the effective rate.
+    """
+    drop_policies = (None, "drop", "conflate")
+
+    def __init__(self, update_rate, data_cb,context,address,
+                        topic="",
+                        data_cb_args=None,
+                        data_cb_kwargs=None,
+                        serializer="serpent",
+                        fixed_rate=False,
+                        deadline_policy="skip",
+                        sndhwm=None,
+                        linger=None,
+                        drop_policy=None,
+                        batch_size=None,
+                        batch_interval=None,
+                        delta=False,
+                        keyframe_interval=100,
+                        replay_log=None,
+                        connect=False,
+                        auto_pause=False,
+                        rate_controller=None,
+                        **kwargs):
+
+        if fixed_rate:
+            kwargs["scheduler"] = FixedRateScheduler(update_rate,
+                                                     policy=deadline_policy)
+        PausableThread.__init__(self, **kwargs)
+        self.update_rate = update_rate
+        self.base_rate = update_rate
+        self.rate_controller = rate_controller
+        self.data_cb = data_cb
+        if drop_policy not in self.drop_policies:
+            raise ValueError("Don't recognize drop policy {}".format(drop_policy))
+        self.drop_policy = drop_policy
+        self.socket = context.socket(zmq.XPUB)
+        verbose_xpub(self.socket)
+        if drop_policy == "conflate":
+            sndhwm = 1
+        self.subscriptions = None
+        if auto_pause:
+            self.subscriptions = SubscriptionTracker()
+        self.idle = False
+        configure_socket(self.socket, sndhwm=sndhwm, linger=linger)
+        addresses = address if isinstance(address, (list, tuple)) else [address]
+        self.addresses = list(addresses)
+        self.connect = connect
+        for address in addresses:
+            if connect:
+                self.socket.connect(address)
+            else:
+                self.socket.bind(address)
+        self.counters = TopicCounters(("sent", "dropped", "decimated"))
+        self._reported_drops = 0
+        self.last_values = LastValueCache()
+        self.replay_log = replay_log
+        self.batcher = None
+        if batch_size is not None or batch_interval is not None:
+            self.batcher = SampleBatcher(batch_size, batch_interval)
+        self.delta_encoder = None
+        if delta:
+            if self.batcher is not None:
+                raise ValueError("Delta mode can't be combined with batching")
+            self.delta_encoder = DeltaEncoder(keyframe_interval)
+        self.topic = topic_bytes(topic)
+        self.seq = 0
+        if replay_log is not None:
+            self.seq = replay_log.last_seq()
+        if not data_cb_args: data_cb_args = ()
+        if not data_cb_kwargs: data_cb_kwargs = {}
+        self.data_cb_args = data_cb_args
+        self.data_cb_kwargs = data_cb_kwargs
+
+        self.serializer = get_serializer(serializer)
+
+    def run(self):
+        self._publish()
+        self.socket.close()
+        if not self.connect:
+            for address in self.addresses:
+                remove_ipc_file(address)
+
+    @iterative_run
+    def _publish(self):
+        self._read_subscriptions()
+        if self.subscriptions is not None and not self._has_subscribers():
+            return
+        data = sample = self.data_cb(*self.data_cb_args, **self.data_cb_kwargs)
+        self.last_values.update(self.topic, data)
+        flags = 0
+        if self.rate_controller is not None and self.rate_controller.skip():
+            self.counters.increment(self.topic, "decimated")
+            data = None
+        elif self.batcher is not None:
+            data = self.batcher.add(data)
+            flags |= FLAG_BATCH
+        elif self.delta_encoder is not None:
+            data, delta_flags = self.delta_encoder.encode(data)
+            flags |= delta_flags
+        if data is not None:
+            self.seq += 1
+            frames = pack_message(self.topic, data, self.serializer,
+                                  flags=flags, seq=self.seq)
+            if self.replay_log is not None:
+                self._log(frames, data, sample)
+            send_frames(self.socket, frames)
+            self.counters.increment(self.topic, "sent")
+            if self.rate_controller is not None:
+                with self._lock:
+                    dropped, self._reported_drops = self._reported_drops, 0
+                self._adapt(self.rate_controller.update(dropped=dropped))
+        if self.scheduler is None:
+            time.sleep(self.update_rate)
+
+    def _log(self, frames, data, sample):
+        flags = unpack_header(frames[1]).flags
+        if flags & FLAG_DELTA:
+            # a delta is no use without its keyframe
+            payload, flags = encode_payload(sample, self.serializer)
+        elif len(frames) == 3:
+            payload = frames[2]
+        elif flags & FLAG_BATCH:
+            payload = self.serializer.dumps_batch(data)
+        else:
+            payload = self.serializer.dumps(data)
+        self.replay_log.append(payload, flags, seq=self.seq)
+
+    def _read_subscriptions(self):
+        while True:
+            try:
+                message = self.socket.recv(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+            report = unpack_drop_report(message)
+            if report is not None:
+                topic, count = report
+                if topic == self.topic:
+                    self.report_drops(count)
+                continue
+            if self.subscriptions is not None:
+                self.subscriptions.update(message)
+            if (self.delta_encoder is not None and message[:1] == b"\x01" and
+                    self.topic.startswith(message[1:])):
+                self.delta_encoder.force_keyframe()
+
+    def _has_subscribers(self):
+        idle = self.subscriptions.subscribers(self.topic) == 0
+        if idle != self.idle:
+            self.logger.debug("{} publishing on topic {!r}".format(
+                "Pausing" if idle else "Resuming", self.topic))
+            self.idle = idle
+        if idle and self.scheduler is None:
+            # wake up as soon as somebody subscribes
+            self.socket.poll(int(self.update_rate * 1000))
+        return not idle
+
+    def subscriber_counts(self):
+        """
+        Returns:
+            dict: topic prefix (str) -> number of subscriptions, or None if
+                subscriptions aren't tracked (auto_pause isn't set).
+        """
+        if self.subscriptions is None:
+            return None
+        return self.subscriptions.as_dict()
+
+    def report_drops(self, count):
+        """
+        Tell the publisher that a subscriber missed messages, eg the growth
+        of its SequenceTracker "missing" count. Drop reports subscribers
+        send upstream end up here too. They're counted under
+        "dropped", and slow down the publisher with a rate_controller.
+        Args:
+            count (int): number of messages missed since the last report
+        """
+        if count <= 0:
+            return
+        self.counters.increment(self.topic, "dropped", count)
+        with self._lock:
+            self._reported_drops += count
+
+    def _adapt(self, slowdown):
+        if self.rate_controller.mode == "rate":
+            self._set_period(self.base_rate * slowdown)
+
+    def _set_period(self, period):
+        with self._lock:
+            self.update_rate = period
+            if self.scheduler is not None:
+                self.scheduler.period = period
+
+    def change_rate(self, new_rate):
+        """
+        Change the rate at which the publisher updates. With a
+        rate_controller, this is the rate it goes back up to.
+        Args:
+            new_rate (float): Time in seconds to wait before calling self.data_cb
+        """
+        self.base_rate = new_rate
+        slowdown = 1.0
+        if self.rate_controller is not None and self.rate_controller.mode == "rate":
+            slowdown = self.rate_controller.slowdown
+        self._set_period(new_rate * slowdown)
+
+    def rate_stats(self):
+        """
+        Returns:
+            dict: rate controller statistics (see RateController.as_dict),
+                plus the current "period", or None without a rate_controller.
+        """
+        if self.rate_controller is None:
+            return None
+        stats = self.rate_controller.as_dict()
+        stats["period"] = self.update_rate
+        return stats
+
+    def message_stats(self):
+        """
+        Returns:
+            dict: topic -> dict with "sent", "dropped" (as reported by
+                subscribers) and "decimated" counts
+        """
+        return self.counters.as_dict()
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: topic (str) -> latest sample (see LastValueCache.snapshot)
+        """
+        return self.last_values.snapshot()
+
+    def stop_thread(self):
+        """
+        Stop the thread. The thread closes its socket once it notices, as zmq
+        sockets can't be closed from another thread.
+        """
+        super(ZmqPublisherThread, self).stop_thread()
+
+
+class ZmqBroker(PausableThread):
+    """
+    A Pausable Thread that forwards messages from any number of publishers
+    to subscribers through a single XSUB/XPUB pair, so that subscribers only
+    need one address no matter how many publishers there are.
+
+    Publishers connect to frontend_address (by default an inproc address, so
+    they have to share the broker's context), for example by passing
+    ``connect=True`` to ZmqPublisherThread, or by calling
+    ``Pyro4PublisherServer.use_broker``. Subscribers connect to
+    backend_address. Subscriptions are forwarded back to the publishers, so
+    topic filtering still happens at the publishers.
+
+    Messages and bytes forwarded are counted per topic, and so are
+    subscribe and unsubscribe requests. ``subscriber_counts`` has the number
+    of active subscriptions per topic prefix. Only the first subscription to
+    and last unsubscription from each prefix are passed on to publishers,
+    so publishers with auto_pause set stop calling data_cb while nobody is
+    subscribed through the broker. Drop reports from subscribers are passed
+    on to all publishers, which pick out the ones for their topic.
+
+    Attributes:
+        context (zmq.Context): context the sockets were created in
+        frontend_address (str): address publishers connect to
+        backend_address (str): address subscribers connect to
+    """
+    poll_timeout = 50
+
+    def __init__(self, context=None,
+                    frontend_address=None,
+                    backend_address=None,
+                    host="*", port=None,
+                    **kwargs):
+        """
+        Args:
+            context (zmq.Context, optional): Defaults to zmq.Context.instance()
+            frontend_address (str, optional): Defaults to a new inproc
+                address.
+            backend_address (str, optional): Defaults to
+                "tcp://{host}:{port}".
+            host (str, optional): backend host, if backend_address isn't
+                given ("*")
+            port (int, optional): backend port, if backend_address isn't
+                given. Defaults to a probably unused port.
+            kwargs: passed to PausableThread
+        """
+        kwargs.setdefault("name", "ZmqBroker")
+        PausableThread.__init__(self, **kwargs)
+        if context is None: context = zmq.Context.instance()
+        if frontend_address is None:
+            frontend_address = "inproc://zmq_broker_{}".format(id(self))
+        if backend_address is None:
+            if port is None: port = Pyro5.socketutil.find_probably_unused_port()
+            backend_address = "tcp://{}:{}".format(host, port)
+        self.context = context
+        self.frontend_address = frontend_address
+        self.backend_address = backend_address
+        self.frontend = context.socket(zmq.XSUB)
+        self.frontend.bind(frontend_address)
+        self.backend = context.socket(zmq.XPUB)
+        verbose_xpub(self.backend)
+        self.backend.bind(backend_address)
+        self.poller = zmq.Poller()
+        self.poller.register(self.frontend, zmq.POLLIN)
+        self.poller.register(self.backend, zmq.POLLIN)
+        self.counters = TopicCounters(("messages", "bytes"))
+        self.subscriptions = TopicCounters(("subscribe", "unsubscribe"))
+        self.subscribers = SubscriptionTracker()
+
+    def run(self):
+        self._forward()
+        self.frontend.close()
+        self.backend.close()
+
+    @iterative_run
+    def _forward(self):
+        events = dict(self.poller.poll(self.poll_timeout))
+        if self.frontend in events:
+            frames = self.frontend.recv_multipart(copy=False)
+            self.backend.send_multipart(frames, copy=False)
+            topic = frames[0].bytes
+            self.counters.increment(topic, "messages")
+            self.counters.increment(topic, "bytes",
+                                    sum(len(frame) for frame in frames))
+        if self.backend in events:
+            message = self.backend.recv()
+            update = self.subscribers.update(message)
+            if update is None:
+                if unpack_drop_report(message) is not None:
+                    self.frontend.send(message)
+                return
+            prefix, before, after = update
+            if after > before:
+                self.subscriptions.increment(prefix, "subscribe")
+            else:
+                self.subscriptions.increment(prefix, "unsubscribe")
+            if (before == 0) != (after == 0):
+                self.frontend.send(message)
+
+    def message_stats(self):
+        """
+        Returns:
+            dict: topic -> dict with "messages" and "bytes" forwarded
+        """
+        return self.counters.as_dict()
+
+    def subscription_stats(self):
+        """
+        Returns:
+            dict: topic -> dict with "subscribe" and "unsubscribe" counts.
+                Subscribing to everything is counted under the "" topic.
+        """
+        return self.subscriptions.as_dict()
+
+    def subscriber_counts(self):
+        """
+        Returns:
+            dict: topic prefix (str) -> number of active subscriptions
+        """
+        return self.subscribers.as_dict()
+
+    def stop_thread(self):
+        """
+        Stop the thread. The thread closes its sockets once it notices.
+        """
+        super(ZmqBroker, self).stop_thread()
+
+
+class ShmPublisherThread(PausableThread):
+    """
+    A Pausable Thread that writes the result of data_cb into a shared memory
+    ring buffer (see shm_ring), for subscribers on the same host. Plain
+    buffers are written as is if the serializer supports buffers, everything
+    else is serialized first. Either way, it has to fit in record_size bytes;
+    samples that don't are dropped and counted.
+
+    The ring buffer file is created when the thread is, and removed when the
+    thread stops. With replay_log set, every sample is also appended to that
+    ReplayLog.
+    """
+    def __init__(self, update_rate, data_cb, path,
+                        record_size=65536,
+                        capacity=1024,
+                        data_cb_args=None,
+                        data_cb_kwargs=None,
+                        serializer="serpent",
+                        fixed_rate=False,
+                        deadline_policy="skip",
+                        replay_log=None,
+                        **kwargs):
+
+        if fixed_rate:
+            kwargs["scheduler"] = FixedRateScheduler(update_rate,
+                                                     policy=deadline_policy)
+        PausableThread.__init__(self, **kwargs)
+        self.update_rate = update_rate
+        self.data_cb = data_cb
+        if not data_cb_args: data_cb_args = ()
+        if not data_cb_kwargs: data_cb_kwargs = {}
+        self.data_cb_args = data_cb_args
+        self.data_cb_kwargs = data_cb_kwargs
+        self.serializer = get_serializer(serializer)
+        self.writer = ShmRingWriter(path, record_size=record_size, capacity=capacity)
+        self.replay_log = replay_log
+        self.counters = TopicCounters(("sent", "dropped"))
+        self.last_values = LastValueCache()
+
+    def run(self):
+        self._publish()
+        self.writer.close()
+
+    @iterative_run
+    def _publish(self):
+        data = self.data_cb(*self.data_cb_args, **self.data_cb_kwargs)
+        self.last_values.update("", data)
+        payload, flags = encode_payload(data, self.serializer)
+        if self.replay_log is not None:
+            self.replay_log.append(payload, flags)
+        try:
+            self.writer.write(payload, flags)
+        except ValueError as err:
+            self.logger.error(err)
+            self.counters.increment("", "dropped")
+        else:
+            self.counters.increment("", "sent")
+        if self.scheduler is None:
+            time.sleep(self.update_rate)
+
+    def message_stats(self):
+        """
+        Returns:
+            dict: {"": dict with "sent" and "dropped" counts}
+        """
+        return self.counters.as_dict()
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: topic (str) -> latest sample (see LastValueCache.snapshot)
+        """
+        return self.last_values.snapshot()
+
+
+class AsyncCallback(object):
+    """
+    A callback registered with Pyro4PublisherThread, described by the same
+    cb_info dict that async methods take: "cb" is the name of the method to
+    call, and "cb_handler" the object to call it on, usually a Pyro4 proxy
+    for a client's callback handler. With socket_info set (a dict with the
+    flask "app" and "socketio" objects), samples are emitted to the socketio
+    event named "cb" instead.
+
+    Attributes:
+        cb_info (dict): as passed in
+        socket_info (dict): as passed in
+        cb_name (str): name of method or event
+        cb_handler (object): object cb_name is called on, or None with
+            socket_info
+    """
+    def __init__(self, cb_info, socket_info=None):
+        self.cb_info = cb_info
+        self.socket_info = socket_info
+        self.cb_name = cb_info["cb"]
+        self.cb_handler = None if socket_info else cb_info.get("cb_handler")
+        self._local = threading.local()
+
+    def handler(self):
+        """
+        Get the object to call cb_name on from the calling thread.
+        Fan-out workers take turns calling the same callback, but a Pyro5
+        proxy (which is what Pyro4.Proxy is once Pyro5's compatibility layer
+        is installed) can only be used by the thread that owns it, so each
+        thread gets a proxy of its own to the same uri, with the same timeout.
+
+        Returns:
+            object: cb_handler, or this thread's copy of it if it's a proxy
+        """
+        if not isinstance(self.cb_handler, Pyro4.Proxy):
+            return self.cb_handler
+        proxy = getattr(self._local, "proxy", None)
+        if proxy is None:
+            proxy = self.cb_handler.__class__(self.cb_handler._pyroUri)
+            proxy._pyroTimeout = self.cb_handler._pyroTimeout
+            self._local.proxy = proxy
+        return proxy
+
+    def cb(self, data):
+        if self.socket_info:
+            with self.socket_info["app"].test_request_context("/"):
+                self.socket_info["socketio"].emit(
+                    self.cb_name, {"args": (data,), "kwargs": {}})
+            return
+        getattr(self.handler(), self.cb_name)(data)
+
+
+class _FanoutSubscriber(object):
+    """
+    A callback registered with Pyro4PublisherThread, along with the samples
+    waiting to be delivered to it.
+
+    Attributes:
+        callback (AsyncCallback): the callback
+        pending (collections.deque): samples waiting to be delivered. When
+            it's full, the oldest sample is dropped.
+        scheduled (bool): whether a worker has been asked to deliver pending
+        failures (int): consecutive failed deliveries
+        delivered (int): total successful deliveries
+        dropped (int): total samples dropped because pending was full
+        evicted (bool): whether the subscriber was removed for failing
+    """
+    def __init__(self, callback, queue_size):
+        self.callback = callback
+        self.pending = collections.deque(maxlen=queue_size)
+        self.scheduled = False
+        self.failures = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.evicted = False
+
+
+class Pyro4PublisherThread(PausableThread):
+    """
+    A Pausable Thread that will publish data to any registered callbacks,
+    given some data_cb callback function.
+    The run function calls the data_cb function, and then hands the result to
+    each registered callback.
+    With fixed_rate set, calls start on a drift-free grid of update_rate
+    seconds rather than update_rate seconds after the previous call finished.
+    With batch_size and/or batch_interval set, callbacks get columnar batches
+    of samples (see pubsub_util.SampleBatcher) instead of single samples.
+
+    Callbacks are called from a pool of fanout_workers threads, so a slow or
+    dead client doesn't hold up the others, or the next sample. Each
+    callback has its own queue of at most queue_size samples, and is only
+    ever being called by one worker at a time, so samples arrive in order,
+    and a client that can't keep up loses its oldest samples rather than
+    tying up more workers. A call that raises, or takes longer than
+    callback_timeout seconds, counts as a failure; after max_failures
+    failures in a row the callback is evicted. Pyro4 proxies are given
+    callback_timeout as their ``_pyroTimeout``, so a call to a client that
+    hangs raises instead of tying up its worker for good. Calls to anything
+    else can't be interrupted, so for them callback_timeout only detects
+    slow calls once they return. Pass
+    fanout_workers=0 to call callbacks one after another on the publishing
+    thread instead.
+
+    The latest sample is kept in a LastValueCache under the empty topic, see
+    ``snapshot``.
+
+    With rate_controller set (a pubsub_util.RateController), the thread
+    slows down, or only fans out every so many samples, while callbacks'
+    queues are filling up or dropping samples, and speeds back up once they
+    aren't. ``rate_stats`` has the effective rate.
+    """
+    def __init__(self,
+                update_rate,
+                data_cb,
+                data_cb_args=None,
+                data_cb_kwargs=None,
+                cb_info=None,
+                socket_info=None,
+                fixed_rate=False,
+                deadline_policy="skip",
+                batch_size=None,
+                batch_interval=None,
+                fanout_workers=4,
+                queue_size=10,
+                callback_timeout=None,
+                max_failures=3,
+                rate_controller=None,
+                **kwargs):
+
+        if fixed_rate:
+            kwargs["scheduler"] = FixedRateScheduler(update_rate,
+                                                     policy=deadline_policy)
+        PausableThread.__init__(self, **kwargs)
+        self.update_rate = update_rate
+        self.base_rate = update_rate
+        self.rate_controller = rate_controller
+        self._dropped_seen = 0
+        self.data_cb = data_cb
+
+        if not data_cb_args: data_cb_args = ()
+        if not data_cb_kwargs: data_cb_kwargs = {}
+        self.data_cb_args = data_cb_args
+        self.data_cb_kwargs = data_cb_kwargs
+        self.batcher = None
+        if batch_size is not None or batch_interval is not None:
+            self.batcher = SampleBatcher(batch_size, batch_interval)
+        self.last_values = LastValueCache()
+
+        if cb_info:
+            if not isinstance(cb_info, list):
+                self.cb_info = [cb_info]
+            else:
+                self.cb_info = cb_info
+            for i, info in enumerate(self.cb_info):
+                if isinstance(info, AsyncCallback):
+                    self.cb_info[i] = info
+                elif isinstance(info, dict):
+                    self.cb_info[i] = AsyncCallback(cb_info=info, socket_info=socket_info)
+        else:
+            self.cb_info = []
+
+        self.queue_size = queue_size
+        self.callback_timeout = callback_timeout
+        self.max_failures = max_failures
+        self.subscribers = [self._subscriber(cb) for cb in self.cb_info]
+        self.evicted = 0
+        self._fanout_lock = threading.Lock()
+        self.fanout_pool = None
+        if fanout_workers:
+            self.fanout_pool = PausableThreadPool(
+                fanout_workers, name="{}.fanout".format(self.name),
+                logger=self.logger.getChild("fanout"))
+
+    def start(self):
+        if self.fanout_pool is not None:
+            self.fanout_pool.start()
+        super(Pyro4PublisherThread, self).start()
+
+    def _subscriber(self, callback):
+        if (self.callback_timeout is not None and
+                isinstance(callback.cb_handler, Pyro4.Proxy)):
+            callback.cb_handler._pyroTimeout = self.callback_timeout
+        return _FanoutSubscriber(callback, self.queue_size)
+
+    @iterative_run
+    def run(self):
+        data = self.data_cb(*self.data_cb_args,**self.data_cb_kwargs)
+        self.last_values.update("", data)
+        if self.rate_controller is not None and self.rate_controller.skip():
+            data = None
+        elif self.batcher is not None:
+            data = self.batcher.add(data)
+        if data is not None:
+            self._fan_out(data)
+            if self.rate_controller is not None:
+                self._adapt()
+        if self.scheduler is None:
+            time.sleep(self.update_rate)
+
+    def _fan_out(self, data):
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            if self.fanout_pool is None:
+                self._deliver(subscriber, data)
+                continue
+            with self._fanout_lock:
+                if len(subscriber.pending) == subscriber.pending.maxlen:
+                    subscriber.dropped += 1
+                subscriber.pending.append(data)
+                if subscriber.scheduled:
+                    continue
+                subscriber.scheduled = True
+            self.fanout_pool.submit(self._drain, subscriber)
+
+    def _adapt(self):
+        with self._lock:
+            subscribers = list(self.subscribers)
+        with self._fanout_lock:
+            dropped = sum(s.dropped for s in subscribers)
+            lag = max([len(s.pending) for s in subscribers] + [0])
+        # evicted callbacks take their drops with them
+        new_drops = max(dropped - self._dropped_seen, 0)
+        self._dropped_seen = dropped
+        slowdown = self.rate_controller.update(dropped=new_drops,
+                                               lag=float(lag) / self.queue_size)
+        if self.rate_controller.mode == "rate":
+            self._set_period(self.base_rate * slowdown)
+
+    def _set_period(self, period):
+        with self._lock:
+            self.update_rate = period
+            if self.scheduler is not None:
+                self.scheduler.period = period
+
+    def rate_stats(self):
+        """
+        Returns:
+            dict: rate controller statistics (see RateController.as_dict),
+                plus the current "period", or None without a rate_controller.
+        """
+        if self.rate_controller is None:
+            return None
+        stats = self.rate_controller.as_dict()
+        stats["period"] = self.update_rate
+        return stats
+
+    def _drain(self, subscriber):
+        while True:
+            with self._fanout_lock:
+                if subscriber.evicted or not subscriber.pending:
+                    subscriber.scheduled = False
+                    return
+                data = subscriber.pending.popleft()
+            self._deliver(subscriber, data)
+
+    def _deliver(self, subscriber, data):
+        t0 = monotonic()
+        try:
+            subscriber.callback.cb(data)
+        except Exception as err:
+            self.logger.error("Callback failed: {}".format(err))
+            failed = True
+        else:
+            elapsed = monotonic() - t0
+            failed = (self.callback_timeout is not None and
+                      elapsed > self.callback_timeout)
+            if failed:
+                self.logger.warning(
+                    "Callback took {:.3f} seconds, timeout is {:.3f}".format(
+                        elapsed, self.callback_timeout))
+        if not failed:
+            subscriber.failures = 0
+            subscriber.delivered += 1
+            return
+        subscriber.failures += 1
+        if self.max_failures is not None and subscriber.failures >= self.max_failures:
+            self._evict(subscriber)
+
+    def _evict(self, subscriber):
+        self.logger.warning("Evicting callback after {} failures in a row".format(
+            subscriber.failures))
+        with self._lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+                self.cb_info.remove(subscriber.callback)
+                self.evicted += 1
+        with self._fanout_lock:
+            subscriber.evicted = True
+            subscriber.pending.clear()
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: topic (str) -> latest sample (see LastValueCache.snapshot)
+        """
+        return self.last_values.snapshot()
+
+    def fanout_stats(self):
+        """
+        Returns:
+            dict:
+                * "subscribers" (int): number of registered callbacks
+                * "evicted" (int): number of callbacks evicted so far
+                * "delivered" (int): successful deliveries, over current
+                  callbacks
+                * "dropped" (int): samples dropped because a callback's queue
+                  was full, over current callbacks
+                * "pending" (int): samples waiting to be delivered
+                * "pool" (dict): worker pool statistics (see
+                  PausableThreadPool.stats), or None without a pool.
+        """
+        with self._lock:
+            subscribers = list(self.subscribers)
+        with self._fanout_lock:
+            stats = {
+                "subscribers": len(subscribers),
+                "evicted": self.evicted,
+                "delivered": sum(s.delivered for s in subscribers),
+                "dropped": sum(s.dropped for s in subscribers),
+                "pending": sum(len(s.pending) for s in subscribers)
+            }
+        stats["pool"] = None
+        if self.fanout_pool is not None:
+            stats["pool"] = self.fanout_pool.stats()
+        return stats
+
+    def stop_thread(self):
+        super(Pyro4PublisherThread, self).stop_thread()
+        if self.fanout_pool is not None:
+            self.fanout_pool.stop_thread()
+
+    def join(self, timeout=None):
+        super(Pyro4PublisherThread, self).join(timeout)
+        if self.fanout_pool is not None:
+            self.fanout_pool.join(timeout)
+
+    def register_callback(self, cb_info, socket_info=None):
+        """
+        Register some callback with the Publisher.
+        args:
+            cb_info (dict):
+        """
+        if isinstance(cb_info, dict):
+            cb_info = AsyncCallback(cb_info=cb_info, socket_info=socket_info)
+        elif not isinstance(cb_info, AsyncCallback):
+            return
+        with self._lock:
+            self.cb_info.append(cb_info)
+            self.subscribers.append(self._subscriber(cb_info))
+
+    def change_rate(self, new_rate):
+        """
+        Change the rate at which the publisher updates. With a
+        rate_controller, this is the rate it goes back up to.
+        Args:
+            new_rate (float): Time in seconds to wait before calling self.data_cb
+        """
+        self.base_rate = new_rate
+        slowdown = 1.0
+        if self.rate_controller is not None and self.rate_controller.mode == "rate":
+            slowdown = self.rate_controller.slowdown
+        self._set_period(new_rate * slowdown)
@@ -0,0 +1,250 @@
+"""
+Throughput and latency benchmark for the ZMQ publish/subscribe path.
+
+Each case runs one publisher and some number of subscriber threads in this
+process, over inproc, ipc or tcp on localhost, using the same framing as
+the publisher and subscriber threads (see pubsub_util) and any registered
+serializer (see serializers). Results are written as JSON, one object per
+case, so they can be compared between versions. Like the rest of this
+package, it runs as part of the ``support`` package, from outside this
+repository (inside it, the top level asyncio.py shadows the standard
+library's):
+
+.. code-block:: none
+
+    python -m support.pyro.support_pyro.support_pyro4.pubsub_benchmark \\
+        --transports inproc tcp --sizes 100 10000 --output results.json
+
+For each case we report messages and megabytes per second received (summed
+over subscribers), p50/p99 publish-to-receive latency and the CPU time the
+process used, as a fraction of one core.
+"""
+from __future__ import print_function
+import argparse
+import itertools
+import json
+import os
+import threading
+import time
+
+import zmq
+
+from .pubsub_util import (pack_message, unpack_message, send_frames,
+                          recv_frames, LatencyStats, monotonic, TRANSPORTS,
+                          make_endpoints, remove_ipc_file)
+from .serializers import get_serializer, serializer_names
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = [
+    "TRANSPORTS",
+    "run_case",
+    "sweep",
+    "main"
+]
+
+# milliseconds subscribers wait for a message before checking if they're done
+_POLL_TIMEOUT = 50
+
+
+def _bind(socket, transport):
+    if transport == "tcp":
+        port = socket.bind_to_random_port("tcp://127.0.0.1")
+        return "tcp://127.0.0.1:{}".format(port)
+    addresses = make_endpoints(
+        (transport,), name="pubsub_benchmark_{}".format(id(socket)))["addresses"]
+    if transport not in addresses:
+        raise ValueError("{} isn't supported on this platform".format(transport))
+    socket.bind(addresses[transport])
+    return addresses[transport]
+
+
+class _Subscriber(threading.Thread):
+
+    def __init__(self, context, address, serializer, latency):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.serializer = serializer
+        self.latency = latency
+        self.socket = context.socket(zmq.SUB)
+        self.socket.connect(address)
+        self.socket.setsockopt(zmq.SUBSCRIBE, b"")
+        self.received = 0
+        self.nbytes = 0
+        self.counting = False
+        self.connected = threading.Event()
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.is_set():
+            if not self.socket.poll(_POLL_TIMEOUT):
+                continue
+            frames = recv_frames(self.socket)
+            now = monotonic()
+            topic, header, data = unpack_message(frames, self.serializer)
+            self.connected.set()
+            if not self.counting or topic != b"data":
+                continue
+            self.received += 1
+            self.nbytes += sum(len(frame) for frame in frames[2:])
+            self.latency.add(now - header.timestamp)
+        self.socket.close()
+
+
+def _cpu_time():
+    times = os.times()
+    return times[0] + times[1]
+
+
+def run_case(transport="inproc", payload_size=1000, rate=None,
+             serializer="serpent", subscribers=1, duration=1.0,
+             context=None):
+    """
+    Run a single benchmark case.
+
+    Args:
+        transport (str, optional): "inproc", "ipc" or "tcp" ("inproc")
+        payload_size (int, optional): approximate bytes of data per message,
+            sent as a list of floats, or as a numpy array for the "numpy"
+            serializer (1000)
+        rate (float, optional): messages per second to publish, or None to
+            publish as fast as possible (None)
+        serializer (str, optional): name of registered serializer ("serpent")
+        subscribers (int, optional): number of subscriber threads (1)
+        duration (float, optional): seconds to publish for (1.0)
+        context (zmq.Context, optional): Defaults to zmq.Context.instance()
+    Returns:
+        dict: the case's parameters, plus "sent", "received", "msgs_per_s",
+            "mb_per_s", "latency_p50", "latency_p99" and "cpu"
+    """
+    if context is None:
+        context = zmq.Context.instance()
+    codec = get_serializer(serializer)
+    socket = context.socket(zmq.PUB)
+    socket.setsockopt(zmq.LINGER, 0)
+    address = _bind(socket, transport)
+    latency = LatencyStats(window=100000)
+    threads = [_Subscriber(context, address, codec, latency)
+               for i in range(subscribers)]
+    for thread in threads:
+        thread.start()
+    data = [0.5] * max(payload_size // 8, 1)
+    if serializer == "numpy":
+        data = numpy.array(data)
+    # PUB drops everything until subscriptions have propagated
+    while not all(thread.connected.is_set() for thread in threads):
+        send_frames(socket, pack_message(b"warmup", data, codec))
+        time.sleep(0.01)
+    for thread in threads:
+        thread.counting = True
+
+    period = 1.0 / rate if rate else 0.0
+    sent = 0
+    cpu_start = _cpu_time()
+    start = monotonic()
+    deadline = start
+    while True:
+        now = monotonic()
+        if now - start >= duration:
+            break
+        if period:
+            deadline += period
+            if deadline > now:
+                time.sleep(deadline - now)
+        send_frames(socket, pack_message(b"data", data, codec,
+                                         seq=sent + 1))
+        sent += 1
+    # give subscribers a moment to drain what's in flight
+    time.sleep(0.1)
+    elapsed = monotonic() - start
+    cpu = _cpu_time() - cpu_start
+    for thread in threads:
+        thread.done.set()
+    for thread in threads:
+        thread.join()
+    socket.close()
+    remove_ipc_file(address)
+
+    received = sum(thread.received for thread in threads)
+    nbytes = sum(thread.nbytes for thread in threads)
+    stats = latency.as_dict()
+    return {
+        "transport": transport,
+        "payload_size": payload_size,
+        "rate": rate,
+        "serializer": serializer,
+        "subscribers": subscribers,
+        "duration": duration,
+        "sent": sent,
+        "received": received,
+        "msgs_per_s": received / elapsed,
+        "mb_per_s": nbytes / elapsed / 1e6,
+        "latency_p50": stats["p50"],
+        "latency_p99": stats["p99"],
+        "cpu": cpu / elapsed
+    }
+
+
+def sweep(transports=TRANSPORTS, payload_sizes=(100, 10000, 1000000),
+          rates=(None,), serializers=None, subscriber_counts=(1, 4),
+          duration=1.0, callback=None):
+    """
+    Run run_case for every combination of parameters. Transports that this
+    platform's zmq doesn't support are skipped.
+
+    Args:
+        callback (callable, optional): called with each case's result
+            as soon as it's available.
+    Returns:
+        list: results of run_case
+    """
+    if serializers is None:
+        serializers = serializer_names()
+    transports = [transport for transport in transports
+                  if transport != "ipc" or zmq.has("ipc")]
+    results = []
+    for transport, payload_size, rate, serializer, subscribers in itertools.product(
+            transports, payload_sizes, rates, serializers, subscriber_counts):
+        result = run_case(transport=transport, payload_size=payload_size,
+                          rate=rate, serializer=serializer,
+                          subscribers=subscribers, duration=duration)
+        if callback is not None:
+            callback(result)
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ZMQ publish/subscribe")
+    parser.add_argument("--transports", nargs="+", default=list(TRANSPORTS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 10000, 1000000],
+                        help="payload sizes, in bytes")
+    parser.add_argument("--rates", nargs="+", type=float, default=None,
+                        help="messages per second. Default is as fast as possible")
+    parser.add_argument("--serializers", nargs="+", default=None,
+                        choices=serializer_names())
+    parser.add_argument("--subscribers", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--duration", type=float, default=1.0,
+                        help="seconds per case")
+    parser.add_argument("--output", default="pubsub_benchmark.json")
+    args = parser.parse_args()
+
+    def report(result):
+        print("{transport:>6} {serializer:>8} size={payload_size:<8} "
+              "subs={subscribers:<3} {msgs_per_s:10.0f} msg/s {mb_per_s:8.2f} MB/s "
+              "p50={latency_p50:.6f} p99={latency_p99:.6f} cpu={cpu:.2f}".format(**result))
+
+    results = sweep(transports=args.transports, payload_sizes=args.sizes,
+                    rates=args.rates or (None,), serializers=args.serializers,
+                    subscriber_counts=args.subscribers, duration=args.duration,
+                    callback=report)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print("Wrote {} results to {}".format(len(results), args.output))
+
+
+if __name__ == "__main__":
+    main()
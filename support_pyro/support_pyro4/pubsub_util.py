@@ -0,0 +1,1011 @@
+"""
+Message framing shared by the ZMQ publisher and subscriber threads.
+
+Each message is sent as a multipart message:
+
+    [topic, header, payload, ...]
+
+The topic gets its own frame so that ZMQ's prefix matching only ever looks
+at the topic, never at the payload. The header is a small struct with a
+format version, flags, the message's sequence number on its topic and the
+time it was published (``monotonic``), which subscribers use to detect lost
+messages and measure latency (see SequenceTracker), and the id of the codec
+the payload was encoded with (see serializers), so subscribers can pick the
+right decoder. Payload frames are either serialized data, or, when the data
+is a plain buffer (bytes, bytearray or memoryview) and the serializer
+handles buffers (see serializers.Serializer.supports_buffers), the raw
+buffer, sent without copying it.
+
+Publishers can batch samples (see SampleBatcher), in which case the payload
+is a columnar batch and the FLAG_BATCH flag is set.
+
+PUB/SUB doesn't deliver anything sent before a subscriber connected, so
+publishers also keep the latest sample on each topic (see LastValueCache),
+which late subscribers can ask for directly.
+
+Dict samples can also be sent as deltas (see DeltaEncoder), with the
+FLAG_DELTA flag set: a full keyframe every so often, and in between only the
+fields that differ from that keyframe.
+
+zmq drops messages for subscribers that fall behind without telling the
+publisher, so subscribers send a drop report upstream when they notice a
+gap in the sequence numbers (see pack_drop_report).
+
+Publishers can listen on several transports at once (see make_endpoints):
+inproc for subscribers in the same process, ipc for the same host and tcp
+for everybody else. Subscribers connect over the fastest one they can reach
+(see resolve_address).
+"""
+import collections
+import itertools
+import os
+import random
+import struct
+import tempfile
+import threading
+import time
+from socket import gethostname
+
+import six
+import zmq
+
+from .serializers import get_serializer
+
+__all__ = [
+    "HEADER_FORMAT",
+    "HEADER_VERSION",
+    "FLAG_RAW",
+    "FLAG_BATCH",
+    "FLAG_DELTA",
+    "COPY_THRESHOLD",
+    "MessageHeader",
+    "unpack_header",
+    "topic_bytes",
+    "encode_payload",
+    "decode_payload",
+    "pack_message",
+    "unpack_message",
+    "send_frames",
+    "recv_frames",
+    "configure_socket",
+    "TopicCounters",
+    "SampleBatcher",
+    "make_batch",
+    "batch_samples",
+    "LatencyStats",
+    "LastValueCache",
+    "DeltaEncoder",
+    "DeltaDecoder",
+    "SequenceTracker",
+    "SubscriptionTracker",
+    "verbose_xpub",
+    "DROP_REPORT",
+    "pack_drop_report",
+    "unpack_drop_report",
+    "RateController",
+    "TRANSPORTS",
+    "make_endpoints",
+    "resolve_address",
+    "remove_ipc_file",
+    "monotonic"
+]
+
+HEADER_FORMAT = "!BBQdB"
+HEADER_VERSION = 1
+
+FLAG_RAW = 0x01
+FLAG_BATCH = 0x02
+FLAG_DELTA = 0x04
+
+MessageHeader = collections.namedtuple("MessageHeader",
+                                       ["version", "flags", "seq", "timestamp", "codec"])
+
+monotonic = getattr(time, "monotonic", time.time)
+
+# frames smaller than this are cheaper to copy than to track, see
+# http://pyzmq.readthedocs.io/en/latest/serialization.html
+COPY_THRESHOLD = 65536
+
+
+def topic_bytes(topic):
+    """Topics go over the wire as bytes."""
+    if isinstance(topic, six.text_type):
+        return topic.encode("utf-8")
+    return topic
+
+
+def _is_buffer(data):
+    if isinstance(data, (six.text_type, dict, list, tuple)):
+        return False
+    try:
+        memoryview(data)
+    except TypeError:
+        return False
+    return True
+
+
+def _frame_bytes(frame):
+    if isinstance(frame, zmq.Frame):
+        return frame.bytes
+    if isinstance(frame, memoryview):
+        return frame.tobytes()
+    return frame
+
+
+def _frame_buffer(frame):
+    return frame.buffer if isinstance(frame, zmq.Frame) else memoryview(frame)
+
+
+def _send_raw(data, serializer):
+    # serializers that don't handle buffers get to encode them their own way,
+    # so that subscribers get back what they would have without pubsub
+    return (serializer.supports_buffers and
+            isinstance(data, (bytes, bytearray, memoryview)))
+
+
+def encode_payload(data, serializer):
+    """
+    Serialize data into a single payload, unless it's a plain buffer and
+    serializer supports buffers.
+
+    Args:
+        data (object): data to encode
+        serializer (str/Serializer): see serializers.get_serializer
+    Returns:
+        tuple: payload, and FLAG_RAW if payload is data itself, else 0
+    """
+    serializer = get_serializer(serializer)
+    if _send_raw(data, serializer):
+        return data, FLAG_RAW
+    return serializer.dumps(data), 0
+
+
+def decode_payload(payload, flags, serializer):
+    """
+    Undo ``encode_payload``. Raw payloads are returned as a memoryview.
+    """
+    if flags & FLAG_RAW:
+        return _frame_buffer(payload)
+    return get_serializer(serializer).loads(_frame_buffer(payload))
+
+
+def pack_message(topic, data, serializer, flags=0, seq=0, timestamp=None):
+    """
+    Create the frames for a message.
+
+    Args:
+        topic (str/bytes): message topic
+        data (object): data to send. Plain buffers (bytes, bytearray,
+            memoryview) are sent as is if serializer supports buffers,
+            everything else is serialized.
+        serializer (str/Serializer): see serializers.get_serializer
+        flags (int, optional): extra header flags, eg FLAG_BATCH
+        seq (int, optional): message's sequence number on topic. 0 means
+            unnumbered.
+        timestamp (float, optional): publish time. Defaults to monotonic()
+    Returns:
+        list: frames
+    """
+    if timestamp is None:
+        timestamp = monotonic()
+    serializer = get_serializer(serializer)
+    if _send_raw(data, serializer):
+        flags |= FLAG_RAW
+        payload = [data]
+    elif flags & FLAG_BATCH:
+        payload = serializer.dumps_batch_frames(data)
+    else:
+        payload = serializer.dumps_frames(data)
+    header = struct.pack(HEADER_FORMAT, HEADER_VERSION, flags, seq, timestamp,
+                         serializer.codec_id)
+    return [topic_bytes(topic), header] + payload
+
+
+def unpack_header(frame):
+    """
+    Decode just the header frame, without touching the payload.
+
+    Returns:
+        MessageHeader
+    """
+    header = _frame_bytes(frame)
+    version = six.indexbytes(header, 0)
+    if version == HEADER_VERSION:
+        return MessageHeader(*struct.unpack(HEADER_FORMAT, header))
+    raise ValueError("Don't recognize header version {}".format(version))
+
+
+def unpack_message(frames, serializer):
+    """
+    Decode frames created by ``pack_message``.
+
+    The payload is decoded with the serializer named in the header, if it's
+    registered. Serializers that aren't safe on untrusted data (see
+    serializers.Serializer.safe) are only used if they're the one passed in.
+
+    Args:
+        frames (list): zmq.Frame or bytes objects
+        serializer (str/Serializer): used for payloads that don't say what
+            they were encoded with. See serializers.get_serializer
+    Returns:
+        tuple: topic (bytes), MessageHeader, data. Raw payloads are returned
+            as a memoryview on the received frame.
+    """
+    if len(frames) < 3:
+        raise ValueError("Expected at least 3 frames, got {}".format(len(frames)))
+    topic = _frame_bytes(frames[0])
+    header = unpack_header(frames[1])
+    if header.flags & FLAG_RAW:
+        return topic, header, _frame_buffer(frames[2])
+    serializer = get_serializer(serializer)
+    if header.codec and header.codec != serializer.codec_id:
+        decoder = get_serializer(header.codec)
+        if not decoder.safe:
+            raise ValueError(("Won't decode untrusted {} payload, subscribe with "
+                              "serializer=\"{}\" to accept it").format(
+                                  decoder.name, decoder.name))
+        serializer = decoder
+    payload = [_frame_buffer(frame) for frame in frames[2:]]
+    if header.flags & FLAG_BATCH:
+        return topic, header, serializer.loads_batch_frames(payload)
+    return topic, header, serializer.loads_frames(payload)
+
+
+def send_frames(socket, frames, flags=0, copy_threshold=COPY_THRESHOLD):
+    """
+    Send frames as one multipart message. Frames at least copy_threshold
+    bytes long are sent without copying them, so they must not be modified
+    after being handed to this function.
+
+    Args:
+        socket (zmq.Socket): socket to send on
+        frames (list): frames to send
+        flags (int, optional): zmq send flags, eg zmq.NOBLOCK
+        copy_threshold (int, optional): size above which frames aren't copied
+    """
+    last = len(frames) - 1
+    for i, frame in enumerate(frames):
+        more = zmq.SNDMORE if i < last else 0
+        copy = memoryview(frame).nbytes < copy_threshold
+        socket.send(frame, flags | more, copy=copy)
+
+
+def recv_frames(socket, flags=0):
+    """
+    Receive a multipart message without copying its frames.
+
+    Returns:
+        list: zmq.Frame objects
+    """
+    return socket.recv_multipart(flags, copy=False)
+
+
+def configure_socket(socket, sndhwm=None, rcvhwm=None, linger=None):
+    """
+    Set high-water marks and linger period on a socket. Options that are
+    None are left at zmq's defaults. HWMs only take effect for connections
+    made after they're set, so call this before bind/connect.
+
+    Args:
+        socket (zmq.Socket): socket to configure
+        sndhwm (int, optional): max number of outgoing messages queued
+            per peer
+        rcvhwm (int, optional): max number of incoming messages queued
+        linger (int, optional): milliseconds to hold on to unsent messages
+            after socket is closed
+    """
+    if sndhwm is not None:
+        socket.setsockopt(zmq.SNDHWM, sndhwm)
+    if rcvhwm is not None:
+        socket.setsockopt(zmq.RCVHWM, rcvhwm)
+    if linger is not None:
+        socket.setsockopt(zmq.LINGER, linger)
+
+
+class TopicCounters(object):
+    """
+    Thread-safe message counters, kept per topic.
+    """
+    def __init__(self, fields):
+        """
+        Args:
+            fields (list): names of counters to keep for each topic
+        """
+        self.fields = list(fields)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def increment(self, topic, field, n=1):
+        with self._lock:
+            if topic not in self._counters:
+                self._counters[topic] = dict((f, 0) for f in self.fields)
+            self._counters[topic][field] += n
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: topic (str) -> dict of counters
+        """
+        with self._lock:
+            return dict(
+                (topic.decode("utf-8") if isinstance(topic, bytes) else topic,
+                 dict(counters))
+                for topic, counters in self._counters.items()
+            )
+
+
+def make_batch(samples):
+    """
+    Pack a list of samples into a batch. If all the samples are dicts with
+    the same keys, the batch is columnar, with one list of values per key.
+    Otherwise the samples are kept as a list.
+
+    Returns:
+        dict:
+            * "n" (int): number of samples
+            * "columns" (dict): key -> list of values, for dict samples, or
+            * "rows" (list): the samples themselves
+    """
+    if samples and all(isinstance(sample, dict) for sample in samples):
+        keys = list(samples[0].keys())
+        key_set = set(keys)
+        if all(set(sample.keys()) == key_set for sample in samples):
+            return {
+                "n": len(samples),
+                "columns": dict((key, [sample[key] for sample in samples])
+                                for key in keys)
+            }
+    return {"n": len(samples), "rows": list(samples)}
+
+
+def batch_samples(batch):
+    """
+    Undo ``make_batch``.
+
+    Returns:
+        list: samples
+    """
+    if "columns" in batch:
+        columns = batch["columns"]
+        keys = list(columns.keys())
+        return [dict(zip(keys, values))
+                for values in zip(*[columns[key] for key in keys])]
+    return list(batch["rows"])
+
+
+class SampleBatcher(object):
+    """
+    Collect samples until there are batch_size of them, or until batch_interval
+    seconds have passed since the first one was added, whichever comes first.
+    The interval is only checked when a sample is added, so it is effectively
+    rounded up to a multiple of the publisher's update rate.
+    """
+    def __init__(self, batch_size=None, batch_interval=None):
+        """
+        Args:
+            batch_size (int, optional): max samples per batch
+            batch_interval (float, optional): max seconds between the first
+                sample in a batch and sending it.
+        """
+        if batch_size is None and batch_interval is None:
+            raise ValueError("Need to provide either batch_size or batch_interval")
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._samples = []
+        self._first_time = None
+
+    def add(self, sample):
+        """
+        Add a sample.
+
+        Returns:
+            dict: a batch (see make_batch) if one is ready, otherwise None.
+        """
+        if not self._samples:
+            self._first_time = monotonic()
+        self._samples.append(sample)
+        if self.batch_size is not None and len(self._samples) >= self.batch_size:
+            return self.flush()
+        if (self.batch_interval is not None and
+                monotonic() - self._first_time >= self.batch_interval):
+            return self.flush()
+        return None
+
+    def flush(self):
+        """
+        Returns:
+            dict: batch containing any samples collected so far, or None if
+                there aren't any.
+        """
+        if not self._samples:
+            return None
+        samples, self._samples = self._samples, []
+        return make_batch(samples)
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class LatencyStats(object):
+    """
+    Thread-safe summary of a stream of durations. Mean and max are over
+    everything recorded, percentiles over the most recent window values.
+    """
+    def __init__(self, window=1000):
+        self._values = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+        self._last = 0.0
+
+    def add(self, value):
+        with self._lock:
+            self._values.append(value)
+            self._count += 1
+            self._total += value
+            self._max = max(self._max, value)
+            self._last = value
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: "count", "last", "mean", "max", "p50", "p90" and "p99"
+        """
+        with self._lock:
+            values = sorted(self._values)
+            res = {
+                "count": self._count,
+                "last": self._last,
+                "mean": self._total / self._count if self._count else 0.0,
+                "max": self._max
+            }
+        for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+            if values:
+                res[name] = values[min(int(q * len(values)), len(values) - 1)]
+            else:
+                res[name] = 0.0
+        return res
+
+
+class LastValueCache(object):
+    """
+    Thread-safe store of the most recent value published on each topic.
+    Values are kept as is, so updating costs a dict assignment, and
+    raw buffers are only copied when a snapshot is taken.
+    """
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def update(self, topic, value):
+        with self._lock:
+            self._values[topic_bytes(topic)] = value
+
+    def get(self, topic, default=None):
+        with self._lock:
+            return self._values.get(topic_bytes(topic), default)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: topic (str) -> latest value. Values that support the
+                buffer protocol are returned as bytes, so that the snapshot
+                can be serialized.
+        """
+        with self._lock:
+            values = list(self._values.items())
+        return dict(
+            (topic.decode("utf-8"),
+             memoryview(value).tobytes() if _is_buffer(value) else value)
+            for topic, value in values
+        )
+
+    def __len__(self):
+        with self._lock:
+            return len(self._values)
+
+
+def _changed(old, new):
+    try:
+        return bool(old != new)
+    except ValueError:
+        # eg numpy arrays, whose comparison is elementwise
+        return True
+
+
+class DeltaEncoder(object):
+    """
+    Turn a stream of dict samples into keyframes and deltas.
+
+    Every keyframe_interval samples, the whole sample is sent as a keyframe:
+
+        {"key": key, "full": sample}
+
+    In between, only the fields that differ from the last keyframe are sent:
+
+        {"key": key, "set": {field: value, ...}, "del": [field, ...]}
+
+    Deltas are taken against the keyframe rather than the previous sample, so
+    a subscriber that misses or conflates away some deltas still rebuilds
+    the right state from the next one it gets. A missed keyframe can't be
+    made up for that way: deltas against it are discarded (see
+    DeltaDecoder) until the next keyframe, which ``force_keyframe`` can
+    bring forward, eg when a new subscriber shows up. Samples that aren't
+    dicts are passed through as they are.
+    """
+    def __init__(self, keyframe_interval=100):
+        """
+        Args:
+            keyframe_interval (int, optional): samples between keyframes
+        """
+        self.keyframe_interval = keyframe_interval
+        # start from a random key, so that a restarted publisher's deltas
+        # don't get applied to the previous publisher's keyframe
+        self._key = random.randint(0, 2**31)
+        self._keyframe = None
+        self._since_keyframe = 0
+
+    def force_keyframe(self):
+        """
+        Send the next sample as a keyframe, whatever keyframe_interval says.
+        """
+        self._keyframe = None
+
+    def encode(self, sample):
+        """
+        Returns:
+            tuple: payload, and header flags to send it with
+        """
+        if not isinstance(sample, dict):
+            self._keyframe = None
+            return sample, 0
+        if (self._keyframe is None or
+                self._since_keyframe >= self.keyframe_interval):
+            self._key += 1
+            self._keyframe = dict(sample)
+            self._since_keyframe = 1
+            return {"key": self._key, "full": self._keyframe}, FLAG_DELTA
+        self._since_keyframe += 1
+        keyframe = self._keyframe
+        return {
+            "key": self._key,
+            "set": dict((field, value) for field, value in sample.items()
+                        if field not in keyframe or _changed(keyframe[field], value)),
+            "del": [field for field in keyframe if field not in sample]
+        }, FLAG_DELTA
+
+
+class DeltaDecoder(object):
+    """
+    Rebuild samples sent by DeltaEncoder, keeping a keyframe per topic.
+    Thread-safe.
+    """
+    def __init__(self):
+        self._keyframes = {}
+        self._lock = threading.Lock()
+
+    def decode(self, topic, payload):
+        """
+        Args:
+            topic (bytes): topic payload was received on
+            payload (dict): keyframe or delta
+        Returns:
+            dict: the full sample, or None if payload is a delta against a
+                keyframe that wasn't received.
+        """
+        with self._lock:
+            if "full" in payload:
+                self._keyframes[topic] = (payload["key"], payload["full"])
+                return dict(payload["full"])
+            key, keyframe = self._keyframes.get(topic, (None, None))
+        if key != payload["key"]:
+            return None
+        sample = dict(keyframe)
+        sample.update(payload["set"])
+        for field in payload["del"]:
+            sample.pop(field, None)
+        return sample
+
+
+class SequenceTracker(object):
+    """
+    Thread-safe per topic accounting of sequence numbers and latency of
+    received messages:
+
+    * "received": messages seen
+    * "gaps": times one or more messages went missing
+    * "missing": messages that never arrived, as far as we know. A message
+      that turns up late is taken back off this count.
+    * "reordered": messages that arrived after a later one
+    * "restarts": times the sequence started over at 1, eg because the
+      publisher was restarted
+    * "latency": time from publishing to ``track`` being called, in seconds
+      (see LatencyStats). Publish times are taken with ``monotonic``, so
+      this is only meaningful when publisher and subscriber share a host.
+
+    Unnumbered messages (seq 0) only count towards "received".
+    """
+    fields = ("received", "gaps", "missing", "reordered", "restarts")
+
+    def __init__(self, window=1000):
+        """
+        Args:
+            window (int, optional): latency percentiles are over this many
+                most recent messages (1000)
+        """
+        self.window = window
+        self._last = {}
+        self._counters = TopicCounters(self.fields)
+        self._latency = {}
+        self._lock = threading.Lock()
+
+    def track(self, topic, header, now=None):
+        """
+        Args:
+            topic (bytes): topic message was received on
+            header (MessageHeader): message's header
+            now (float, optional): receive time. Defaults to monotonic()
+        Returns:
+            int: number of messages found missing just before this one
+        """
+        counters = self._counters
+        counters.increment(topic, "received")
+        if header.seq == 0:
+            return 0
+        if now is None:
+            now = monotonic()
+        with self._lock:
+            last = self._last.get(topic, 0)
+            if topic not in self._latency:
+                self._latency[topic] = LatencyStats(self.window)
+            latency = self._latency[topic]
+            if header.seq > last or header.seq == 1:
+                self._last[topic] = header.seq
+        latency.add(now - header.timestamp)
+        if header.seq == 1 and last > 0:
+            counters.increment(topic, "restarts")
+        elif header.seq > last + 1 and last > 0:
+            counters.increment(topic, "gaps")
+            counters.increment(topic, "missing", header.seq - last - 1)
+            return header.seq - last - 1
+        elif header.seq <= last:
+            counters.increment(topic, "reordered")
+            counters.increment(topic, "missing", -1)
+        return 0
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: topic (str) -> dict of counters, plus "last_seq" and
+                "latency"
+        """
+        stats = self._counters.as_dict()
+        with self._lock:
+            for topic, last in self._last.items():
+                name = topic.decode("utf-8") if isinstance(topic, bytes) else topic
+                stats[name]["last_seq"] = last
+                stats[name]["latency"] = self._latency[topic].as_dict()
+        return stats
+
+
+class SubscriptionTracker(object):
+    """
+    Thread-safe count of active subscriptions per topic prefix, kept from
+    the subscribe (``b"\\x01" + prefix``) and unsubscribe (``b"\\x00" +
+    prefix``) messages an XPUB socket receives.
+
+    XPUB only passes on the first subscription to and last unsubscription
+    from each prefix, unless XPUB_VERBOSER is set (see ``verbose_xpub``).
+    Without it, counts are just 0 or 1, which is still enough to tell
+    whether anybody is listening.
+    """
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def update(self, message):
+        """
+        Args:
+            message (bytes): message received on an XPUB socket
+        Returns:
+            tuple: prefix (bytes) and its subscription count before and
+                after the message, or None if message isn't a subscribe or
+                unsubscribe message.
+        """
+        kind, prefix = message[:1], bytes(message[1:])
+        if kind not in (b"\x00", b"\x01"):
+            return None
+        with self._lock:
+            before = self._counts.get(prefix, 0)
+            after = before + 1 if kind == b"\x01" else max(before - 1, 0)
+            if after:
+                self._counts[prefix] = after
+            else:
+                self._counts.pop(prefix, None)
+        return prefix, before, after
+
+    def subscribers(self, topic):
+        """
+        Args:
+            topic (bytes): topic messages would be published on
+        Returns:
+            int: number of subscriptions that topic matches
+        """
+        with self._lock:
+            return sum(count for prefix, count in self._counts.items()
+                       if topic.startswith(prefix))
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: prefix (str) -> number of subscriptions. Subscriptions to
+                every topic are under "".
+        """
+        with self._lock:
+            return dict((prefix.decode("utf-8"), count)
+                        for prefix, count in self._counts.items())
+
+
+def verbose_xpub(socket):
+    """
+    Have an XPUB socket pass on every subscribe and unsubscribe message,
+    rather than just the first and last for each prefix, where zmq supports
+    it. Returns whether it does.
+    """
+    if hasattr(zmq, "XPUB_VERBOSER"):
+        socket.setsockopt(zmq.XPUB_VERBOSER, 1)
+        return True
+    return False
+
+
+DROP_REPORT = b"\x02"
+_drop_count = struct.Struct("!I")
+
+
+def pack_drop_report(topic, count):
+    """
+    Create the message a subscriber sends upstream, on an XSUB socket, when
+    messages on topic went missing. Subscribe and unsubscribe messages start
+    with 1 and 0; drop reports start with DROP_REPORT, followed by count and
+    topic.
+
+    Args:
+        topic (str/bytes): topic messages went missing on
+        count (int): number of messages missing
+    Returns:
+        bytes
+    """
+    return DROP_REPORT + _drop_count.pack(min(count, 0xffffffff)) + topic_bytes(topic)
+
+
+def unpack_drop_report(message):
+    """
+    Undo ``pack_drop_report``.
+
+    Args:
+        message (bytes): message received on an XPUB socket
+    Returns:
+        tuple: topic (bytes) and count, or None if message isn't a drop
+            report.
+    """
+    start = len(DROP_REPORT) + _drop_count.size
+    if message[:len(DROP_REPORT)] != DROP_REPORT or len(message) < start:
+        return None
+    count = _drop_count.unpack_from(message, len(DROP_REPORT))[0]
+    return bytes(message[start:]), count
+
+
+class RateController(object):
+    """
+    Slows a publisher down while its subscribers can't keep up, and speeds
+    it back up once they can, so that overload turns into down-sampling
+    rather than messages being dropped at random.
+
+    The publisher reports what it sees after each message (``update``):
+    messages dropped since the last call, and how full its subscribers'
+    queues are (0 to 1). Every interval seconds, if anything was dropped or
+    the queues got more than lag_threshold full, the slowdown factor is
+    multiplied by backoff, up to max_slowdown. Otherwise it's multiplied by
+    recovery, down to 1.
+
+    In "rate" mode, the publisher multiplies its period by the slowdown
+    factor, so data_cb is called less often. In "decimate" mode, data_cb is
+    still called at the normal rate, but only one in every ``slowdown``
+    samples is sent (see ``skip``).
+    """
+    modes = ("rate", "decimate")
+
+    def __init__(self, max_slowdown=10.0, mode="rate", backoff=2.0,
+                 recovery=0.8, interval=1.0, lag_threshold=0.5):
+        """
+        Args:
+            max_slowdown (float, optional): largest slowdown factor (10.0)
+            mode (str, optional): "rate" or "decimate" ("rate")
+            backoff (float, optional): factor to slow down by when
+                congested (2.0)
+            recovery (float, optional): factor to speed up by when not
+                congested (0.8)
+            interval (float, optional): seconds between adjustments (1.0)
+            lag_threshold (float, optional): queue fill fraction above which
+                subscribers count as lagging (0.5)
+        """
+        if mode not in self.modes:
+            raise ValueError("Don't recognize mode {}".format(mode))
+        self.max_slowdown = max_slowdown
+        self.mode = mode
+        self.backoff = backoff
+        self.recovery = recovery
+        self.interval = interval
+        self.lag_threshold = lag_threshold
+        self.slowdown = 1.0
+        self.slowdowns = 0
+        self.speedups = 0
+        self.skipped = 0
+        self.effective_rate = None
+        self._congested = False
+        self._sent = 0
+        self._count = 0
+        self._last = None
+        self._lock = threading.Lock()
+
+    def update(self, dropped=0, lag=0.0, now=None):
+        """
+        Record one sent message, and what the publisher saw while sending it.
+
+        Args:
+            dropped (int, optional): messages dropped since the last call
+            lag (float, optional): how full subscribers' queues are, from 0
+                (empty) to 1 (full)
+            now (float, optional): Defaults to monotonic()
+        Returns:
+            float: slowdown factor
+        """
+        if now is None:
+            now = monotonic()
+        with self._lock:
+            self._sent += 1
+            if dropped > 0 or lag > self.lag_threshold:
+                self._congested = True
+            if self._last is None:
+                self._last = now
+            elapsed = now - self._last
+            if elapsed < self.interval:
+                return self.slowdown
+            self.effective_rate = self._sent / elapsed
+            if self._congested and self.slowdown < self.max_slowdown:
+                self.slowdown = min(self.slowdown * self.backoff, self.max_slowdown)
+                self.slowdowns += 1
+            elif not self._congested and self.slowdown > 1.0:
+                self.slowdown = max(self.slowdown * self.recovery, 1.0)
+                self.speedups += 1
+            self._congested = False
+            self._sent = 0
+            self._last = now
+            return self.slowdown
+
+    def skip(self):
+        """
+        Returns:
+            bool: whether the publisher should skip sending this sample. Only
+                ever True in "decimate" mode.
+        """
+        if self.mode != "decimate":
+            return False
+        with self._lock:
+            self._count += 1
+            if self._count < int(round(self.slowdown)):
+                self.skipped += 1
+                return True
+            self._count = 0
+            return False
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: "mode", "slowdown", "slowdowns", "speedups", "skipped" and
+                "effective_rate", the messages per second published over the
+                last interval (None until the first interval is over).
+        """
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "slowdown": self.slowdown,
+                "slowdowns": self.slowdowns,
+                "speedups": self.speedups,
+                "skipped": self.skipped,
+                "effective_rate": self.effective_rate
+            }
+
+
+# fastest first
+TRANSPORTS = ("inproc", "ipc", "tcp")
+
+_endpoint_ids = itertools.count()
+
+
+def make_endpoints(transports=TRANSPORTS, host="*", port=None, name=None):
+    """
+    Pick addresses for a publisher to bind on each of transports. ipc is
+    left out where zmq doesn't support it.
+
+    inproc only works between sockets created in the same zmq context, so
+    publishers and subscribers using it should both use
+    zmq.Context.instance().
+
+    Args:
+        transports (tuple, optional): any of "inproc", "ipc" and "tcp"
+            (TRANSPORTS)
+        host (str, optional): tcp host ("*")
+        port (int, optional): tcp port. Required if transports include tcp.
+        name (str, optional): used to make inproc and ipc addresses unique.
+            Defaults to one based on the process id.
+    Returns:
+        dict:
+            * "host" (str): host name of this machine
+            * "pid" (int): id of this process
+            * "addresses" (dict): transport -> address
+    """
+    if name is None:
+        name = "{}_{}".format(os.getpid(), next(_endpoint_ids))
+    addresses = {}
+    for transport in transports:
+        if transport == "inproc":
+            addresses["inproc"] = "inproc://support_pyro_{}".format(name)
+        elif transport == "ipc":
+            if zmq.has("ipc"):
+                addresses["ipc"] = "ipc://{}".format(os.path.join(
+                    tempfile.gettempdir(), "support_pyro_{}".format(name)))
+        elif transport == "tcp":
+            if port is None:
+                raise ValueError("tcp transport needs a port")
+            addresses["tcp"] = "tcp://{}:{}".format(host, port)
+        else:
+            raise ValueError("Don't recognize transport {}".format(transport))
+    return {
+        "host": gethostname(),
+        "pid": os.getpid(),
+        "addresses": addresses
+    }
+
+
+def remove_ipc_file(address):
+    """
+    zmq leaves the file behind an ipc endpoint in place when the socket
+    bound to it closes. Remove it, if address is an ipc address.
+    """
+    if address.startswith("ipc://"):
+        try:
+            os.remove(address[len("ipc://"):])
+        except OSError:
+            pass
+
+
+def resolve_address(endpoints, localhost="localhost"):
+    """
+    Pick the fastest of a publisher's addresses (see make_endpoints) that
+    can be reached from here: inproc from the same process, ipc from the
+    same host, and tcp otherwise.
+
+    Args:
+        endpoints (dict): publisher's endpoints
+        localhost (str, optional): replaces "*" in tcp addresses
+            ("localhost")
+    Returns:
+        str: address to connect to
+    """
+    addresses = endpoints["addresses"]
+    same_host = endpoints.get("host") == gethostname()
+    same_process = same_host and endpoints.get("pid") == os.getpid()
+    if same_process and "inproc" in addresses:
+        return addresses["inproc"]
+    if same_host and "ipc" in addresses and zmq.has("ipc"):
+        return addresses["ipc"]
+    if "tcp" in addresses:
+        return addresses["tcp"].replace("*", localhost)
+    raise ValueError("None of {} can be reached from here".format(
+        sorted(addresses.values())))
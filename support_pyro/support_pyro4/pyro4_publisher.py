@@ -0,0 +1,447 @@
+from __future__ import print_function
+import logging
+
+import zmq
+import Pyro5.socketutil
+
+from .configuration import config
+from .pubsub_util import (make_endpoints, batch_samples, TRANSPORTS,
+                          FLAG_RAW, FLAG_BATCH)
+from .publisher_threads import (ZmqPublisherThread, ZmqBroker,
+                                ShmPublisherThread, Pyro4PublisherThread)
+from .shm_ring import shm_path, ADDRESS_PREFIX
+from .replay_log import ReplayLog
+from .serializers import get_serializer, RecordSchema, SchemaSerializer
+
+__all__ = ["ZmqPublisherThread", "ZmqBroker", "ShmPublisherThread",
+           "Pyro4PublisherThread", "Pyro4PublisherServer"]
+
+module_logger = logging.getLogger(__name__)
+
+
+class Pyro4PublisherServer(object):
+    """
+    Publish the result of ``get_publisher_data``, using one of these
+    backends:
+
+    * "zmq": a zmq XPUB socket (ZmqPublisherThread)
+    * "pyro4": callbacks registered with ``register_callback``
+      (Pyro4PublisherThread)
+    * "shm": a shared memory ring buffer (ShmPublisherThread), for
+      subscribers on the same host. publisher_address is then the path to
+      the ring buffer file, prefixed with "shm://".
+
+    With the "zmq" and "shm" backends, calling ``register_schema`` before
+    starting to publish sends samples as fixed-size binary records instead
+    of serializing them (see serializers.SchemaSerializer). Subscribers get
+    the schema from ``publisher_schema``.
+
+    With the "zmq" backend, calling ``use_broker`` before starting to
+    publish sends messages through a ZmqBroker shared with other servers,
+    on a topic of this server's own, instead of binding a port.
+
+    With the "zmq" and "shm" backends, calling ``create_replay_log`` before
+    starting to publish logs every sample, so subscribers can catch up on
+    what they missed with ``replay``.
+
+    The server is a plain object: register it on a Pyro5 daemon, or hand it
+    to Pyro5Server as obj.
+    """
+    backend = "zmq"
+    def __init__(self, name=None, logger=None):
+        """
+        Args:
+            name (str, optional): server name, and default broker topic.
+                Defaults to the class name.
+            logger (logging.getLogger, optional): logging instance.
+        """
+        if name is None:
+            name = self.__class__.__name__
+        if logger is None:
+            logger = module_logger.getChild(name)
+        self.name = name
+        self.logger = logger
+        self.publisher_thread = None
+        self.publisher_context = None
+        self._publisher_address = None
+        self.replay_log = None
+        self._replay_serializer = get_serializer("serpent")
+        self.broker = None
+        self._publisher_topic = ""
+        self._publisher_endpoints = None
+        self.schema = None
+
+    def create_zmq_context(self,host=None, port=None, transports=TRANSPORTS):
+        """
+        Create a zmq socket of the publisher type.
+        This method sets the publisher_address, publisher_endpoints and
+        publisher_socket attributes.
+        The publisher listens on each of transports, and subscribers connect
+        over the fastest one they can reach (see pubsub_util.resolve_address).
+        Keyword Arguments:
+            host (str):
+            port (str): only needed for tcp. Defaults to a probably unused
+                port.
+            transports (tuple): any of "inproc", "ipc" and "tcp"
+        Returns:
+            tuple: context, and the tcp address if publishing over tcp, or
+                else the address of the first transport.
+        """
+        if host is None: host = "*"
+        if port is None and "tcp" in transports:
+            port = Pyro5.socketutil.find_probably_unused_port()
+        context = zmq.Context.instance()
+        endpoints = make_endpoints(transports, host=host, port=port)
+        addresses = endpoints["addresses"]
+        if "tcp" in addresses:
+            address = addresses["tcp"]
+        else:
+            address = [addresses[t] for t in transports if t in addresses][0]
+
+        self._publisher_address = address
+        self._publisher_endpoints = endpoints
+        self.publisher_context = context
+
+        return context, address
+
+    def use_broker(self, broker, topic=None):
+        """
+        Publish through a ZmqBroker shared with other publishers, instead of
+        on a port of our own. Subscribers then connect to the broker's
+        backend address, and only subscribe to topic.
+        This method sets the broker, publisher_address and
+        publisher_context attributes.
+        Args:
+            broker (ZmqBroker): broker to publish through
+        Keyword Arguments:
+            topic (str): topic to publish on, to tell this server's messages
+                apart from those of other publishers using the same broker.
+                Defaults to the server's name.
+        Returns:
+            str: address
+        """
+        if topic is None: topic = self.name
+        self.broker = broker
+        self.publisher_context = broker.context
+        self._publisher_address = broker.backend_address
+        self._publisher_endpoints = None
+        self._publisher_topic = topic
+        return self._publisher_address
+
+    def create_shm_address(self, path=None):
+        """
+        Pick the file to use as the "shm" backend's ring buffer.
+        This method sets the publisher_address attribute.
+        Keyword Arguments:
+            path (str): Defaults to a new file in /dev/shm, if it exists.
+        Returns:
+            str: address
+        """
+        if path is None: path = shm_path()
+        self._publisher_address = ADDRESS_PREFIX + path
+        return self._publisher_address
+
+    def register_schema(self, fields, byte_order="<"):
+        """
+        Publish samples as fixed-size binary records with this layout.
+        This method sets the schema attribute.
+        Args:
+            fields (list/RecordSchema): (name, struct format character)
+                pairs, eg ``[("time", "d"), ("temperature", "f")]``, or a
+                RecordSchema
+        Keyword Arguments:
+            byte_order (str): "<" or ">"
+        Returns:
+            RecordSchema
+        """
+        if not isinstance(fields, RecordSchema):
+            fields = RecordSchema(fields, byte_order=byte_order)
+        self.schema = fields
+        return self.schema
+
+    @config.expose
+    def publisher_schema(self):
+        """
+        Returns:
+            dict: the schema samples are published with (see
+                RecordSchema.as_dict), or None if they're just serialized.
+        """
+        if self.schema is None:
+            return None
+        return self.schema.as_dict()
+
+    def create_replay_log(self, directory, **kwargs):
+        """
+        Log published samples from now on.
+        This method sets the replay_log attribute.
+        Args:
+            directory (str): where to keep log segments
+            kwargs: passed to ReplayLog
+        Returns:
+            ReplayLog
+        """
+        self.replay_log = ReplayLog(directory, **kwargs)
+        return self.replay_log
+
+    @config.expose
+    def replay(self, from_seq=None, from_time=None, max_records=None,
+               chunk_size=1000):
+        """
+        Stream logged samples, oldest first, in chunks so that catching up
+        doesn't take a round trip per sample.
+
+        For the zmq backend, sequence numbers are the ones in the headers of
+        the messages samples were published in (see ZmqPublisherThread), so
+        a subscriber can pick up after the last sequence number it received.
+        Samples from one batch share theirs.
+
+        Keyword Args:
+            from_seq (int): first sequence number to send. Defaults to the
+                oldest sample kept.
+            from_time (float): if from_seq isn't given, send samples
+                published at or after this time.
+            max_records (int): stop after this many records, ie messages
+            chunk_size (int): samples per chunk
+        Returns:
+            generator: lists of dicts with "seq", "time" and "data" keys
+        """
+        if self.replay_log is None:
+            raise RuntimeError("No replay log, call `create_replay_log` first")
+        records = self.replay_log.read(from_seq=from_seq, from_time=from_time,
+                                       max_records=max_records)
+        return self._replay_chunks(records, chunk_size)
+
+    def _replay_chunks(self, records, chunk_size):
+        chunk = []
+        for seq, timestamp, flags, payload in records:
+            if flags & FLAG_RAW:
+                samples = [payload]
+            elif flags & FLAG_BATCH:
+                samples = batch_samples(
+                    self._replay_serializer.loads_batch_frames([payload]))
+            else:
+                samples = [self._replay_serializer.loads(payload)]
+            for data in samples:
+                chunk.append({"seq": seq, "time": timestamp, "data": data})
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @config.expose
+    @property
+    def publisher_address(self):
+        return self._publisher_address
+
+    @config.expose
+    @property
+    def publisher_endpoints(self):
+        """
+        dict: publisher's addresses per transport, with its host and process
+            id (see pubsub_util.make_endpoints), or None if it only has
+            publisher_address.
+        """
+        return self._publisher_endpoints
+
+    @config.expose
+    @property
+    def publisher_topic(self):
+        return self._publisher_topic
+
+    def get_publisher_data(self):
+        raise NotImplementedError("Subclass needs to implement this method")
+
+    @config.expose
+    def publisher_stats(self):
+        """
+        Get statistics from the publishing thread.
+
+        Returns:
+            dict: None if not publishing. Otherwise:
+                * "schedule" (dict): fixed-rate scheduling statistics (see
+                  FixedRateScheduler.stats), or None if the publisher isn't
+                  running on a fixed-rate grid.
+                * "messages" (dict): per topic message counters (see
+                  ZmqPublisherThread.message_stats), or None for the pyro4
+                  backend.
+                * "fanout" (dict): callback delivery statistics (see
+                  Pyro4PublisherThread.fanout_stats), or None for the zmq
+                  backend.
+                * "subscribers" (dict): number of subscriptions per topic
+                  prefix, or None if they aren't tracked. Through a broker,
+                  these are the broker's counts.
+                * "idle" (bool): whether the publisher is waiting for a
+                  subscriber instead of publishing.
+                * "rate" (dict): adaptive rate statistics, including the
+                  effective rate (see ZmqPublisherThread.rate_stats), or
+                  None without a rate controller.
+        """
+        if self.publisher_thread is None:
+            return None
+        message_stats = getattr(self.publisher_thread, "message_stats", None)
+        fanout_stats = getattr(self.publisher_thread, "fanout_stats", None)
+        subscriber_counts = getattr(self.publisher_thread, "subscriber_counts", None)
+        rate_stats = getattr(self.publisher_thread, "rate_stats", None)
+        if self.broker is not None:
+            subscriber_counts = self.broker.subscriber_counts
+        return {
+            "schedule": self.publisher_thread.schedule_stats(),
+            "messages": message_stats() if message_stats is not None else None,
+            "fanout": fanout_stats() if fanout_stats is not None else None,
+            "subscribers": subscriber_counts() if subscriber_counts is not None else None,
+            "idle": getattr(self.publisher_thread, "idle", False),
+            "rate": rate_stats() if rate_stats is not None else None
+        }
+
+    @config.expose
+    def publisher_snapshot(self):
+        """
+        Get the latest sample published on each topic, so that a subscriber
+        can show current state right away instead of waiting for the next
+        update.
+
+        Returns:
+            dict: topic (str) -> latest sample. Empty if not publishing.
+        """
+        if self.publisher_thread is None:
+            return {}
+        return self.publisher_thread.snapshot()
+
+    @config.expose
+    def report_drops(self, count):
+        """
+        Tell the zmq publisher that a subscriber missed count messages (see
+        ZmqPublisherThread.report_drops). Ignored by the other backends.
+        """
+        report_drops = getattr(self.publisher_thread, "report_drops", None)
+        if report_drops is not None:
+            report_drops(count)
+
+    @config.expose
+    def start_publishing(self,update_rate,
+                        create_zmq_context_kwargs=None,
+                        pyro4_publisher_thread_kwargs=None,
+                        zmq_publisher_thread_kwargs=None,
+                        create_shm_address_kwargs=None,
+                        shm_publisher_thread_kwargs=None):
+
+        if create_zmq_context_kwargs is None: create_zmq_context_kwargs = {}
+        if pyro4_publisher_thread_kwargs is None: pyro4_publisher_thread_kwargs = {}
+        if zmq_publisher_thread_kwargs is None: zmq_publisher_thread_kwargs = {}
+        if create_shm_address_kwargs is None: create_shm_address_kwargs = {}
+        if shm_publisher_thread_kwargs is None: shm_publisher_thread_kwargs = {}
+        if self.schema is not None:
+            zmq_publisher_thread_kwargs.setdefault("serializer", SchemaSerializer(self.schema))
+            shm_publisher_thread_kwargs.setdefault("serializer", SchemaSerializer(self.schema))
+        if self.replay_log is not None:
+            zmq_publisher_thread_kwargs.setdefault("replay_log", self.replay_log)
+            shm_publisher_thread_kwargs.setdefault("replay_log", self.replay_log)
+        self.logger.debug("Starting Publishing")
+        if self.publisher_thread is not None:
+            self.logger.info(("Cannot start publishing: Publishing already started. "
+                              "If you're attempting to restart publishing, then first "
+                              "call `stop_publishing` method, and then `start_publishing`"))
+            return
+
+        if self.backend == "pyro4":
+
+            self.publisher_thread = Pyro4PublisherThread(update_rate, self.get_publisher_data,
+                                                    **pyro4_publisher_thread_kwargs)
+
+
+        elif self.backend == "zmq":
+            try:
+                address = self._publisher_address
+                if self.broker is not None:
+                    address = self.broker.frontend_address
+                    zmq_publisher_thread_kwargs["connect"] = True
+                    zmq_publisher_thread_kwargs.setdefault("topic", self._publisher_topic)
+                else:
+                    if self.publisher_context is None and address is None:
+                        self.create_zmq_context(**create_zmq_context_kwargs)
+                    address = self._publisher_address
+                    if self._publisher_endpoints is not None:
+                        address = list(self._publisher_endpoints["addresses"].values())
+
+                self.publisher_thread = ZmqPublisherThread(update_rate,
+                                                            self.get_publisher_data,
+                                                            self.publisher_context,
+                                                            address,
+                                                            **zmq_publisher_thread_kwargs)
+            except Exception as err:
+                self.logger.error(err, exc_info=True)
+
+        elif self.backend == "shm":
+            try:
+                if self._publisher_address is None:
+                    self.create_shm_address(**create_shm_address_kwargs)
+
+                self.publisher_thread = ShmPublisherThread(update_rate,
+                                                           self.get_publisher_data,
+                                                           self._publisher_address[len(ADDRESS_PREFIX):],
+                                                           **shm_publisher_thread_kwargs)
+            except Exception as err:
+                self.logger.error(err, exc_info=True)
+
+        serializer = getattr(self.publisher_thread, "serializer", None)
+        if serializer is not None:
+            self._replay_serializer = serializer
+
+        try:
+            self.publisher_thread.start()
+        except Exception as err:
+            self.logger.error(err, exc_info=True)
+
+    @config.expose
+    def unpause_publishing(self):
+        """
+        Unpause publishing thread
+        """
+        self.logger.debug("Unpausing publishing")
+        if self.publisher_thread is None:
+            self.logger.debug("No publisher thread to unpause")
+        else:
+            self.publisher_thread.unpause_thread()
+
+    @config.expose
+    def pause_publishing(self):
+        """
+        Pause publishing thread
+        """
+        self.logger.debug("Pausing publishing")
+        if self.publisher_thread is None:
+            self.logger.debug("No publisher thread to pause")
+        else:
+            self.publisher_thread.pause_thread()
+
+    @config.expose
+    def stop_publishing(self):
+        """
+        Stop publishing thread
+        """
+        self.logger.debug("Stopping publishing")
+        if self.publisher_thread is None:
+            self.logger.debug("No publisher thread to pause")
+        else:
+            self.publisher_thread.pause_thread()
+            self.publisher_thread.stop_thread()
+            self.publisher_thread = None
+
+    @config.expose
+    def register_callback(self, cb_info, socket_info=None):
+        """
+        Register some callback with the publisher thread, if using the Pyro4
+        publishing backend.
+        Args:
+            cb_info (dict): Callback info dictionary.
+        Keyword Args:
+            socket_info (dict): Optional socket info argument.
+        """
+        if self.backend == "pyro4":
+            if self.publisher_thread is not None:
+                self.publisher_thread.register_callback(cb_info, socket_info=socket_info)
+
+        else:
+            self.logger.debug(("register_callback not implemented for {} backend "
+                                "as it is unaware of client side callbacks.").format(self.backend))
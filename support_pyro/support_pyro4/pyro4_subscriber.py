@@ -0,0 +1,175 @@
+from __future__ import print_function
+
+import zmq
+
+from .pyro4_client import Pyro4Client
+from .pubsub_util import resolve_address
+from .subscriber_threads import (ZmqSubscriberThread, ShmSubscriberThread,
+                                 ZmqSubscriberHub)
+from .shm_ring import ADDRESS_PREFIX
+from .serializers import get_serializer, SchemaSerializer
+
+__all__ = ["ZmqSubscriberThread", "ShmSubscriberThread", "ZmqSubscriberHub",
+           "Pyro4Subscriber"]
+
+
+class Pyro4Subscriber(Pyro4Client):
+
+    backend = "zmq"
+
+    def __init__(self, *args, **kwargs):
+        Pyro4Client.__init__(self, *args, **kwargs)
+        self.subscriber_thread = None
+        self.context = None
+        self.subscriber_address = None
+        self.hub = None
+        self.hub_subscription = None
+
+    def consume(self, data):
+        raise NotImplementedError("Subclass should reimplement this")
+
+    def consume_snapshot(self):
+        """
+        Ask the publisher for the latest sample on each topic, and pass them
+        to ``consume``.
+
+        Returns:
+            int: number of samples consumed
+        """
+        try:
+            snapshot = self.server.publisher_snapshot()
+        except Exception as err:
+            self.logger.error("Couldn't get publisher snapshot: {}".format(err))
+            return 0
+        for topic in sorted(snapshot):
+            self.consume(snapshot[topic])
+        return len(snapshot)
+
+    def catch_up(self, from_seq=None, from_time=None, max_records=None):
+        """
+        Pass samples logged by the publisher (see
+        Pyro4PublisherServer.replay) to ``consume``, oldest first.
+
+        Sequence numbers are the ones in zmq message headers, so they match
+        what the subscriber thread's ``sequence_stats`` reports.
+
+        Keyword Args:
+            from_seq (int): first sequence number to consume
+            from_time (float): if from_seq isn't given, consume samples
+                published at or after this time.
+            max_records (int): stop after this many records
+        Returns:
+            int: sequence number of the last sample consumed, or None if
+                there weren't any.
+        """
+        last_seq = None
+        for chunk in self.server.replay(from_seq=from_seq, from_time=from_time,
+                                        max_records=max_records):
+            for record in chunk:
+                self.consume(record["data"])
+                last_seq = record["seq"]
+        return last_seq
+
+    def publisher_serializer(self):
+        """
+        Returns:
+            Serializer: a SchemaSerializer if the publisher sends samples as
+                binary records (see Pyro4PublisherServer.register_schema),
+                else the default serializer.
+        """
+        try:
+            schema = self.server.publisher_schema()
+        except AttributeError:
+            schema = None
+        if schema:
+            return SchemaSerializer(schema)
+        return get_serializer("serpent")
+
+    def start_subscribing(self, hub=None, snapshot=True):
+        """
+        Start receiving messages from the publisher, over the fastest
+        transport it listens on that can be reached from here (see
+        pubsub_util.resolve_address).
+
+        Keyword Args:
+            hub (ZmqSubscriberHub): If given, subscribe through this hub,
+                instead of starting a new ZmqSubscriberThread. This lets many
+                subscribers share a single thread.
+            snapshot (bool): Consume the publisher's latest samples (see
+                consume_snapshot) before subscribing, so current state is
+                available without waiting for the next update.
+        """
+        if self.backend == "zmq":
+            endpoints = getattr(self.server, "publisher_endpoints", None)
+            if endpoints:
+                address = resolve_address(endpoints)
+            else:
+                address = self.server.publisher_address
+                if ("*" in address):
+                    address = address.replace("*","localhost")
+            self.logger.debug("Starting subscribing at {}".format(address))
+            self.subscriber_address = address
+            if snapshot:
+                self.consume_snapshot()
+            serializer = self.publisher_serializer()
+            if address.startswith(ADDRESS_PREFIX):
+                if hub is not None:
+                    raise ValueError("Can't subscribe to shared memory through a hub")
+                self.subscriber_thread = ShmSubscriberThread(
+                    self.consume, address[len(ADDRESS_PREFIX):],
+                    serializer=serializer)
+                self.subscriber_thread.start()
+                return
+            # publishers sharing a ZmqBroker each publish on a topic of their own
+            topic = getattr(self.server, "publisher_topic", "") or ""
+            if hub is not None:
+                self.hub = hub
+                self.hub_subscription = hub.subscribe(address, self.consume, topic=topic,
+                                                      serializer=serializer)
+                return
+            if address.startswith("inproc://"):
+                # only reachable from the publisher's own context
+                context = zmq.Context.instance()
+            else:
+                context = zmq.Context()
+            self.context = context
+            self.subscriber_thread = ZmqSubscriberThread(self.consume, context, address,
+                                                         topic=topic,
+                                                         serializer=serializer)
+            self.subscriber_thread.start()
+        else:
+            raise NotImplementedError("`start_subscribing` not implemented for backend \"{}\"".format(self.backend))
+
+    def pause_subscribing(self):
+
+        self.logger.debug("Pausing subscribing")
+        if self.hub_subscription is not None:
+            self.hub.pause_subscription(self.hub_subscription)
+        elif self.subscriber_thread is None:
+            self.logger.debug("No subscriber thread to unpause")
+        else:
+            self.subscriber_thread.pause_thread()
+
+    def unpause_subscribing(self):
+
+        self.logger.debug("Unpausing subscribing")
+        if self.hub_subscription is not None:
+            self.hub.unpause_subscription(self.hub_subscription)
+        elif self.subscriber_thread is None:
+            self.logger.debug("No subscriber thread to unpause")
+        else:
+            self.subscriber_thread.unpause_thread()
+
+    def stop_subscribing(self):
+
+        self.logger.debug("Stopping subscribing")
+        if self.hub_subscription is not None:
+            self.hub.unsubscribe(self.hub_subscription)
+            self.hub = None
+            self.hub_subscription = None
+        elif self.subscriber_thread is None:
+            self.logger.debug("No subscriber thread to unpause")
+        else:
+            self.subscriber_thread.pause_thread()
+            self.subscriber_thread.stop_thread()
+            self.subscriber_thread = None
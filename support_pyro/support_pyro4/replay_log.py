@@ -0,0 +1,264 @@
+"""
+Append-only log of published samples, so that subscribers that were down
+can catch up on what they missed.
+
+The log is a directory of segment files, named after the sequence number of
+their first record. Each segment is preallocated to segment_size bytes and
+memory-mapped, and records are appended to it back to back:
+
+    seq (Q), timestamp (d), length (I), flags (B), payload
+
+A seq of 0 marks the end of a segment. When a record doesn't fit, the
+segment is truncated to the space actually used and a new one is started.
+The oldest segments are removed once there are more than max_segments.
+Sequence numbers start at 1 and carry on from existing segments when a log
+is reopened. Callers can also number records themselves, eg with the
+sequence numbers of the messages they were published in; sequence numbers
+then only have to go up, and a jump starts a new segment.
+
+Records are indexed by sequence number and timestamp in memory, in compact
+arrays, so finding where to start replaying doesn't touch the files.
+"""
+import array
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+
+__all__ = [
+    "ReplayLog"
+]
+
+_RECORD_HEADER = struct.Struct("=QdIB3x")
+_SUFFIX = ".log"
+
+
+class _Segment(object):
+    """
+    One segment file, and the offsets and timestamps of its records.
+    """
+    def __init__(self, path, first_seq, size=None):
+        self.path = path
+        self.first_seq = first_seq
+        self.offsets = array.array("L")
+        self.times = array.array("d")
+        if size is None:
+            with open(path, "r+b") as f:
+                self.mmap = mmap.mmap(f.fileno(), 0)
+            self.end = self._scan()
+        else:
+            with open(path, "w+b") as f:
+                f.truncate(size)
+                self.mmap = mmap.mmap(f.fileno(), size)
+            self.end = 0
+
+    def _scan(self):
+        offset = 0
+        while offset + _RECORD_HEADER.size <= len(self.mmap):
+            seq, timestamp, length, flags = _RECORD_HEADER.unpack_from(self.mmap, offset)
+            if seq == 0:
+                break
+            self.offsets.append(offset)
+            self.times.append(timestamp)
+            offset += _RECORD_HEADER.size + length
+        return offset
+
+    @property
+    def last_seq(self):
+        return self.first_seq + len(self.offsets) - 1
+
+    def append(self, seq, timestamp, payload, flags):
+        length = memoryview(payload).nbytes
+        end = self.end + _RECORD_HEADER.size + length
+        if end > len(self.mmap):
+            return False
+        start = self.end + _RECORD_HEADER.size
+        self.mmap[start:end] = payload
+        # write the header last, so a record is never seen half written
+        _RECORD_HEADER.pack_into(self.mmap, self.end, seq, timestamp, length, flags)
+        self.offsets.append(self.end)
+        self.times.append(timestamp)
+        self.end = end
+        return True
+
+    def read(self, seq):
+        offset = self.offsets[seq - self.first_seq]
+        seq, timestamp, length, flags = _RECORD_HEADER.unpack_from(self.mmap, offset)
+        start = offset + _RECORD_HEADER.size
+        return seq, timestamp, flags, self.mmap[start:start + length]
+
+    def close(self, truncate=False):
+        self.mmap.close()
+        if truncate:
+            with open(self.path, "r+b") as f:
+                f.truncate(self.end)
+
+
+class ReplayLog(object):
+    """
+    Thread-safe, append-only, segment-rotated log of records.
+
+    .. code-block:: python
+
+        log = ReplayLog("/data/publisher_log")
+        seq = log.append(payload)
+        for seq, timestamp, flags, payload in log.read(from_seq=seq):
+            ...
+
+    Attributes:
+        directory (str): where segments are kept
+        segment_size (int): max bytes per segment
+        max_segments (int): max number of segments kept, or None to keep
+            everything.
+    """
+    def __init__(self, directory, segment_size=64*1024*1024, max_segments=None):
+        """
+        Args:
+            directory (str): created if it doesn't exist
+            segment_size (int, optional): max bytes per segment (64 MiB)
+            max_segments (int, optional): number of segments to keep (None)
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._segments = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(_SUFFIX):
+                segment = _Segment(os.path.join(directory, name),
+                                   int(name[:-len(_SUFFIX)]))
+                if segment.offsets:
+                    self._segments.append(segment)
+                else:
+                    segment.close()
+                    os.remove(segment.path)
+        self._seq = self._segments[-1].last_seq if self._segments else 0
+        self._active = None
+
+    def _start_segment(self, first_seq, min_size):
+        if self._active is not None:
+            self._active.close(truncate=True)
+            self._segments[-1] = _Segment(self._active.path, self._active.first_seq)
+        path = os.path.join(self.directory, "{:020d}{}".format(first_seq, _SUFFIX))
+        self._active = _Segment(path, first_seq, max(self.segment_size, min_size))
+        self._segments.append(self._active)
+        if self.max_segments is not None:
+            while len(self._segments) > self.max_segments:
+                segment = self._segments.pop(0)
+                segment.close()
+                os.remove(segment.path)
+
+    def append(self, payload, flags=0, timestamp=None, seq=None):
+        """
+        Args:
+            payload (bytes-like): record to append
+            flags (int, optional): stored with the record
+            timestamp (float, optional): defaults to time.time()
+            seq (int, optional): record's sequence number. Defaults to
+                last_seq() + 1.
+        Returns:
+            int: record's sequence number
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            if seq is None:
+                seq = self._seq + 1
+            elif seq <= self._seq:
+                raise ValueError("Sequence number {} isn't after {}".format(seq, self._seq))
+            if (self._active is None or seq != self._seq + 1 or
+                    not self._active.append(seq, timestamp, payload, flags)):
+                size = _RECORD_HEADER.size + memoryview(payload).nbytes
+                self._start_segment(seq, size)
+                self._active.append(seq, timestamp, payload, flags)
+            self._seq = seq
+            return seq
+
+    def first_seq(self):
+        """
+        Returns:
+            int: sequence number of oldest record kept, or None if empty
+        """
+        with self._lock:
+            return self._segments[0].first_seq if self._segments else None
+
+    def last_seq(self):
+        """
+        Returns:
+            int: sequence number of newest record, 0 if nothing was ever
+                appended.
+        """
+        with self._lock:
+            return self._seq
+
+    def seq_at(self, timestamp):
+        """
+        Returns:
+            int: sequence number of the first record at or after timestamp,
+                or last_seq() + 1 if there isn't one.
+        """
+        with self._lock:
+            firsts = [segment.times[0] for segment in self._segments]
+            idx = max(bisect.bisect_right(firsts, timestamp) - 1, 0)
+            for segment in self._segments[idx:]:
+                i = bisect.bisect_left(segment.times, timestamp)
+                if i < len(segment.times):
+                    return segment.first_seq + i
+            return self._seq + 1
+
+    def get(self, seq):
+        """
+        Returns:
+            tuple: seq, timestamp, flags and payload (bytes) of the record
+                with sequence number seq, or of the next one if there's no
+                such record, eg because it was already removed. None if seq
+                is past the end.
+        """
+        with self._lock:
+            if not self._segments or seq > self._seq:
+                return None
+            seq = max(seq, self._segments[0].first_seq)
+            firsts = [segment.first_seq for segment in self._segments]
+            idx = bisect.bisect_right(firsts, seq) - 1
+            segment = self._segments[idx]
+            if seq > segment.last_seq:
+                # seq fell in a jump between segments
+                segment = self._segments[idx + 1]
+                seq = segment.first_seq
+            return segment.read(seq)
+
+    def read(self, from_seq=None, from_time=None, max_records=None):
+        """
+        Iterate over records, oldest first. Records appended while iterating
+        are included.
+
+        Args:
+            from_seq (int, optional): first sequence number to return
+            from_time (float, optional): return records from this time on,
+                if from_seq isn't given.
+            max_records (int, optional): stop after this many records
+        Returns:
+            generator: seq, timestamp, flags, payload (bytes) tuples
+        """
+        if from_seq is None:
+            from_seq = self.seq_at(from_time) if from_time is not None else 1
+        n = 0
+        seq = from_seq
+        while max_records is None or n < max_records:
+            record = self.get(seq)
+            if record is None:
+                return
+            yield record
+            seq = record[0] + 1
+            n += 1
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments:
+                segment.close(truncate=segment is self._active)
+            self._segments = []
+            self._active = None
@@ -0,0 +1,520 @@
+"""
+Registry of serializers used to encode message payloads.
+
+Each serializer has a name, used to pick one when creating a publisher or
+subscriber, and a codec id, which goes in the message header so that
+subscribers can decode messages without being told how they were encoded.
+
+Serializers encode to a single bytes object (``dumps``/``loads``), for
+transports that store records, and to a list of frames
+(``dumps_frames``/``loads_frames``), for zmq. Serializers that support
+buffers put large binary data in frames of their own rather than copying
+it into the serialized bytes.
+
+New serializers can be added with ``register_serializer``:
+
+.. code-block:: python
+
+    class MySerializer(Serializer):
+        name = "mine"
+        codec_id = 100
+
+        def dumps(self, data):
+            ...
+
+        def loads(self, payload):
+            ...
+
+    register_serializer(MySerializer())
+
+Flat numeric records can instead be sent as fixed-size binary records,
+described by a RecordSchema that subscribers fetch from the publisher (see
+SchemaSerializer). Batches of records decode straight into numpy columns.
+"""
+import json
+import marshal
+import pickle
+import struct
+import threading
+
+import serpent
+import six
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = [
+    "Serializer",
+    "ModuleSerializer",
+    "PickleSerializer",
+    "NumpySerializer",
+    "RecordSchema",
+    "SchemaSerializer",
+    "register_serializer",
+    "get_serializer",
+    "serializer_names"
+]
+
+
+class Serializer(object):
+    """
+    Base class for serializers.
+
+    Attributes:
+        name (str): name used to look up serializer
+        codec_id (int): 1-255, sent in message headers. 0 is reserved for
+            payloads encoded with an unregistered serializer.
+        supports_buffers (bool): whether ``dumps_frames`` sends buffers as
+            frames of their own, without copying them
+        safe (bool): whether ``loads`` is safe on untrusted data.
+            Subscribers only use unsafe serializers if explicitly asked to.
+    """
+    name = None
+    codec_id = 0
+    supports_buffers = False
+    safe = True
+
+    def dumps(self, data):
+        """
+        Returns:
+            bytes: serialized data
+        """
+        raise NotImplementedError("Subclass needs to implement this method")
+
+    def loads(self, payload):
+        """
+        Args:
+            payload (bytes-like): data serialized with ``dumps``
+        """
+        raise NotImplementedError("Subclass needs to implement this method")
+
+    def dumps_frames(self, data):
+        """
+        Returns:
+            list: bytes-like frames
+        """
+        return [self.dumps(data)]
+
+    def loads_frames(self, frames):
+        """
+        Args:
+            frames (list): bytes-like frames created by ``dumps_frames``
+        """
+        return self.loads(frames[0])
+
+    def dumps_batch_frames(self, batch):
+        """
+        Like ``dumps_frames``, for a batch of samples (see
+        pubsub_util.make_batch). Serializers with a format of their own for
+        batches override this and ``loads_batch_frames``.
+        """
+        return self.dumps_frames(batch)
+
+    def dumps_batch(self, batch):
+        """
+        Like ``dumps_batch_frames``, as a single payload, for where a batch
+        has to fit in one, eg a replay log. ``loads_batch_frames`` decodes
+        it as a single frame.
+
+        Returns:
+            bytes: serialized batch
+        """
+        return self.dumps(batch)
+
+    def loads_batch_frames(self, frames):
+        """
+        Undo ``dumps_batch_frames``, or ``dumps_batch`` given a single frame.
+
+        Returns:
+            dict: batch (see pubsub_util.make_batch)
+        """
+        return self.loads_frames(frames)
+
+    def __repr__(self):
+        return "<{} {!r}>".format(self.__class__.__name__, self.name)
+
+
+def _as_bytes(payload):
+    if isinstance(payload, memoryview):
+        return payload.tobytes()
+    return payload
+
+
+class ModuleSerializer(Serializer):
+    """
+    Serializer for a module, or any object, with ``dumps`` and ``loads``
+    functions, like json or marshal.
+    """
+    def __init__(self, name, module, codec_id=0, safe=True):
+        self.name = name
+        self.module = module
+        self.codec_id = codec_id
+        self.safe = safe
+
+    def dumps(self, data):
+        payload = self.module.dumps(data)
+        if isinstance(payload, six.text_type):
+            payload = payload.encode("utf-8")
+        return payload
+
+    def loads(self, payload):
+        return self.module.loads(_as_bytes(payload))
+
+
+class PickleSerializer(Serializer):
+    """
+    pickle, using protocol 5 when available. ``dumps_frames`` then sends
+    buffers that support out-of-band pickling, such as numpy arrays, as
+    frames of their own, without copying them.
+
+    Unpickling can run arbitrary code, so this serializer isn't safe.
+    """
+    name = "pickle"
+    codec_id = 4
+    safe = False
+    protocol = min(5, pickle.HIGHEST_PROTOCOL)
+    supports_buffers = protocol >= 5
+
+    def dumps(self, data):
+        return pickle.dumps(data, protocol=self.protocol)
+
+    def loads(self, payload):
+        return pickle.loads(payload)
+
+    def dumps_frames(self, data):
+        if not self.supports_buffers:
+            return [self.dumps(data)]
+        buffers = []
+        payload = pickle.dumps(data, protocol=self.protocol,
+                               buffer_callback=buffers.append)
+        return [payload] + [buffer.raw() for buffer in buffers]
+
+    def loads_frames(self, frames):
+        if len(frames) == 1:
+            return pickle.loads(frames[0])
+        return pickle.loads(frames[0], buffers=frames[1:])
+
+
+class NumpySerializer(Serializer):
+    """
+    Raw codec for numpy arrays: the array's dtype and shape, and its data.
+    Only handles arrays. On the receiving end, arrays are read-only views
+    on the received data, not copies.
+    """
+    name = "numpy"
+    codec_id = 5
+    supports_buffers = True
+    _meta_length = struct.Struct("!I")
+
+    def _meta(self, data):
+        if numpy is None or not isinstance(data, numpy.ndarray):
+            raise TypeError("numpy serializer only handles numpy arrays")
+        data = numpy.ascontiguousarray(data)
+        meta = json.dumps({"dtype": data.dtype.str, "shape": data.shape})
+        return data, meta.encode("utf-8")
+
+    def _array(self, meta, buffer):
+        meta = json.loads(_as_bytes(meta).decode("utf-8"))
+        array = numpy.frombuffer(buffer, dtype=numpy.dtype(meta["dtype"]))
+        return array.reshape(meta["shape"])
+
+    def dumps(self, data):
+        data, meta = self._meta(data)
+        return self._meta_length.pack(len(meta)) + meta + data.tobytes()
+
+    def loads(self, payload):
+        payload = memoryview(payload)
+        length = self._meta_length.unpack_from(payload)[0]
+        start = self._meta_length.size
+        return self._array(payload[start:start + length], payload[start + length:])
+
+    def dumps_frames(self, data):
+        data, meta = self._meta(data)
+        return [meta, data]
+
+    def loads_frames(self, frames):
+        return self._array(frames[0], frames[1])
+
+    def dumps_batch_frames(self, batch):
+        """
+        The batch's arrays are stacked into a single array, so they need to
+        have the same shape.
+        """
+        return self.dumps_frames(self._stack(batch))
+
+    def dumps_batch(self, batch):
+        return self.dumps(self._stack(batch))
+
+    def _stack(self, batch):
+        if "rows" not in batch:
+            raise TypeError("numpy serializer only handles batches of arrays")
+        return numpy.stack([self._meta(row)[0] for row in batch["rows"]])
+
+    def loads_batch_frames(self, frames):
+        """
+        Returns:
+            dict: batch, whose "rows" is the stacked array. Each sample is
+                a view on it.
+        """
+        if len(frames) == 1:
+            rows = self.loads(frames[0])
+        else:
+            rows = self.loads_frames(frames)
+        return {"n": len(rows), "rows": rows}
+
+
+class RecordSchema(object):
+    """
+    Layout of a flat record of numbers: field names, each with a struct
+    format character, packed back to back in byte_order without padding.
+
+    .. code-block:: python
+
+        schema = RecordSchema([("time", "d"), ("temperature", "f"),
+                               ("status", "B")])
+        payload = schema.pack({"time": 1.5, "temperature": 21.0, "status": 1})
+
+    Attributes:
+        fields (list): (name, format character) pairs
+        byte_order (str): "<" or ">"
+        struct (struct.Struct): struct for a single record
+        size (int): bytes per record
+    """
+    # struct format characters with the same size everywhere in standard mode
+    _dtypes = {
+        "?": "b1", "b": "i1", "B": "u1", "h": "i2", "H": "u2", "i": "i4",
+        "I": "u4", "l": "i4", "L": "u4", "q": "i8", "Q": "u8", "e": "f2",
+        "f": "f4", "d": "f8"
+    }
+
+    def __init__(self, fields, byte_order="<"):
+        """
+        Args:
+            fields (list): (name, format character) pairs, eg
+                ``[("x", "d"), ("count", "I")]``
+            byte_order (str, optional): "<" (little endian) or ">" ("<")
+        """
+        if byte_order == "!":
+            byte_order = ">"
+        if byte_order not in ("<", ">"):
+            raise ValueError("byte_order must be \"<\" or \">\", got {}".format(byte_order))
+        self.fields = [(str(name), str(code)) for name, code in fields]
+        for name, code in self.fields:
+            if code not in self._dtypes:
+                raise ValueError("Don't recognize format {!r} for field {}".format(code, name))
+        self.byte_order = byte_order
+        self.names = [name for name, code in self.fields]
+        self.struct = struct.Struct(byte_order + "".join(code for name, code in self.fields))
+        self.size = self.struct.size
+        self.dtype = None
+        if numpy is not None:
+            self.dtype = numpy.dtype([(name, byte_order + self._dtypes[code])
+                                      for name, code in self.fields])
+
+    def pack(self, sample):
+        """
+        Args:
+            sample (dict/sequence): field name -> value, or values in field
+                order
+        Returns:
+            bytes: one record
+        """
+        if isinstance(sample, dict):
+            return self.struct.pack(*[sample[name] for name in self.names])
+        return self.struct.pack(*sample)
+
+    def unpack(self, payload):
+        """
+        Returns:
+            dict: field name -> value, for the single record in payload
+        """
+        return dict(zip(self.names, self.struct.unpack(payload)))
+
+    def pack_columns(self, columns):
+        """
+        Args:
+            columns (dict): field name -> values, one per record
+        Returns:
+            bytes: records back to back
+        """
+        if self.dtype is not None:
+            n = len(columns[self.names[0]]) if self.names else 0
+            records = numpy.empty(n, dtype=self.dtype)
+            for name in self.names:
+                records[name] = columns[name]
+            return records.tobytes()
+        return b"".join(self.struct.pack(*values)
+                        for values in zip(*[columns[name] for name in self.names]))
+
+    def unpack_columns(self, payload):
+        """
+        Decode records packed back to back. With numpy this is a single
+        ``frombuffer``, and the columns are read-only views on payload.
+
+        Returns:
+            dict: field name -> numpy array (or list, without numpy) of
+                values
+        """
+        if len(payload) % self.size:
+            raise ValueError("Payload of {} bytes isn't a whole number of {} byte records".format(
+                len(payload), self.size))
+        if self.dtype is not None:
+            records = numpy.frombuffer(payload, dtype=self.dtype)
+            return dict((name, records[name]) for name in self.names)
+        columns = dict((name, []) for name in self.names)
+        for offset in range(0, len(payload), self.size):
+            for name, value in zip(self.names, self.struct.unpack_from(payload, offset)):
+                columns[name].append(value)
+        return columns
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: "fields" and "byte_order", for sending the schema through
+                Pyro. See ``from_dict``.
+        """
+        return {"fields": [list(field) for field in self.fields],
+                "byte_order": self.byte_order}
+
+    @classmethod
+    def from_dict(cls, schema):
+        return cls(schema["fields"], byte_order=schema["byte_order"])
+
+    def __eq__(self, other):
+        return isinstance(other, RecordSchema) and self.as_dict() == other.as_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "<RecordSchema {}{}>".format(self.byte_order, self.fields)
+
+
+class SchemaSerializer(Serializer):
+    """
+    Encodes samples as fixed-size binary records (see RecordSchema), and
+    batches as those records back to back, so a batch decodes into columns
+    in one go. Samples are dicts with the schema's fields, or sequences of
+    values in field order; they're decoded as dicts.
+
+    The schema isn't sent with messages, so subscribers need the same
+    schema as the publisher, eg from ``Pyro4PublisherServer.publisher_schema``.
+    Schema serializers aren't registered, as each is tied to its schema;
+    subscribers pass theirs in as serializer.
+    """
+    name = "struct"
+    codec_id = 7
+
+    def __init__(self, schema):
+        """
+        Args:
+            schema (RecordSchema/dict/list): schema, its ``as_dict``, or its
+                fields
+        """
+        if isinstance(schema, dict):
+            schema = RecordSchema.from_dict(schema)
+        elif not isinstance(schema, RecordSchema):
+            schema = RecordSchema(schema)
+        self.schema = schema
+
+    def dumps(self, data):
+        return self.schema.pack(data)
+
+    def loads(self, payload):
+        return self.schema.unpack(payload)
+
+    def dumps_batch_frames(self, batch):
+        if "columns" in batch:
+            return [self.schema.pack_columns(batch["columns"])]
+        return [b"".join(self.schema.pack(sample) for sample in batch["rows"])]
+
+    def dumps_batch(self, batch):
+        return self.dumps_batch_frames(batch)[0]
+
+    def loads_batch_frames(self, frames):
+        columns = self.schema.unpack_columns(frames[0])
+        return {"n": len(frames[0]) // self.schema.size, "columns": columns}
+
+
+_lock = threading.Lock()
+_by_name = {}
+_by_id = {}
+
+
+def register_serializer(serializer):
+    """
+    Make serializer available by name and codec id, replacing any existing
+    serializer with the same name.
+
+    Args:
+        serializer (Serializer): serializer to register
+    """
+    if not 0 < serializer.codec_id < 256:
+        raise ValueError("codec_id must be between 1 and 255, got {}".format(
+            serializer.codec_id))
+    with _lock:
+        existing = _by_id.get(serializer.codec_id)
+        if existing is not None and existing.name != serializer.name:
+            raise ValueError("codec_id {} is already used by {}".format(
+                serializer.codec_id, existing.name))
+        _by_name[serializer.name] = serializer
+        _by_id[serializer.codec_id] = serializer
+
+
+def get_serializer(serializer):
+    """
+    Look up a serializer.
+
+    Args:
+        serializer (str/int/Serializer/module): name, codec id, serializer,
+            or a module with ``dumps`` and ``loads`` functions. Modules that
+            back a registered serializer, like json, map to that serializer,
+            others get an unregistered ModuleSerializer.
+    Returns:
+        Serializer
+    """
+    if isinstance(serializer, Serializer):
+        return serializer
+    with _lock:
+        if isinstance(serializer, six.string_types):
+            if serializer not in _by_name:
+                raise ValueError("Don't recognize serializer {}".format(serializer))
+            return _by_name[serializer]
+        if isinstance(serializer, six.integer_types):
+            if serializer not in _by_id:
+                raise ValueError("Don't recognize codec id {}".format(serializer))
+            return _by_id[serializer]
+        for registered in _by_name.values():
+            if getattr(registered, "module", None) is serializer:
+                return registered
+    if hasattr(serializer, "dumps") and hasattr(serializer, "loads"):
+        return ModuleSerializer(getattr(serializer, "__name__", repr(serializer)),
+                                serializer)
+    raise ValueError("Don't recognize serializer {}".format(serializer))
+
+
+def serializer_names():
+    """
+    Returns:
+        list: names of registered serializers
+    """
+    with _lock:
+        return sorted(_by_name.keys())
+
+
+register_serializer(ModuleSerializer("serpent", serpent, codec_id=1))
+register_serializer(ModuleSerializer("json", json, codec_id=2))
+# marshal isn't meant to be robust against malicious data
+register_serializer(ModuleSerializer("marshal", marshal, codec_id=3, safe=False))
+register_serializer(PickleSerializer())
+if numpy is not None:
+    register_serializer(NumpySerializer())
+if msgpack is not None:
+    register_serializer(ModuleSerializer("msgpack", msgpack, codec_id=6))
@@ -0,0 +1,201 @@
+"""
+Single-writer ring buffer of fixed-size records in a memory-mapped file, for
+passing samples between processes on the same host without going through a
+socket.
+
+The file starts with a header:
+
+    magic (4s), version (B), record_size (I), capacity (I), write_seq (Q)
+
+followed by capacity slots, each of which is a slot header:
+
+    seq (Q), length (I), flags (B)
+
+and record_size bytes of payload. Sequence numbers start at 1. The writer
+zeroes a slot's seq while it writes the payload, then sets seq, and only then
+advances write_seq. Readers hand out memoryviews on the mapped file rather
+than copies, so a slow reader can have a record overwritten while it's still
+using it; ``ShmRingReader.valid`` tells whether that happened.
+"""
+import mmap
+import os
+import struct
+import tempfile
+
+__all__ = [
+    "ADDRESS_PREFIX",
+    "ShmRingWriter",
+    "ShmRingReader",
+    "shm_path"
+]
+
+ADDRESS_PREFIX = "shm://"
+
+_MAGIC = b"SPRB"
+_VERSION = 1
+_HEADER = struct.Struct("=4sB3xIIQ")
+_WRITE_SEQ = struct.Struct("=Q")
+_WRITE_SEQ_OFFSET = _HEADER.size - _WRITE_SEQ.size
+_SLOT_HEADER = struct.Struct("=QIB3x")
+
+
+def shm_path(prefix="support_pyro4_"):
+    """
+    Create a new, empty file for a ring buffer, in /dev/shm if it exists so
+    that the buffer never touches the disk.
+
+    Returns:
+        str: path to file
+    """
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    fd, path = tempfile.mkstemp(prefix=prefix, dir=directory)
+    os.close(fd)
+    return path
+
+
+class _ShmRing(object):
+
+    def _slot_offset(self, seq):
+        return _HEADER.size + (seq % self.capacity) * self.slot_size
+
+    def write_seq(self):
+        """
+        Returns:
+            int: sequence number of the most recently written record, 0 if
+                nothing has been written yet.
+        """
+        return _WRITE_SEQ.unpack_from(self._mmap, _WRITE_SEQ_OFFSET)[0]
+
+    def close(self):
+        try:
+            self._mmap.close()
+        except BufferError:
+            # memoryviews handed out by ShmRingReader.read are still alive;
+            # the mapping goes away when they do.
+            pass
+
+
+class ShmRingWriter(_ShmRing):
+    """
+    Write records into a new ring buffer file.
+
+    Attributes:
+        path (str): path to file
+        record_size (int): max bytes per record
+        capacity (int): number of slots
+        seq (int): sequence number of the last record written
+    """
+    def __init__(self, path, record_size=65536, capacity=1024):
+        """
+        Args:
+            path (str): file to create, or truncate
+            record_size (int, optional): max bytes per record (65536)
+            capacity (int, optional): number of records kept (1024)
+        """
+        self.path = path
+        self.record_size = record_size
+        self.capacity = capacity
+        self.slot_size = _SLOT_HEADER.size + record_size
+        size = _HEADER.size + capacity * self.slot_size
+        with open(path, "w+b") as f:
+            f.truncate(size)
+            self._mmap = mmap.mmap(f.fileno(), size)
+        _HEADER.pack_into(self._mmap, 0, _MAGIC, _VERSION, record_size, capacity, 0)
+        self.seq = 0
+
+    def write(self, data, flags=0):
+        """
+        Copy a record into the next slot.
+
+        Args:
+            data (bytes-like): record, at most record_size bytes
+            flags (int, optional): stored with the record
+        Returns:
+            int: the record's sequence number
+        """
+        length = memoryview(data).nbytes
+        if length > self.record_size:
+            raise ValueError("Record is {} bytes, max is {}".format(
+                length, self.record_size))
+        seq = self.seq + 1
+        offset = self._slot_offset(seq)
+        start = offset + _SLOT_HEADER.size
+        _SLOT_HEADER.pack_into(self._mmap, offset, 0, length, flags)
+        self._mmap[start:start + length] = data
+        _SLOT_HEADER.pack_into(self._mmap, offset, seq, length, flags)
+        _WRITE_SEQ.pack_into(self._mmap, _WRITE_SEQ_OFFSET, seq)
+        self.seq = seq
+        return seq
+
+    def close(self, unlink=True):
+        """
+        Args:
+            unlink (bool, optional): remove the file. Readers that already
+                have it open can keep reading what's there.
+        """
+        super(ShmRingWriter, self).close()
+        if unlink and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ShmRingReader(_ShmRing):
+    """
+    Read records from a ring buffer created by ShmRingWriter. Reading starts
+    with the first record written after the reader was created.
+
+    Attributes:
+        path (str): path to file
+        record_size (int): max bytes per record
+        capacity (int): number of slots
+        next_seq (int): sequence number of the next record to read
+        overruns (int): records the writer overwrote before they were read
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.record_size, self.capacity, write_seq = \
+            _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC:
+            raise ValueError("{} isn't a ring buffer".format(path))
+        if version != _VERSION:
+            raise ValueError("Don't recognize ring buffer version {}".format(version))
+        self.slot_size = _SLOT_HEADER.size + self.record_size
+        self.next_seq = write_seq + 1
+        self.overruns = 0
+
+    def read(self):
+        """
+        Get the next record, without copying it.
+
+        Returns:
+            tuple: seq, flags, and a memoryview on the record, or None if
+                there's nothing new. The memoryview is only good until the
+                writer wraps around to its slot, see ``valid``.
+        """
+        while True:
+            write_seq = self.write_seq()
+            if write_seq < self.next_seq:
+                return None
+            oldest = write_seq - self.capacity + 1
+            if self.next_seq < oldest:
+                self.overruns += oldest - self.next_seq
+                self.next_seq = oldest
+            seq = self.next_seq
+            offset = self._slot_offset(seq)
+            slot_seq, length, flags = _SLOT_HEADER.unpack_from(self._mmap, offset)
+            self.next_seq = seq + 1
+            if slot_seq != seq:
+                # overwritten, or being overwritten, since we read write_seq
+                self.overruns += 1
+                continue
+            start = offset + _SLOT_HEADER.size
+            return seq, flags, memoryview(self._mmap)[start:start + length]
+
+    def valid(self, seq):
+        """
+        Returns:
+            bool: whether record seq is still intact. Check this after using
+                a record returned by ``read``.
+        """
+        return _SLOT_HEADER.unpack_from(self._mmap, self._slot_offset(seq))[0] == seq
@@ -0,0 +1,354 @@
+"""
+Record a publisher's stream to disk, and publish it again later, so that
+subscribers and GUIs can be load tested against real traffic without the
+hardware that produced it.
+
+StreamRecorder subscribes to a ZmqPublisherThread (or anything using the
+same framing, see pubsub_util) and writes every message, as received, with
+the time it was received. StreamReplayer publishes a recording on a PUB
+socket of its own, on the same topics, at the recorded pace, N times
+faster, or as fast as possible. Run it as part of the ``support`` package,
+from outside this repository (see pubsub_benchmark):
+
+.. code-block:: none
+
+    python -m support.pyro.support_pyro.support_pyro4.stream_recorder record \\
+        tcp://localhost:50000 traffic.rec --duration 60
+    python -m support.pyro.support_pyro.support_pyro4.stream_recorder replay \\
+        traffic.rec tcp://*:50001 --speed 10
+
+Recordings are a short file header followed by one record per message:
+
+    receive time (d), number of frames (I), then for each frame its
+    length (I) and contents
+
+Frames are stored untouched, so payloads are never decoded, whatever they
+were encoded with.
+"""
+from __future__ import print_function
+import argparse
+import struct
+import time
+
+import zmq
+
+from .util import PausableThread, iterative_run
+from .pubsub_util import (topic_bytes, recv_frames, send_frames, unpack_header,
+                          configure_socket, verbose_xpub, TopicCounters,
+                          SubscriptionTracker, HEADER_FORMAT, HEADER_VERSION,
+                          monotonic)
+
+__all__ = [
+    "StreamRecorder",
+    "StreamReplayer",
+    "read_recording",
+    "main"
+]
+
+_MAGIC = b"SPRC\x01"
+_RECORD = struct.Struct("=dI")
+_FRAME = struct.Struct("=I")
+
+
+def read_recording(path):
+    """
+    Iterate over the messages in a recording.
+
+    Args:
+        path (str): file written by StreamRecorder
+    Returns:
+        generator: receive time (float), frames (list of bytes) tuples
+    """
+    with open(path, "rb") as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError("{} isn't a stream recording".format(path))
+        while True:
+            record = f.read(_RECORD.size)
+            if len(record) < _RECORD.size:
+                return
+            timestamp, n = _RECORD.unpack(record)
+            frames = []
+            for i in range(n):
+                length = _FRAME.unpack(f.read(_FRAME.size))[0]
+                frames.append(f.read(length))
+            yield timestamp, frames
+
+
+class StreamRecorder(PausableThread):
+    """
+    A Pausable Thread that subscribes to address and writes every message it
+    receives to path. Messages received while paused are dropped. The file
+    is closed when the thread stops, or after max_messages messages.
+
+    ``message_stats`` counts messages and bytes recorded per topic.
+    """
+    # milliseconds to wait for a message before checking for pause/stop
+    poll_timeout = 50
+
+    def __init__(self, address, path, topic="", context=None, rcvhwm=None,
+                 max_messages=None, **kwargs):
+        """
+        Args:
+            address (str): publisher's address
+            path (str): file to record to. Overwritten if it exists.
+            topic (str, optional): topic prefix to record ("")
+            context (zmq.Context, optional): Defaults to zmq.Context.instance()
+            rcvhwm (int, optional): receive high-water mark
+            max_messages (int, optional): stop after this many messages
+            kwargs: passed to PausableThread
+        """
+        kwargs.setdefault("name", "StreamRecorder")
+        PausableThread.__init__(self, **kwargs)
+        if context is None:
+            context = zmq.Context.instance()
+        self.address = address
+        self.path = path
+        self.max_messages = max_messages
+        self.recorded = 0
+        self.counters = TopicCounters(("messages", "bytes"))
+        self.socket = context.socket(zmq.SUB)
+        configure_socket(self.socket, rcvhwm=rcvhwm)
+        self.socket.connect(address)
+        self.socket.setsockopt(zmq.SUBSCRIBE, topic_bytes(topic))
+        self.file = open(path, "wb")
+        self.file.write(_MAGIC)
+
+    def run(self):
+        self._record()
+        self.socket.close()
+        self.file.close()
+
+    @iterative_run
+    def _record(self):
+        if not self.socket.poll(self.poll_timeout):
+            return
+        frames = recv_frames(self.socket)
+        timestamp = monotonic()
+        self.file.write(_RECORD.pack(timestamp, len(frames)))
+        nbytes = 0
+        for frame in frames:
+            self.file.write(_FRAME.pack(len(frame)))
+            self.file.write(frame.buffer)
+            nbytes += len(frame)
+        topic = frames[0].bytes
+        self.counters.increment(topic, "messages")
+        self.counters.increment(topic, "bytes", nbytes)
+        self.recorded += 1
+        if self.max_messages is not None and self.recorded >= self.max_messages:
+            self.stop_thread()
+
+    def message_stats(self):
+        """
+        Returns:
+            dict: topic -> dict with "messages" and "bytes" recorded
+        """
+        return self.counters.as_dict()
+
+
+class StreamReplayer(PausableThread):
+    """
+    A Pausable Thread that publishes a recording (see StreamRecorder) on
+    address.
+
+    With speed set, messages are sent at the recorded pace, sped up by that
+    factor; with speed None, as fast as possible. Message headers are
+    restamped with the time they're actually sent, so subscribers' latency
+    statistics stay meaningful; sequence numbers are kept as recorded.
+
+    PUB sockets drop everything sent before a subscriber connects, so by
+    default the replayer waits for its first subscription before starting.
+    Later subscriptions are read as they come in, and ``subscriber_counts``
+    has the number of subscriptions per topic prefix. While paused, the
+    recorded pace is suspended rather than caught up on.
+
+    ``message_stats`` counts messages sent per topic, and ``rate_stats``
+    gives the effective rate.
+    """
+    # milliseconds to wait for a subscriber before checking for stop
+    poll_timeout = 50
+
+    def __init__(self, path, address, speed=1.0, loop=False, context=None,
+                 sndhwm=None, wait_for_subscriber=True, restamp=True,
+                 **kwargs):
+        """
+        Args:
+            path (str): recording to replay
+            address (str): address to bind
+            speed (float, optional): replay speed, relative to the recording,
+                or None for as fast as possible (1.0)
+            loop (bool, optional): start over at the end of the recording
+                (False)
+            context (zmq.Context, optional): Defaults to zmq.Context.instance()
+            sndhwm (int, optional): send high-water mark
+            wait_for_subscriber (bool, optional): don't start until somebody
+                subscribes (True)
+            restamp (bool, optional): replace recorded publish times with the
+                time messages are sent (True)
+            kwargs: passed to PausableThread
+        """
+        kwargs.setdefault("name", "StreamReplayer")
+        PausableThread.__init__(self, **kwargs)
+        if context is None:
+            context = zmq.Context.instance()
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.restamp = restamp
+        self.wait_for_subscriber = wait_for_subscriber
+        self.counters = TopicCounters(("sent",))
+        self.subscriptions = SubscriptionTracker()
+        self.sent = 0
+        self.loops = 0
+        self.socket = context.socket(zmq.XPUB)
+        verbose_xpub(self.socket)
+        configure_socket(self.socket, sndhwm=sndhwm)
+        self.socket.bind(address)
+        self._records = None
+        self._offset = None
+        self._replay_started = None
+        self._replay_finished = None
+        self._paused_since = None
+
+    def run(self):
+        if self.wait_for_subscriber:
+            while not self.stopped():
+                if self.socket.poll(self.poll_timeout):
+                    break
+        self._replay_started = monotonic()
+        self._replay()
+        self._replay_finished = monotonic()
+        self.socket.close()
+
+    def _next_record(self):
+        if self._records is None:
+            self._records = read_recording(self.path)
+        try:
+            return next(self._records)
+        except StopIteration:
+            if not self.loop:
+                return None
+            self.loops += 1
+            self._offset = None
+            self._records = read_recording(self.path)
+            return next(self._records, None)
+
+    def _read_subscriptions(self):
+        # messages coming in on the XPUB socket, eg from subscribers that
+        # connect later, pile up unless they're read
+        while True:
+            try:
+                message = self.socket.recv(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+            self.subscriptions.update(message)
+
+    @iterative_run
+    def _replay(self):
+        self._read_subscriptions()
+        record = self._next_record()
+        if record is None:
+            self.stop_thread()
+            return
+        timestamp, frames = record
+        if self.speed:
+            now = monotonic()
+            if self._offset is None:
+                self._offset = now - timestamp / self.speed
+            # time spent paused isn't made up for
+            if self._paused_since is not None:
+                self._offset += now - self._paused_since
+                self._paused_since = None
+            delay = self._offset + timestamp / self.speed - now
+            if delay > 0 and self._stop_event.wait(delay):
+                return
+        if self.restamp and len(frames) > 1:
+            header = unpack_header(frames[1])
+            frames[1] = struct.pack(HEADER_FORMAT, HEADER_VERSION, header.flags,
+                                    header.seq, monotonic(), header.codec)
+        send_frames(self.socket, frames)
+        self.counters.increment(frames[0], "sent")
+        self.sent += 1
+
+    def pause_thread(self):
+        self._paused_since = monotonic()
+        super(StreamReplayer, self).pause_thread()
+
+    def message_stats(self):
+        """
+        Returns:
+            dict: topic -> dict with "sent" count
+        """
+        return self.counters.as_dict()
+
+    def subscriber_counts(self):
+        """
+        Returns:
+            dict: topic prefix (str) -> number of subscriptions
+        """
+        return self.subscriptions.as_dict()
+
+    def rate_stats(self):
+        """
+        Returns:
+            dict: "sent", "loops", "elapsed" seconds and "msgs_per_s" since
+                replaying started
+        """
+        elapsed = 0.0
+        if self._replay_started is not None:
+            elapsed = (self._replay_finished or monotonic()) - self._replay_started
+        return {
+            "sent": self.sent,
+            "loops": self.loops,
+            "elapsed": elapsed,
+            "msgs_per_s": self.sent / elapsed if elapsed else None
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay a publisher's stream")
+    commands = parser.add_subparsers(dest="command")
+    record = commands.add_parser("record", help="record a stream to a file")
+    record.add_argument("address", help="publisher address, eg tcp://localhost:50000")
+    record.add_argument("path")
+    record.add_argument("--topic", default="")
+    record.add_argument("--duration", type=float, default=None,
+                        help="seconds to record for. Default is until interrupted")
+    record.add_argument("--max-messages", type=int, default=None)
+    replay = commands.add_parser("replay", help="publish a recorded stream")
+    replay.add_argument("path")
+    replay.add_argument("address", help="address to bind, eg tcp://*:50001")
+    replay.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed relative to the recording")
+    replay.add_argument("--max", action="store_true",
+                        help="replay as fast as possible")
+    replay.add_argument("--loop", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        thread = StreamRecorder(args.address, args.path, topic=args.topic,
+                                max_messages=args.max_messages)
+    elif args.command == "replay":
+        thread = StreamReplayer(args.path, args.address,
+                                speed=None if args.max else args.speed,
+                                loop=args.loop)
+    else:
+        parser.error("Expected a command, record or replay")
+    thread.start()
+    start = time.time()
+    try:
+        while thread.is_alive():
+            thread.join(0.1)
+            if (args.command == "record" and args.duration is not None and
+                    time.time() - start >= args.duration):
+                break
+    except KeyboardInterrupt:
+        pass
+    thread.stop_thread()
+    thread.join()
+    print(thread.message_stats())
+    if args.command == "replay":
+        print(thread.rate_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,607 @@
+"""
+Threads that receive what the threads in publisher_threads publish: from a
+zmq socket (ZmqSubscriberThread), from many zmq sockets at once
+(ZmqSubscriberHub), or from a shared memory ring buffer
+(ShmSubscriberThread).
+"""
+from __future__ import print_function
+import collections
+import itertools
+
+import zmq
+
+from .util import PausableThread, PausableThreadPool, iterative_run
+from .pubsub_util import (topic_bytes, unpack_message, recv_frames,
+                          configure_socket, TopicCounters, batch_samples,
+                          LatencyStats, DeltaDecoder, SequenceTracker,
+                          unpack_header, decode_payload, pack_drop_report,
+                          monotonic, FLAG_BATCH, FLAG_DELTA, FLAG_RAW)
+from .shm_ring import ShmRingReader
+from .serializers import get_serializer
+
+__all__ = [
+    "ZmqSubscriberThread",
+    "ShmSubscriberThread",
+    "ZmqSubscriberHub"
+]
+
+
+def _subscribe(socket, topic, subscribe=True):
+    # XSUB sockets subscribe by sending a message rather than setting an option
+    if socket.socket_type == zmq.XSUB:
+        socket.send((b"\x01" if subscribe else b"\x00") + topic)
+    else:
+        socket.setsockopt(zmq.SUBSCRIBE if subscribe else zmq.UNSUBSCRIBE, topic)
+
+
+def _report_drops(socket, topic, count):
+    try:
+        socket.send(pack_drop_report(topic, count), zmq.NOBLOCK)
+    except zmq.Again:
+        pass
+
+
+class ZmqSubscriberThread(PausableThread):
+    """
+    A Pausable Thread that receives messages sent by ZmqPublisherThread and
+    passes their payload to consume_cb. Raw (unserialized) payloads are passed
+    as a memoryview on the received frame. Payloads are decoded with the
+    serializer named in their header, except for serializers that aren't
+    safe on untrusted data, like pickle, which have to be passed in as
+    serializer to be accepted (see pubsub_util.unpack_message).
+
+    With conflate set, the thread drains whatever is waiting on the socket
+    after each receive and only consumes the newest message for each topic,
+    so a slow consumer always works on current data. zmq's own CONFLATE
+    option can't be used here, as it doesn't support multipart messages.
+
+    Batches sent by a batching publisher are split back up into samples,
+    and consume_cb is called once per sample, unless unbatch is False, in
+    which case consume_cb gets the whole batch (see pubsub_util.make_batch).
+    Deltas sent by a publisher in delta mode are applied to the last keyframe
+    received, and consume_cb gets the rebuilt sample. Deltas that arrive
+    before their keyframe are skipped and counted.
+
+    Messages that can't be decoded, eg because their header names a
+    serializer that isn't registered here, are logged, counted under
+    "errors" and skipped.
+
+    With report_drops set, the thread subscribes on an XSUB socket, and
+    tells the publisher whenever messages went missing (see
+    pubsub_util.pack_drop_report), so ZmqPublisherThread can count them and
+    slow down.
+
+    By default consume_cb is called inline, right after each receive, so a
+    slow consumer stops the socket from draining. With queue_size set,
+    received messages are instead put on a bounded queue, and decoded and
+    consumed by a PausableThreadPool of consumer_workers threads. overflow
+    decides what happens when the queue is full (see PausableThreadPool).
+    With more than one consumer worker, messages can be consumed out of order.
+    """
+    # upper bound on messages drained in one go when conflating
+    conflate_batch = 1000
+    # milliseconds to wait for a message before checking for pause/stop
+    poll_timeout = 50
+
+    def __init__(self, consume_cb, context,address,
+                    topic="",
+                    consume_cb_args=None,
+                    consume_cb_kwargs=None,
+                    serializer="serpent",
+                    rcvhwm=None,
+                    linger=None,
+                    conflate=False,
+                    unbatch=True,
+                    queue_size=None,
+                    consumer_workers=1,
+                    overflow="block",
+                    report_drops=True,
+                    **kwargs):
+
+        PausableThread.__init__(self, **kwargs)
+        self.consume_cb = consume_cb
+        self.topic = topic_bytes(topic)
+        self.conflate = conflate
+        self.unbatch = unbatch
+        self.counters = TopicCounters(("received", "conflated", "skipped", "errors"))
+        self.delta_decoder = DeltaDecoder()
+        self.sequences = SequenceTracker()
+        self.report_drops = report_drops
+        self.socket = context.socket(zmq.XSUB if report_drops else zmq.SUB)
+        configure_socket(self.socket, rcvhwm=rcvhwm, linger=linger)
+        self.socket.connect(address)
+        _subscribe(self.socket, self.topic)
+        if consume_cb_args is None: consume_cb_args = ()
+        if consume_cb_kwargs is None: consume_cb_kwargs = {}
+        self.consume_cb_args = consume_cb_args
+        self.consume_cb_kwargs = consume_cb_kwargs
+        self.serializer = get_serializer(serializer)
+        self.consumer_pool = None
+        self.lag = LatencyStats()
+        if queue_size is not None:
+            self.consumer_pool = PausableThreadPool(
+                consumer_workers, maxsize=queue_size, overflow=overflow,
+                name="{}.consumer".format(self.name),
+                logger=self.logger.getChild("consumer"))
+
+    def start(self):
+        if self.consumer_pool is not None:
+            self.consumer_pool.start()
+        super(ZmqSubscriberThread, self).start()
+
+    def run(self):
+        self._receive()
+        if self.consumer_pool is not None:
+            self.consumer_pool.stop_thread()
+        self.socket.close()
+
+    @iterative_run
+    def _receive(self):
+        if not self.socket.poll(self.poll_timeout):
+            return
+        frames = recv_frames(self.socket)
+        if not self._track(frames):
+            return
+        if not self.conflate:
+            self._dispatch(frames)
+            return
+        latest = collections.OrderedDict()
+        latest[frames[0].bytes] = frames
+        for i in range(self.conflate_batch):
+            try:
+                frames = recv_frames(self.socket, zmq.NOBLOCK)
+            except zmq.Again:
+                break
+            if not self._track(frames):
+                continue
+            topic = frames[0].bytes
+            if topic in latest:
+                self.counters.increment(topic, "conflated")
+            latest[topic] = frames
+        for frames in latest.values():
+            self._dispatch(frames)
+
+    def _track(self, frames):
+        topic = frames[0].bytes
+        self.counters.increment(topic, "received")
+        try:
+            missing = self.sequences.track(topic, unpack_header(frames[1]))
+        except Exception as err:
+            self._decode_error(topic, err)
+            return False
+        if missing and self.report_drops:
+            _report_drops(self.socket, topic, missing)
+        return True
+
+    def _decode_error(self, topic, err):
+        self.counters.increment(topic, "errors")
+        self.logger.error("Can't decode message on topic {!r}: {}".format(topic, err))
+
+    def _dispatch(self, frames):
+        if self.consumer_pool is None:
+            self._consume(frames)
+        else:
+            self.consumer_pool.submit(self._consume, frames, monotonic())
+
+    def _consume(self, frames, received=None):
+        if received is not None:
+            self.lag.add(monotonic() - received)
+        try:
+            topic, header, data = unpack_message(frames, self.serializer)
+            if header.flags & FLAG_DELTA:
+                data = self.delta_decoder.decode(topic, data)
+        except Exception as err:
+            self._decode_error(frames[0].bytes, err)
+            return
+        if header.flags & FLAG_DELTA and data is None:
+            self.counters.increment(topic, "skipped")
+            return
+        if header.flags & FLAG_BATCH and self.unbatch:
+            for sample in batch_samples(data):
+                self.consume_cb(sample, *self.consume_cb_args, **self.consume_cb_kwargs)
+        else:
+            self.consume_cb(data, *self.consume_cb_args, **self.consume_cb_kwargs)
+
+    def message_stats(self):
+        """
+        Returns:
+            dict: topic -> dict with "received", "conflated", "skipped" and
+                "errors" counts
+        """
+        return self.counters.as_dict()
+
+    def sequence_stats(self):
+        """
+        Returns:
+            dict: topic -> gap, reordering and latency statistics (see
+                pubsub_util.SequenceTracker)
+        """
+        return self.sequences.as_dict()
+
+    def consumer_stats(self):
+        """
+        Get statistics for the receive queue and consumer workers.
+
+        Returns:
+            dict: None if messages are consumed inline. Otherwise the
+                consumer pool's stats (see PausableThreadPool.stats), plus:
+                * "lag" (dict): time messages spent waiting in the queue
+                  before being consumed, in seconds (see LatencyStats)
+        """
+        if self.consumer_pool is None:
+            return None
+        stats = self.consumer_pool.stats()
+        stats["lag"] = self.lag.as_dict()
+        return stats
+
+    def pause_thread(self):
+        super(ZmqSubscriberThread, self).pause_thread()
+        if self.consumer_pool is not None:
+            self.consumer_pool.pause_thread()
+
+    def unpause_thread(self):
+        super(ZmqSubscriberThread, self).unpause_thread()
+        if self.consumer_pool is not None:
+            self.consumer_pool.unpause_thread()
+
+    def running(self):
+        running = super(ZmqSubscriberThread, self).running()
+        if self.consumer_pool is not None:
+            running = running or self.consumer_pool.running()
+        return running
+
+    def stop_thread(self):
+        """
+        Stop the thread. The thread itself stops the consumer workers and
+        closes the socket once it notices, as zmq sockets can't be closed from
+        another thread.
+        """
+        super(ZmqSubscriberThread, self).stop_thread()
+
+    def join(self, timeout=None):
+        super(ZmqSubscriberThread, self).join(timeout)
+        if self.consumer_pool is not None:
+            self.consumer_pool.join(timeout)
+
+
+class ShmSubscriberThread(PausableThread):
+    """
+    A Pausable Thread that reads records written by ShmPublisherThread and
+    passes them to consume_cb. Raw records are passed as a memoryview on the
+    shared memory itself, which is only good until the publisher wraps
+    around to it, so consume_cb should copy anything it wants to keep.
+
+    There's nothing to block on, so when there are no new records the thread
+    sleeps for poll_interval seconds before checking again.
+
+    Records are read in place, so the publisher can overwrite one while
+    it's being decoded. Each record's slot is checked before and after
+    decoding, and records that were overwritten in the meantime are
+    dropped rather than consumed. Raw records aren't copied by decoding, so
+    they're checked once more after consume_cb returns.
+
+    message_stats counts records "received", records the publisher
+    overwrote before they could be read ("overruns"), records overwritten
+    while they were being decoded, or while consume_cb was still using a
+    raw one ("torn"), and records that can't be decoded ("errors").
+    """
+    poll_interval = 0.001
+
+    def __init__(self, consume_cb, path,
+                    consume_cb_args=None,
+                    consume_cb_kwargs=None,
+                    serializer="serpent",
+                    **kwargs):
+
+        PausableThread.__init__(self, **kwargs)
+        self.consume_cb = consume_cb
+        if consume_cb_args is None: consume_cb_args = ()
+        if consume_cb_kwargs is None: consume_cb_kwargs = {}
+        self.consume_cb_args = consume_cb_args
+        self.consume_cb_kwargs = consume_cb_kwargs
+        self.serializer = get_serializer(serializer)
+        self.reader = ShmRingReader(path)
+        self.counters = TopicCounters(("received", "overruns", "torn", "errors"))
+
+    def run(self):
+        self._read()
+        self.reader.close()
+
+    @iterative_run
+    def _read(self):
+        overruns = self.reader.overruns
+        record = self.reader.read()
+        if self.reader.overruns > overruns:
+            self.counters.increment("", "overruns", self.reader.overruns - overruns)
+        if record is None:
+            self._stop_event.wait(self.poll_interval)
+            return
+        seq, flags, payload = record
+        self.counters.increment("", "received")
+        if not self.reader.valid(seq):
+            self.counters.increment("", "torn")
+            return
+        try:
+            data = decode_payload(payload, flags, self.serializer)
+        except Exception as err:
+            # garbage is expected from a record overwritten mid-decode
+            if self.reader.valid(seq):
+                self.counters.increment("", "errors")
+                self.logger.error("Can't decode record {}: {}".format(seq, err))
+                return
+            data = None
+        if not self.reader.valid(seq):
+            self.counters.increment("", "torn")
+            return
+        self.consume_cb(data, *self.consume_cb_args, **self.consume_cb_kwargs)
+        if flags & FLAG_RAW and not self.reader.valid(seq):
+            self.counters.increment("", "torn")
+
+    def message_stats(self):
+        """
+        Returns:
+            dict: {"": dict with "received", "overruns", "torn" and "errors"
+                counts}
+        """
+        return self.counters.as_dict()
+
+
+class _HubSubscription(object):
+    """
+    A single subscription serviced by ZmqSubscriberHub.
+    """
+    def __init__(self, subscription_id, address, topic, consume_cb,
+                 consume_cb_args, consume_cb_kwargs, unbatch, serializer=None):
+        self.id = subscription_id
+        self.address = address
+        self.topic = topic
+        self.consume_cb = consume_cb
+        self.consume_cb_args = consume_cb_args
+        self.consume_cb_kwargs = consume_cb_kwargs
+        self.unbatch = unbatch
+        self.serializer = serializer
+        self.paused = False
+
+    def consume(self, header, data):
+        if header.flags & FLAG_BATCH and self.unbatch:
+            for sample in batch_samples(data):
+                self.consume_cb(sample, *self.consume_cb_args, **self.consume_cb_kwargs)
+        else:
+            self.consume_cb(data, *self.consume_cb_args, **self.consume_cb_kwargs)
+
+
+class ZmqSubscriberHub(PausableThread):
+    """
+    Service many SUB sockets from a single thread.
+
+    ZmqSubscriberThread needs a thread per subscription, each blocked in
+    recv. The hub instead keeps one SUB socket per publisher address, waits
+    on all of them with a zmq.Poller, and dispatches each message to the
+    consume callbacks whose topic matches. Subscriptions can be added and
+    removed while the hub is running. Sockets are only ever touched from the
+    hub's own thread; subscribe and unsubscribe just queue up requests that
+    the hub picks up the next time it wakes up. Deltas are rebuilt into full
+    samples once per message, before dispatching. Messages that can't be
+    decoded are logged, counted under "errors" and skipped. With
+    report_drops set, missing messages are reported back to the publisher
+    they went missing from, like ZmqSubscriberThread does.
+
+    .. code-block:: python
+
+        hub = ZmqSubscriberHub()
+        hub.start()
+        for address in addresses:
+            hub.subscribe(address, consume)
+
+    Attributes:
+        context (zmq.Context): context used to create sockets
+        serializer (Serializer): serializer used to decode payloads that
+            don't say what they were encoded with
+        counters (TopicCounters): "received", "skipped" and "errors" counts
+            per topic
+        poll_timeout (int): milliseconds to wait in each poll. This bounds
+            how long the hub takes to notice new subscriptions or being stopped.
+    """
+    poll_timeout = 50
+
+    def __init__(self, context=None, serializer="serpent", rcvhwm=None,
+                 linger=None, report_drops=True, **kwargs):
+        """
+        Args:
+            context (zmq.Context, optional): Defaults to zmq.Context.instance()
+            serializer (str, optional): name of serializer, see
+                serializers.get_serializer ("serpent")
+            rcvhwm (int, optional): receive high-water mark for each socket
+            linger (int, optional): linger period for each socket
+            report_drops (bool, optional): tell publishers about messages
+                that went missing (True)
+            kwargs: passed to PausableThread
+        """
+        kwargs.setdefault("name", "ZmqSubscriberHub")
+        PausableThread.__init__(self, **kwargs)
+        if context is None:
+            context = zmq.Context.instance()
+        self.context = context
+        self.serializer = get_serializer(serializer)
+        self.rcvhwm = rcvhwm
+        self.linger = linger
+        self.report_drops = report_drops
+        self.counters = TopicCounters(("received", "skipped", "errors"))
+        self.poller = zmq.Poller()
+        self._decoders = {}
+        self._serializers = {}
+        self._sequences = {}
+        self._sockets = {}
+        self._addresses = {}
+        self._handlers = {}
+        self._subscriptions = {}
+        self._commands = collections.deque()
+        self._ids = itertools.count()
+
+    def subscribe(self, address, consume_cb, topic="",
+                  consume_cb_args=None, consume_cb_kwargs=None, unbatch=True,
+                  serializer=None):
+        """
+        Subscribe to a publisher.
+
+        Args:
+            address (str): publisher's address
+            consume_cb (callable): called with each message's payload
+            topic (str, optional): topic prefix to subscribe to ("")
+            consume_cb_args (tuple, optional): passed to consume_cb
+            consume_cb_kwargs (dict, optional): passed to consume_cb
+            unbatch (bool, optional): split batches up into samples (True)
+            serializer (str/Serializer, optional): serializer for this
+                address, eg a SchemaSerializer. Defaults to the hub's.
+        Returns:
+            int: subscription id, used to unsubscribe.
+        """
+        if consume_cb_args is None: consume_cb_args = ()
+        if consume_cb_kwargs is None: consume_cb_kwargs = {}
+        if serializer is not None:
+            serializer = get_serializer(serializer)
+        subscription = _HubSubscription(next(self._ids), address,
+                                        topic_bytes(topic), consume_cb,
+                                        consume_cb_args, consume_cb_kwargs,
+                                        unbatch, serializer)
+        with self._lock:
+            self._subscriptions[subscription.id] = subscription
+        self._commands.append(("subscribe", subscription))
+        return subscription.id
+
+    def unsubscribe(self, subscription_id):
+        """
+        Remove a subscription. The socket for its address is closed once it
+        has no subscriptions left.
+        """
+        with self._lock:
+            subscription = self._subscriptions.pop(subscription_id)
+        self._commands.append(("unsubscribe", subscription))
+
+    def pause_subscription(self, subscription_id):
+        """Drop messages for this subscription until it is unpaused."""
+        with self._lock:
+            self._subscriptions[subscription_id].paused = True
+
+    def unpause_subscription(self, subscription_id):
+        with self._lock:
+            self._subscriptions[subscription_id].paused = False
+
+    def subscriptions(self):
+        """
+        Returns:
+            dict: subscription id -> (address, topic)
+        """
+        with self._lock:
+            return dict((sub.id, (sub.address, sub.topic))
+                        for sub in self._subscriptions.values())
+
+    def message_stats(self):
+        """
+        Returns:
+            dict: topic -> dict with "received", "skipped" and "errors" counts
+        """
+        return self.counters.as_dict()
+
+    def sequence_stats(self):
+        """
+        Each publisher numbers its messages on its own, so sequences are
+        tracked separately for each address.
+
+        Returns:
+            dict: address -> topic -> gap, reordering and latency statistics
+                (see pubsub_util.SequenceTracker)
+        """
+        return dict((address, sequences.as_dict())
+                    for address, sequences in list(self._sequences.items()))
+
+    def _process_commands(self):
+        while self._commands:
+            command, subscription = self._commands.popleft()
+            address = subscription.address
+            if command == "subscribe":
+                if address not in self._sockets:
+                    socket = self.context.socket(
+                        zmq.XSUB if self.report_drops else zmq.SUB)
+                    configure_socket(socket, rcvhwm=self.rcvhwm, linger=self.linger)
+                    socket.connect(address)
+                    self.poller.register(socket, zmq.POLLIN)
+                    self._sockets[address] = socket
+                    self._addresses[socket] = address
+                    self._handlers[address] = []
+                    self._decoders[address] = DeltaDecoder()
+                    self._serializers[address] = self.serializer
+                    self._sequences[address] = SequenceTracker()
+                    self.logger.debug("Connected to {}".format(address))
+                if subscription.serializer is not None:
+                    self._serializers[address] = subscription.serializer
+                _subscribe(self._sockets[address], subscription.topic)
+                self._handlers[address].append(subscription)
+            elif command == "unsubscribe":
+                if subscription not in self._handlers.get(address, []):
+                    continue
+                socket = self._sockets[address]
+                _subscribe(socket, subscription.topic, subscribe=False)
+                self._handlers[address].remove(subscription)
+                if not self._handlers[address]:
+                    self._close_socket(address)
+
+    def _close_socket(self, address):
+        socket = self._sockets.pop(address)
+        del self._addresses[socket]
+        del self._handlers[address]
+        del self._decoders[address]
+        del self._serializers[address]
+        del self._sequences[address]
+        self.poller.unregister(socket)
+        socket.close()
+        self.logger.debug("Disconnected from {}".format(address))
+
+    def _dispatch(self, address, frames):
+        topic = frames[0].bytes
+        self.counters.increment(topic, "received")
+        try:
+            missing = self._sequences[address].track(topic, unpack_header(frames[1]))
+            if missing and self.report_drops:
+                _report_drops(self._sockets[address], topic, missing)
+            handlers = [sub for sub in self._handlers[address]
+                        if not sub.paused and topic.startswith(sub.topic)]
+            if not handlers:
+                return
+            topic, header, data = unpack_message(frames, self._serializers[address])
+            if header.flags & FLAG_DELTA:
+                data = self._decoders[address].decode(topic, data)
+        except Exception as err:
+            self.counters.increment(topic, "errors")
+            self.logger.error("Can't decode message on {}, topic {!r}: {}".format(
+                address, topic, err))
+            return
+        if header.flags & FLAG_DELTA and data is None:
+            self.counters.increment(topic, "skipped")
+            return
+        for subscription in handlers:
+            try:
+                subscription.consume(header, data)
+            except Exception as err:
+                self.logger.error(
+                    "Error consuming message on {}: {}".format(address, err),
+                    exc_info=True)
+
+    @iterative_run
+    def _poll(self):
+        self._process_commands()
+        if not self._sockets:
+            self._stop_event.wait(self.poll_timeout / 1000.0)
+            return
+        events = self.poller.poll(self.poll_timeout)
+        for socket, event in events:
+            try:
+                frames = recv_frames(socket, zmq.NOBLOCK)
+            except zmq.Again:
+                continue
+            self._dispatch(self._addresses[socket], frames)
+
+    def run(self):
+        self._poll()
+        for address in list(self._sockets.keys()):
+            self._close_socket(address)
@@ -3,23 +3,35 @@ import threading
 import time
 import sys
 import socket
+import heapq
+import itertools
+import multiprocessing
+import traceback
+import collections
+import concurrent.futures
 
 import Pyro5
 import six
+from six.moves import queue
 
 __all__ = [
     "iterative_run",
+    "FixedRateScheduler",
     "Pause",
     "PausableThread",
     "PausableThreadCallback",
     "CoopPausableThread",
+    "CoopPausableScheduler",
+    "PausableThreadPool",
+    "PausableProcess",
     "blocking",
-    "non_blocking",
-    "register_socket_error"
+    "non_blocking"
 ]
 
 module_logger = logging.getLogger(__name__)
 
+_monotonic = getattr(time, "monotonic", time.time)
+
 
 def iterative_run(run_fn):
     """
@@ -27,25 +39,147 @@ def iterative_run(run_fn):
     Allows one to pause and stop the thread while its repeatedly calling
     the overridden run function.
 
+    If the thread has a ``scheduler`` (a ``FixedRateScheduler``), each call
+    to the run function is started on the scheduler's fixed-rate grid instead
+    of immediately after the previous one returns.
+
     Args:
         run_fn (callable): the overridden run function from PausableThread
     Returns:
         callable: wrapped function
     """
     def wrapper(self):
+        scheduler = getattr(self, "scheduler", None)
         while True:
             if self.stopped():
                 break
             if self.paused():
+                if scheduler is not None:
+                    scheduler.reset()
                 time.sleep(0.001)
                 continue
             else:
+                if scheduler is not None:
+                    if not scheduler.wait(self._stop_event):
+                        break
+                    if self.paused():
+                        continue
                 self._running_event.set()
                 run_fn(self)
                 self._running_event.clear()
     return wrapper
 
 
+class FixedRateScheduler(object):
+    """
+    Schedule iterations against absolute monotonic deadlines.
+
+    Sleeping for a fixed period after doing some work makes the real period
+    the work time plus the sleep. This instead waits until the next point on
+    a fixed grid, so iterations don't drift. When an iteration overruns one
+    or more deadlines, ``policy`` decides what happens:
+
+    * ``"skip"``: drop the missed ticks and realign to the next grid point.
+    * ``"catchup"``: run the missed ticks back to back until caught up.
+
+    Attributes:
+        period (float): grid spacing, in seconds. Can be changed on the fly.
+        policy (str): "skip" or "catchup"
+        last_deadline (float): monotonic time of the most recent tick.
+    """
+    policies = ("skip", "catchup")
+
+    def __init__(self, period, policy="skip"):
+        if policy not in self.policies:
+            raise ValueError(
+                "Don't recognize deadline policy {}".format(policy))
+        self.period = period
+        self.policy = policy
+        self.last_deadline = None
+        self._next_deadline = None
+        self._lock = threading.Lock()
+        self._iterations = 0
+        self._missed = 0
+        self._skipped = 0
+        self._jitter_last = 0.0
+        self._jitter_max = 0.0
+        self._jitter_total = 0.0
+
+    def reset(self):
+        """Start a new grid at the next call to ``wait``."""
+        self._next_deadline = None
+
+    def wait(self, stop_event=None):
+        """
+        Block until the next deadline.
+
+        Args:
+            stop_event (threading.Event, optional): if set while waiting,
+                return early.
+        Returns:
+            bool: False if stop_event was set while waiting, True otherwise.
+        """
+        now = _monotonic()
+        if self._next_deadline is None:
+            self._next_deadline = now
+        deadline = self._next_deadline
+        if deadline > now:
+            if stop_event is not None:
+                if stop_event.wait(deadline - now):
+                    return False
+            else:
+                time.sleep(deadline - now)
+            now = _monotonic()
+
+        jitter = now - deadline
+        next_deadline = deadline + self.period
+        missed = now >= next_deadline
+        skipped = 0
+        if missed and self.policy == "skip":
+            skipped = int((now - next_deadline) // self.period) + 1
+            next_deadline += skipped * self.period
+        with self._lock:
+            self._iterations += 1
+            if missed:
+                self._missed += 1
+            self._skipped += skipped
+            self._jitter_last = jitter
+            self._jitter_total += jitter
+            self._jitter_max = max(self._jitter_max, jitter)
+        self.last_deadline = deadline
+        self._next_deadline = next_deadline
+        return True
+
+    def stats(self):
+        """
+        Get scheduling statistics.
+
+        Returns:
+            dict:
+                * "period" (float): current period
+                * "policy" (str): deadline policy
+                * "iterations" (int): number of ticks so far
+                * "missed_deadlines" (int): ticks that started after the
+                  following deadline had already passed
+                * "skipped_ticks" (int): ticks dropped by the "skip" policy
+                * "jitter_last", "jitter_mean", "jitter_max" (float): lateness
+                  of tick starts relative to the grid, in seconds
+        """
+        with self._lock:
+            iterations = self._iterations
+            return {
+                "period": self.period,
+                "policy": self.policy,
+                "iterations": iterations,
+                "missed_deadlines": self._missed,
+                "skipped_ticks": self._skipped,
+                "jitter_last": self._jitter_last,
+                "jitter_mean": (self._jitter_total / iterations
+                                if iterations else 0.0),
+                "jitter_max": self._jitter_max
+            }
+
+
 class Pause(object):
     """
     A context manager for pausing threads.
@@ -134,6 +268,8 @@ class PausableThread(threading.Thread):
         _stop_event (threading.Event): setting this stops thread.
         _running_event (threading.Event): setting this indicates thread is
             currently executing "run" method.
+        scheduler (FixedRateScheduler): If not None, ``iterative_run``
+            starts each iteration on this scheduler's grid.
 	  """
     def __init__(self, *args, **kwargs):
         """
@@ -147,9 +283,10 @@ class PausableThread(threading.Thread):
 		    # remove from kwargs
         name = kwargs.pop("name","PausableThread")
         logger = kwargs.pop("logger",None)
+        scheduler = kwargs.pop("scheduler",None)
         super(PausableThread, self).__init__(*args, **kwargs)
         if logger is None:
-            self.logger = module_logger.getChild(name)
+            logger = module_logger.getChild(name)
         self.logger = logger
         self.name = name
         self.daemon = True
@@ -158,6 +295,7 @@ class PausableThread(threading.Thread):
         self._pause_event = threading.Event()
         self._stop_event = threading.Event()
         self._running_event = threading.Event()
+        self.scheduler = scheduler
 
     def stop_thread(self):
         """
@@ -198,6 +336,15 @@ class PausableThread(threading.Thread):
     def running(self):
         return self._running_event.isSet()
 
+    def schedule_stats(self):
+        """
+        Get the fixed-rate scheduler's statistics, or None if the thread
+        isn't running on a fixed-rate grid.
+        """
+        if self.scheduler is None:
+            return None
+        return self.scheduler.stats()
+
 
 class PausableThreadCallback(PausableThread):
     """
@@ -252,10 +399,699 @@ class CoopPausableThread(PausableThreadCallback):
 
     def run(self):
         self._running_event.set()
-        for e in self.callback(*self.callback_args, **self.callback_kwargs):
+        try:
+            for e in self.callback(*self.callback_args, **self.callback_kwargs):
+                if self.paused():
+                    self._running_event.clear()
+                    while self.paused() and not self.stopped():
+                        time.sleep(0.001)
+                    self._running_event.set()
+                if self.stopped():
+                    break
+        finally:
+            # otherwise Pause would wait forever on a generator that raised
+            self._running_event.clear()
+
+
+class _CoopTask(object):
+    """
+    Bookkeeping for a generator scheduled by CoopPausableScheduler.
+    """
+    def __init__(self, name, generator, priority):
+        self.name = name
+        self.generator = generator
+        self.priority = priority
+        self.stride = 1.0 / priority
+        self.pass_value = 0.0
+        self.state = "ready"
+        self.steps = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def close(self):
+        try:
+            self.generator.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "priority": self.priority,
+            "steps": self.steps,
+            "total_time": self.total_time,
+            "mean_time": (self.total_time / self.steps
+                          if self.steps else 0.0),
+            "max_time": self.max_time
+        }
+
+
+class CoopPausableScheduler(PausableThread):
+    """
+    Round-robin many cooperative generator tasks on a single thread.
+
+    Each task is a generator. Every time it yields, the scheduler checks
+    whether it has been paused or stopped, and then moves on to the next
+    task. Tasks are picked with stride scheduling, so a task with priority 2
+    gets stepped twice as often as one with priority 1. If a task yields a
+    number, it is put to sleep for that many seconds without holding up the
+    other tasks, which is how polling routines should wait between polls:
+
+    .. code-block:: python
+
+        def poll_temperature():
+            while True:
+                read_temperature()
+                yield 1.0
+
+        scheduler = CoopPausableScheduler()
+        scheduler.add_task(poll_temperature)
+        scheduler.start()
+
+    Attributes:
+        _tasks (dict): name -> _CoopTask
+        _ready (list): heap of (pass value, counter, task) for runnable tasks
+        _sleeping (list): heap of (wake time, counter, task) for sleeping tasks
+        _pending (list): tasks added since the scheduler last looked.
+    """
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("name", "CoopPausableScheduler")
+        super(CoopPausableScheduler, self).__init__(*args, **kwargs)
+        self._tasks = {}
+        self._ready = []
+        self._sleeping = []
+        self._pending = []
+        self._counter = itertools.count()
+        self._pass = 0.0
+
+    def add_task(self, target, args=None, kwargs=None, priority=1, name=None):
+        """
+        Add a task to the scheduler. This can be called before or after the
+        scheduler is started.
+
+        Args:
+            target (callable): generator function
+            args (tuple, optional): passed to target
+            kwargs (dict, optional): passed to target
+            priority (float, optional): relative share of steps. (1)
+            name (str, optional): task name. Defaults to target's name
+                plus a counter.
+        Returns:
+            str: task name
+        """
+        if priority <= 0:
+            raise ValueError("priority must be positive")
+        if args is None: args = ()
+        if kwargs is None: kwargs = {}
+        if name is None:
+            name = "{}-{}".format(getattr(target, "__name__", "task"),
+                                  next(self._counter))
+        with self._lock:
+            if name in self._tasks and self._tasks[name].state in ("ready", "sleeping"):
+                raise ValueError("Task {} already exists".format(name))
+            task = _CoopTask(name, target(*args, **kwargs), priority)
+            self._tasks[name] = task
+            self._pending.append(task)
+        return name
+
+    def remove_task(self, name):
+        """
+        Remove a task. An active task is closed the next time the
+        scheduler reaches it.
+
+        Args:
+            name (str): task name
+        """
+        with self._lock:
+            task = self._tasks.pop(name)
+            if task.state in ("ready", "sleeping"):
+                task.state = "removed"
+
+    def task_names(self):
+        with self._lock:
+            return list(self._tasks.keys())
+
+    def task_stats(self):
+        """
+        Get per-task timing statistics.
+
+        Returns:
+            dict: task name -> dict with "state", "priority", "steps",
+                "total_time", "mean_time" and "max_time" keys. Times are
+                the time spent inside the generator, in seconds.
+        """
+        with self._lock:
+            return {name: task.stats() for name, task in self._tasks.items()}
+
+    def _schedule(self, task):
+        task.pass_value = max(task.pass_value, self._pass)
+        heapq.heappush(self._ready, (task.pass_value, next(self._counter), task))
+
+    def _admit(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for task in pending:
+            self._schedule(task)
+        now = _monotonic()
+        while self._sleeping and self._sleeping[0][0] <= now:
+            wake_time, _, task = heapq.heappop(self._sleeping)
+            if task.state == "sleeping":
+                task.state = "ready"
+            self._schedule(task)
+
+    def _step(self, task):
+        t0 = _monotonic()
+        finished = False
+        delay = None
+        try:
+            delay = next(task.generator)
+        except StopIteration:
+            task.state = "done"
+            finished = True
+        except Exception as err:
+            self.logger.error(
+                "Task {} failed: {}".format(task.name, err), exc_info=True)
+            task.state = "failed"
+            finished = True
+        dt = _monotonic() - t0
+        task.steps += 1
+        task.total_time += dt
+        task.max_time = max(task.max_time, dt)
+        if finished:
+            return
+        if task.state == "removed":
+            task.close()
+            return
+        task.pass_value += task.stride
+        if (isinstance(delay, (int, float)) and not isinstance(delay, bool)
+                and delay > 0):
+            task.state = "sleeping"
+            heapq.heappush(self._sleeping,
+                           (_monotonic() + delay, next(self._counter), task))
+        else:
+            self._schedule(task)
+
+    def run(self):
+        while True:
             if self.stopped():
                 break
-        self._running_event.clear()
+            if self.paused():
+                time.sleep(0.001)
+                continue
+            self._admit()
+            if not self._ready:
+                timeout = 0.01
+                if self._sleeping:
+                    timeout = min(timeout,
+                                  max(self._sleeping[0][0] - _monotonic(), 0.0))
+                self._stop_event.wait(timeout)
+                continue
+            pass_value, _, task = heapq.heappop(self._ready)
+            if task.state == "removed":
+                task.close()
+                continue
+            self._pass = pass_value
+            self._running_event.set()
+            self._step(task)
+            self._running_event.clear()
+
+        tasks = [task for _, _, task in self._ready + self._sleeping]
+        for task in tasks:
+            task.close()
+
+
+class _PoolWorker(PausableThread):
+    """
+    Worker thread for PausableThreadPool. Pulls tasks off of the pool's
+    queue, and keeps track of how much time it spends working on them.
+    """
+    def __init__(self, pool, *args, **kwargs):
+        super(_PoolWorker, self).__init__(*args, **kwargs)
+        self.pool = pool
+        self.busy_time = 0.0
+        self.tasks_done = 0
+        self.tasks_failed = 0
+        self.start_time = None
+
+    def run(self):
+        self.start_time = _monotonic()
+        while True:
+            if self.stopped():
+                break
+            # set running before checking pause status, so that Pause waits
+            # for any task picked up after pause_thread was called.
+            self._running_event.set()
+            if self.paused():
+                self._running_event.clear()
+                time.sleep(0.001)
+                continue
+            try:
+                future, fn, args, kwargs = self.pool._queue.get(timeout=0.01)
+            except queue.Empty:
+                self._running_event.clear()
+                continue
+            # the pool may have been paused while we were waiting on the
+            # queue. Put the task back at the head of the queue, so that it
+            # still runs first, and counts towards the queue's depth.
+            if self.paused() and not self.stopped():
+                self.pool._requeue((future, fn, args, kwargs))
+                self._running_event.clear()
+                continue
+            if self.stopped():
+                future.cancel()
+                self.pool._queue.task_done()
+                self._running_event.clear()
+                break
+            if future.set_running_or_notify_cancel():
+                t0 = _monotonic()
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                    self.tasks_done += 1
+                except Exception as err:
+                    self.logger.error(
+                        "Task {} failed: {}".format(fn, err), exc_info=True)
+                    future.set_exception(err)
+                    self.tasks_failed += 1
+                self.busy_time += _monotonic() - t0
+            self.pool._queue.task_done()
+            self._running_event.clear()
+
+    def utilization(self):
+        """Fraction of time since the worker started spent running tasks"""
+        if self.start_time is None:
+            return 0.0
+        elapsed = _monotonic() - self.start_time
+        if elapsed <= 0.0:
+            return 0.0
+        return min(self.busy_time / elapsed, 1.0)
+
+
+class PausableThreadPool(object):
+    """
+    A pausable, stoppable group of worker threads.
+
+    Workers pull tasks from a shared queue. The pool has the same control
+    interface as PausableThread, so it can be paused, unpaused and stopped
+    as a unit, including with the Pause context manager. Pausing lets
+    workers finish the task they're working on, but they won't pick up new
+    ones until the pool is unpaused.
+
+    Attributes:
+        name (str): name of pool. Workers are named "<name>-<index>".
+        logger (logging.getLogger): logging instance.
+        workers (list): _PoolWorker instances.
+        _queue (queue.Queue): shared task queue.
+    """
+    overflow_policies = ("block", "drop_oldest", "drop_newest")
+
+    def __init__(self, n_workers, maxsize=0, name="PausableThreadPool",
+                 logger=None, overflow="block"):
+        """
+        Args:
+            n_workers (int): number of worker threads
+            maxsize (int, optional): maximum number of queued tasks. 0 means
+                no limit. (0)
+            name (str, optional): name of pool ("PausableThreadPool")
+            logger (logging.getLogger, optional): logging instance.
+            overflow (str, optional): what ``submit`` does when the queue is
+                full. "block" waits for room, "drop_oldest" cancels the
+                oldest queued task to make room, and "drop_newest" cancels
+                the task being submitted. ("block")
+        """
+        if overflow not in self.overflow_policies:
+            raise ValueError("Don't recognize overflow policy {}".format(overflow))
+        if logger is None:
+            logger = module_logger.getChild(name)
+        self.name = name
+        self.logger = logger
+        self.overflow = overflow
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self.workers = [
+            _PoolWorker(self, name="{}-{}".format(name, i),
+                        logger=logger.getChild(str(i)))
+            for i in range(n_workers)
+        ]
+
+    def start(self):
+        """Start all worker threads"""
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue up fn to be called by one of the workers.
+
+        Args:
+            fn (callable): task to run
+            args: passed to fn
+            kwargs: passed to fn
+        Returns:
+            concurrent.futures.Future: holds the result of calling fn. It is
+                cancelled if the task gets dropped because the queue is full.
+        """
+        if self.stopped():
+            raise RuntimeError("Can't submit tasks to a stopped pool")
+        future = concurrent.futures.Future()
+        item = (future, fn, args, kwargs)
+        if self.overflow == "block":
+            self._queue.put(item)
+            return future
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return future
+            except queue.Full:
+                pass
+            if self.overflow == "drop_newest":
+                dropped = future
+            else:
+                try:
+                    dropped = self._queue.get_nowait()[0]
+                except queue.Empty:
+                    continue
+                self._queue.task_done()
+            dropped.cancel()
+            with self._lock:
+                self.dropped += 1
+            if dropped is future:
+                return future
+
+    def _requeue(self, item):
+        """
+        Put a task a worker took off the queue back at the head of the queue.
+        If a task was submitted in the meantime and filled the queue, the
+        overflow policy applies.
+
+        Args:
+            item (tuple): (future, fn, args, kwargs), as taken off the queue
+        """
+        dropped = None
+        with self._queue.mutex:
+            tasks = self._queue.queue
+            full = 0 < self._queue.maxsize <= len(tasks)
+            if full and self.overflow == "drop_oldest":
+                dropped = item[0]
+            else:
+                if full and self.overflow == "drop_newest":
+                    dropped = tasks.pop()[0]
+                tasks.appendleft(item)
+                self._queue.not_empty.notify()
+        if dropped is not None:
+            # task_done acquires the queue's mutex, so call it outside
+            self._queue.task_done()
+            dropped.cancel()
+            with self._lock:
+                self.dropped += 1
+
+    def stop_thread(self):
+        """
+        Stop all workers, and cancel any tasks still in the queue. Make sure
+        to join this up with PausableThreadPool.join()
+        """
+        self._stop_event.set()
+        for worker in self.workers:
+            worker.stop_thread()
+        while True:
+            try:
+                future, fn, args, kwargs = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.cancel()
+            self._queue.task_done()
+
+    def stop(self):
+        """Alias for self.stop_thread"""
+        return self.stop_thread()
+
+    def pause_thread(self):
+        for worker in self.workers:
+            worker.pause_thread()
+
+    def pause(self):
+        """Alias for self.pause_thread"""
+        return self.pause_thread()
+
+    def unpause_thread(self):
+        for worker in self.workers:
+            worker.unpause_thread()
+
+    def unpause(self):
+        """Alias for self.unpause_thread"""
+        return self.unpause_thread()
+
+    def join(self, timeout=None):
+        for worker in self.workers:
+            worker.join(timeout)
+
+    def stopped(self):
+        return self._stop_event.isSet()
+
+    def paused(self):
+        return all(worker.paused() for worker in self.workers)
+
+    def running(self):
+        return any(worker.running() for worker in self.workers)
+
+    def queue_depth(self):
+        """Number of tasks waiting to be picked up by a worker"""
+        return self._queue.qsize()
+
+    def utilization(self):
+        """Mean fraction of time workers have spent running tasks"""
+        if not self.workers:
+            return 0.0
+        return (sum(worker.utilization() for worker in self.workers) /
+                len(self.workers))
+
+    def stats(self):
+        """
+        Get pool statistics.
+
+        Returns:
+            dict:
+                * "workers" (int): number of worker threads
+                * "queue_depth" (int): tasks waiting in the queue
+                * "tasks_done" (int): tasks that returned normally
+                * "tasks_failed" (int): tasks that raised an exception
+                * "dropped" (int): tasks dropped because the queue was full
+                * "utilization" (float): mean worker utilization
+                * "worker_utilization" (list): per-worker utilization
+        """
+        return {
+            "workers": len(self.workers),
+            "queue_depth": self.queue_depth(),
+            "tasks_done": sum(w.tasks_done for w in self.workers),
+            "tasks_failed": sum(w.tasks_failed for w in self.workers),
+            "dropped": self.dropped,
+            "utilization": self.utilization(),
+            "worker_utilization": [w.utilization() for w in self.workers]
+        }
+
+
+class PausableProcess(multiprocessing.Process):
+    """
+    A pausable, stoppable process that runs the same callback over and over
+    again.
+
+    This is the process-backed counterpart of PausableThreadCallback, for
+    CPU-bound callbacks that would otherwise hold the GIL and slow down the
+    Pyro request threads. Pause, stop and running state are shared with
+    the child process through multiprocessing events. Each return value of
+    the callback is sent back to the parent over a pipe, and is available
+    through ``recv``/``drain``, or passed to ``result_cb`` on a thread in the
+    parent process. Results that aren't read are held in the pipe, which
+    eventually blocks the child until the parent catches up. Once the
+    process has been stopped, ``join`` reads whatever the child is still
+    sending, so that it can exit; those results stay available to
+    ``recv``/``drain``. Pausing waits for the callback to return, but not
+    for its result to be sent, so a result may still arrive after pausing.
+
+    The callback, its arguments and its results have to be picklable.
+
+    Attributes:
+        logger (logging.getLogger): logging instance.
+        result_cb (callable): called in the parent with each result.
+        _pause_event (multiprocessing.Event): setting and clearing this
+            indicates to pause or unpause process.
+        _stop_event (multiprocessing.Event): setting this stops process.
+        _running_event (multiprocessing.Event): setting this indicates process
+            is currently executing the callback.
+    """
+    def __init__(self, target=None, args=None, kwargs=None,
+                 name="PausableProcess", result_cb=None, logger=None):
+        """
+        Args:
+            target (callable): callback to run in the child process
+            args (tuple, optional): passed to target
+            kwargs (dict, optional): passed to target
+            name (str, optional): name of process ("PausableProcess")
+            result_cb (callable, optional): If given, called in the parent
+                process with each result.
+            logger (logging.getLogger, optional): logging instance.
+        """
+        if args is None: args = ()
+        if kwargs is None: kwargs = {}
+        super(PausableProcess, self).__init__(name=name)
+        if logger is None:
+            logger = module_logger.getChild(name)
+        self.logger = logger
+        self.daemon = True
+        self.callback = target
+        self.callback_args = args
+        self.callback_kwargs = kwargs
+        self.result_cb = result_cb
+        self._pause_event = multiprocessing.Event()
+        self._stop_event = multiprocessing.Event()
+        self._running_event = multiprocessing.Event()
+        self._recv_conn, self._send_conn = multiprocessing.Pipe(duplex=False)
+        self._result_thread = None
+        # results read off the pipe by join, not yet returned by recv/drain
+        self._received = collections.deque()
+
+    def start(self):
+        super(PausableProcess, self).start()
+        # only the child writes to the pipe
+        self._send_conn.close()
+        if self.result_cb is not None:
+            self._result_thread = threading.Thread(target=self._dispatch_results)
+            self._result_thread.daemon = True
+            self._result_thread.start()
+
+    def run(self):
+        self._recv_conn.close()
+        while True:
+            if self.stopped():
+                break
+            # set running before checking pause status, so that Pause waits
+            # for a call that started just after pause_thread was called.
+            self._running_event.set()
+            if self.paused():
+                self._running_event.clear()
+                time.sleep(0.001)
+                continue
+            # running is cleared before sending, as send blocks while the
+            # pipe is full, and pausing waits for running to clear.
+            try:
+                result = self.callback(*self.callback_args,
+                                       **self.callback_kwargs)
+                self._running_event.clear()
+                self._send_conn.send((True, result))
+            except Exception:
+                self._running_event.clear()
+                self._send_conn.send((False, traceback.format_exc()))
+        self._send_conn.close()
+
+    def _unpack(self, msg):
+        ok, result = msg
+        if not ok:
+            raise RuntimeError(
+                "Callback in {} failed:\n{}".format(self.name, result))
+        return result
+
+    def _dispatch_results(self):
+        while True:
+            try:
+                msg = self._recv_conn.recv()
+            except (EOFError, OSError):
+                break
+            try:
+                self.result_cb(self._unpack(msg))
+            except Exception as err:
+                self.logger.error(err, exc_info=True)
+
+    def recv(self, timeout=None):
+        """
+        Get the next result from the child process.
+
+        Args:
+            timeout (float, optional): seconds to wait. None waits forever.
+        Returns:
+            object: return value of callback
+        Raises:
+            queue.Empty: if no result arrived within timeout
+            RuntimeError: if the callback raised an exception in the child
+        """
+        if self._received:
+            return self._unpack(self._received.popleft())
+        if not self._recv_conn.poll(timeout):
+            raise queue.Empty()
+        return self._unpack(self._recv_conn.recv())
+
+    def drain(self):
+        """
+        Get all results currently waiting in the pipe.
+
+        Returns:
+            list: return values of callback, oldest first
+        """
+        results = []
+        while self._received:
+            results.append(self._unpack(self._received.popleft()))
+        while self._recv_conn.poll():
+            try:
+                results.append(self._unpack(self._recv_conn.recv()))
+            except EOFError:
+                break
+        return results
+
+    def stop_process(self):
+        """
+        Set self._stop_event. Make sure to join this up with
+        multiprocessing.Process.join()
+        """
+        self._stop_event.set()
+
+    def join(self, timeout=None):
+        """
+        Wait for the child process to exit. If it has been stopped, keep
+        reading results off the pipe in the meantime, so that a child blocked
+        sending to a full pipe isn't left waiting on a parent that's waiting
+        on it.
+
+        Args:
+            timeout (float, optional): seconds to wait. None waits forever.
+        """
+        if self._result_thread is not None or not self.stopped():
+            return super(PausableProcess, self).join(timeout)
+        deadline = None if timeout is None else _monotonic() + timeout
+        while self.is_alive():
+            wait = 0.01
+            if deadline is not None:
+                wait = min(wait, deadline - _monotonic())
+                if wait <= 0.0:
+                    return
+            try:
+                if self._recv_conn.poll(wait):
+                    self._received.append(self._recv_conn.recv())
+            except (EOFError, OSError):
+                break
+        super(PausableProcess, self).join(timeout)
+
+    def pause_process(self):
+        """Set self._pause_event"""
+        self._pause_event.set()
+
+    def unpause_process(self):
+        """Clear self._pause_event"""
+        self._pause_event.clear()
+
+    # aliases, so that PausableProcess can be used anywhere a PausableThread
+    # can, including with Pause
+    stop = stop_thread = stop_process
+    pause = pause_thread = pause_process
+    unpause = unpause_thread = unpause_process
+
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def paused(self):
+        return self._pause_event.is_set()
+
+    def running(self):
+        return self._running_event.is_set()
 
 
 def blocking(func):
@@ -0,0 +1,49 @@
+import unittest
+
+import numpy
+
+from support_pyro.support_pyro4.aggregation import ColumnBuffer
+from support_pyro.support_pyro4.serializers import RecordSchema
+from support_pyro.support_pyro4.pubsub_util import make_batch
+
+
+class TestColumnBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.buffer = ColumnBuffer(["t", "x"], capacity=8, time_field="t")
+
+    def test_wrap(self):
+        for i in range(12):
+            self.buffer.append({"t": float(i), "x": i * 2.0, "other": "ignored"})
+        self.assertTrue(len(self.buffer) == 8)
+        window = self.buffer.window()
+        self.assertTrue(list(window["t"]) == list(range(4, 12)))
+        self.assertTrue(list(self.buffer.window(n=3)["x"]) == [18.0, 20.0, 22.0])
+        self.assertTrue(list(self.buffer.window(seconds=2.0)["t"]) == [9.0, 10.0, 11.0])
+
+    def test_extend(self):
+        self.buffer.extend({"t": numpy.arange(5.0), "x": numpy.ones(5)})
+        self.buffer.extend({"t": numpy.arange(5.0, 25.0), "x": numpy.zeros(20)})
+        self.assertTrue(list(self.buffer.window()["t"]) == list(range(17, 25)))
+        self.buffer.consume(make_batch([{"t": 25.0, "x": 3.0}, {"t": 26.0, "x": 5.0}]))
+        self.assertTrue(self.buffer.max("x", n=2) == 5.0)
+        self.assertTrue(self.buffer.mean("x", seconds=1.0) == 4.0)
+
+    def test_stats(self):
+        self.assertTrue(self.buffer.stats()["x"]["mean"] is None)
+        for i in range(5):
+            self.buffer.consume({"t": float(i), "x": float(i)})
+        stats = self.buffer.stats(percentiles=(50,))
+        self.assertTrue(stats["n"] == 5)
+        self.assertTrue(stats["x"] == {"mean": 2.0, "min": 0.0, "max": 4.0, "p50": 2.0})
+        self.assertTrue(self.buffer.percentile("x", 100, seconds=1.0) == 4.0)
+
+    def test_schema(self):
+        schema = RecordSchema([("time", "d"), ("status", "B")])
+        buffer = ColumnBuffer.from_schema(schema, capacity=4)
+        buffer.append({"time": 1.0, "status": 3})
+        self.assertTrue(buffer.window()["status"].dtype == numpy.uint8)
+
+
+if __name__ == "__main__":
+    unittest.main()
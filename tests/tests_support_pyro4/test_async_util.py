@@ -0,0 +1,84 @@
+import unittest
+import asyncio
+
+from support_pyro.support_pyro4.async_util import (
+    PausableTask,
+    AsyncPause,
+    async_iterative_run
+)
+
+
+class CountingTask(PausableTask):
+
+    def __init__(self, *args, **kwargs):
+        super(CountingTask, self).__init__(*args, **kwargs)
+        self.count = 0
+
+    @async_iterative_run
+    async def run(self):
+        self.count += 1
+        await self.sleep(0.01)
+
+
+class TestPausableTask(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_target(self):
+        calls = []
+
+        async def callback(x):
+            calls.append(x)
+            await asyncio.sleep(0.01)
+
+        async def main():
+            task = PausableTask(target=callback, args=("hello",))
+            task.start()
+            await asyncio.sleep(0.1)
+            task.stop()
+            await task.join()
+
+        self.loop.run_until_complete(main())
+        self.assertTrue(len(calls) > 1)
+        self.assertTrue(all(x == "hello" for x in calls))
+
+    def test_pause(self):
+
+        async def main():
+            task = CountingTask()
+            task.start()
+            await asyncio.sleep(0.05)
+            async with AsyncPause(task):
+                self.assertTrue(task.paused())
+                self.assertFalse(task.running())
+                count = task.count
+                await asyncio.sleep(0.05)
+                self.assertTrue(task.count == count)
+            self.assertFalse(task.paused())
+            await asyncio.sleep(0.05)
+            self.assertTrue(task.count > count)
+            task.stop()
+            await task.join()
+
+        self.loop.run_until_complete(main())
+
+    def test_stop_while_paused(self):
+
+        async def main():
+            task = CountingTask()
+            task.start()
+            task.pause()
+            await asyncio.sleep(0.01)
+            task.stop()
+            await asyncio.wait_for(task.join(), 1.0)
+            self.assertTrue(task.stopped())
+
+        self.loop.run_until_complete(main())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,448 @@
+import unittest
+import itertools
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy
+import zmq
+
+from support_pyro.support_pyro4.publisher_threads import (
+    ZmqPublisherThread,
+    ZmqBroker,
+    ShmPublisherThread,
+    Pyro4PublisherThread
+)
+from support_pyro.support_pyro4.subscriber_threads import (
+    ZmqSubscriberThread,
+    ShmSubscriberThread
+)
+from support_pyro.support_pyro4.pubsub_util import (
+    unpack_message,
+    decode_payload,
+    batch_samples,
+    recv_frames,
+    make_endpoints,
+    RateController,
+    pack_drop_report,
+    FLAG_BATCH
+)
+from support_pyro.support_pyro4.serializers import (
+    RecordSchema,
+    SchemaSerializer,
+    get_serializer
+)
+from support_pyro.support_pyro4.replay_log import ReplayLog
+from support_pyro.support_pyro4.shm_ring import shm_path
+# after the package, which installs Pyro5's Pyro4 compatibility layer
+import Pyro4
+
+_ids = itertools.count()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def dropped(publisher, topic=""):
+    # topics only show up in message_stats once something was sent on them
+    return publisher.message_stats().get(topic, {}).get("dropped", 0)
+
+
+class Counter(object):
+
+    def __init__(self):
+        self.i = 0
+
+    def __call__(self):
+        self.i += 1
+        return {"i": self.i, "x": 0.5}
+
+
+class Handler(object):
+
+    def __init__(self):
+        self.received = []
+
+    def consume(self, data):
+        self.received.append(data)
+
+
+class PubSubTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.context = zmq.Context.instance()
+        self.address = "inproc://test_publisher_threads_{}".format(next(_ids))
+        self.counter = Counter()
+        self.received = []
+        self.threads = []
+
+    def tearDown(self):
+        for thread in self.threads:
+            thread.stop_thread()
+        for thread in self.threads:
+            thread.join(2.0)
+
+    def start(self, thread):
+        self.threads.append(thread)
+        thread.start()
+        return thread
+
+    def publish(self, **kwargs):
+        address = kwargs.pop("address", self.address)
+        return self.start(ZmqPublisherThread(0.002, self.counter, self.context,
+                                             address, **kwargs))
+
+    def subscribe(self, address=None, consume_cb=None, **kwargs):
+        if address is None: address = self.address
+        if consume_cb is None: consume_cb = self.received.append
+        return self.start(ZmqSubscriberThread(consume_cb, self.context,
+                                              address, **kwargs))
+
+    def assertConsecutive(self, samples):
+        values = [sample["i"] for sample in samples]
+        self.assertTrue(values == list(range(values[0], values[0] + len(values))))
+
+
+class TestZmqPublisherThread(PubSubTestCase):
+
+    def test_multipart(self):
+        self.publish(topic="topic")
+        socket = self.context.socket(zmq.SUB)
+        socket.connect(self.address)
+        socket.setsockopt(zmq.SUBSCRIBE, b"topic")
+        try:
+            self.assertTrue(socket.poll(2000))
+            frames = recv_frames(socket)
+        finally:
+            socket.close()
+        self.assertTrue(len(frames) == 3 and frames[0].bytes == b"topic")
+        topic, header, data = unpack_message(frames, "serpent")
+        self.assertTrue(header.seq > 0 and data["i"] == header.seq)
+
+    def test_batching(self):
+        self.publish(batch_size=5)
+        self.subscribe()
+        self.assertTrue(wait_for(lambda: len(self.received) >= 10))
+        self.assertConsecutive(self.received)
+        self.assertTrue(self.received[0]["i"] % 5 == 1)
+
+    def test_delta(self):
+        self.publish(delta=True, keyframe_interval=3)
+        self.subscribe()
+        self.assertTrue(wait_for(lambda: len(self.received) >= 10))
+        self.assertConsecutive(self.received)
+        self.assertTrue(all(sample["x"] == 0.5 for sample in self.received))
+
+    def test_delta_late_subscriber(self):
+        publisher = self.publish(delta=True, keyframe_interval=100000)
+        self.assertTrue(wait_for(lambda: self.counter.i >= 10))
+        self.subscribe()
+        self.assertTrue(wait_for(lambda: len(self.received) >= 5, timeout=1.0))
+        self.assertConsecutive(self.received)
+        self.assertTrue(publisher.subscriber_counts() is None)
+
+    def test_snapshot(self):
+        publisher = self.publish(topic="topic")
+        self.assertTrue(wait_for(lambda: "topic" in publisher.snapshot()))
+        self.assertTrue(publisher.snapshot()["topic"]["x"] == 0.5)
+
+    def test_sequence(self):
+        self.publish()
+        subscriber = self.subscribe()
+        self.assertTrue(wait_for(lambda: len(self.received) >= 10))
+        stats = subscriber.sequence_stats()[""]
+        self.assertTrue(stats["gaps"] == 0 and stats["last_seq"] >= 10)
+        self.assertTrue(stats["latency"]["count"] >= 10)
+
+    def test_replay_log(self):
+        directory = tempfile.mkdtemp()
+        log = ReplayLog(directory)
+        socket = self.context.socket(zmq.SUB)
+        try:
+            publisher = self.publish(replay_log=log)
+            socket.connect(self.address)
+            socket.setsockopt(zmq.SUBSCRIBE, b"")
+            self.assertTrue(socket.poll(2000))
+            topic, header, data = unpack_message(recv_frames(socket), "serpent")
+            seq, timestamp, flags, payload = log.get(header.seq)
+            self.assertTrue(seq == header.seq)
+            self.assertTrue(decode_payload(payload, flags, "serpent") == data)
+            self.tearDown()
+            self.threads = []
+            self.assertTrue([record[0] for record in log.read()] ==
+                            list(range(1, publisher.seq + 1)))
+            # sequence numbers carry on from the log
+            restarted = ZmqPublisherThread(0.002, self.counter, self.context,
+                                           self.address, replay_log=log)
+            restarted.socket.close()
+            self.assertTrue(restarted.seq == publisher.seq)
+        finally:
+            socket.close()
+            log.close()
+            shutil.rmtree(directory)
+
+    def test_replay_log_batch(self):
+        directory = tempfile.mkdtemp()
+        log = ReplayLog(directory)
+        try:
+            self.publish(replay_log=log, batch_size=5)
+            self.assertTrue(wait_for(lambda: log.last_seq() >= 2))
+            seq, timestamp, flags, payload = log.get(2)
+            self.assertTrue(flags & FLAG_BATCH)
+            samples = batch_samples(get_serializer("serpent").loads_batch_frames([payload]))
+            self.assertTrue([sample["i"] for sample in samples] == list(range(6, 11)))
+            self.tearDown()
+            self.threads = []
+        finally:
+            log.close()
+            shutil.rmtree(directory)
+
+    def test_numpy_batch(self):
+        directory = tempfile.mkdtemp()
+        log = ReplayLog(directory)
+        try:
+            self.counter = lambda: numpy.arange(3.0)
+            self.publish(serializer="numpy", batch_size=4, replay_log=log)
+            self.subscribe(serializer="numpy")
+            self.assertTrue(wait_for(lambda: len(self.received) >= 8))
+            self.assertTrue((self.received[0] == numpy.arange(3.0)).all())
+            seq, timestamp, flags, payload = log.get(1)
+            batch = get_serializer("numpy").loads_batch_frames([payload])
+            self.assertTrue(batch["rows"].shape == (4, 3))
+            self.tearDown()
+            self.threads = []
+        finally:
+            log.close()
+            shutil.rmtree(directory)
+
+    def test_codec(self):
+        self.publish(serializer="json")
+        self.subscribe(serializer="serpent")
+        self.assertTrue(wait_for(lambda: len(self.received) >= 3))
+        self.assertTrue(self.received[0]["x"] == 0.5)
+
+    def test_schema(self):
+        serializer = SchemaSerializer(RecordSchema([("i", "q"), ("x", "d")]))
+        self.publish(serializer=serializer)
+        self.subscribe(serializer=serializer)
+        self.assertTrue(wait_for(lambda: len(self.received) >= 3))
+        self.assertConsecutive(self.received)
+
+    def test_auto_pause(self):
+        publisher = self.publish(auto_pause=True)
+        time.sleep(0.1)
+        self.assertTrue(publisher.idle and self.counter.i == 0)
+        self.subscribe()
+        self.assertTrue(wait_for(lambda: len(self.received) >= 3))
+        self.assertFalse(publisher.idle)
+        self.assertTrue(publisher.subscriber_counts() == {"": 1})
+
+    def test_stalled_subscriber(self):
+        publisher = self.publish(drop_policy="conflate")
+        stalled = self.context.socket(zmq.SUB)
+        stalled.setsockopt(zmq.RCVHWM, 1)
+        stalled.connect(self.address)
+        stalled.setsockopt(zmq.SUBSCRIBE, b"")
+        try:
+            subscriber = self.subscribe()
+            self.assertTrue(wait_for(lambda: len(self.received) >= 100, timeout=5.0))
+            self.assertTrue(subscriber.sequence_stats()[""]["gaps"] == 0)
+            self.assertConsecutive(self.received)
+            waiting = 0
+            while stalled.poll(0):
+                recv_frames(stalled)
+                waiting += 1
+            self.assertTrue(waiting <= 3)
+        finally:
+            stalled.close()
+        publisher.report_drops(5)
+        self.assertTrue(publisher.message_stats()[""]["dropped"] == 5)
+
+    def test_drop_reports(self):
+        publisher = self.publish(sndhwm=1)
+
+        def consume(sample):
+            time.sleep(0.01)
+            self.received.append(sample)
+
+        subscriber = self.subscribe(consume_cb=consume, rcvhwm=1)
+        self.assertTrue(wait_for(
+            lambda: dropped(publisher) > 0, timeout=5.0))
+        missing = subscriber.sequence_stats()[""]["missing"]
+        self.assertTrue(0 < publisher.message_stats()[""]["dropped"] <= missing)
+
+    def test_rate_controller(self):
+        publisher = self.publish(sndhwm=1,
+                                 rate_controller=RateController(interval=0.05))
+
+        def consume(sample):
+            time.sleep(0.01)
+
+        self.subscribe(consume_cb=consume, rcvhwm=1)
+        self.assertTrue(wait_for(
+            lambda: publisher.rate_stats()["slowdown"] > 1.0, timeout=5.0))
+        self.assertTrue(publisher.update_rate > 0.002)
+
+    def test_addresses(self):
+        transports = ("inproc", "ipc") if zmq.has("ipc") else ("inproc",)
+        addresses = make_endpoints(transports)["addresses"]
+        self.publish(address=list(addresses.values()))
+        received = dict((transport, []) for transport in addresses)
+        for transport, address in addresses.items():
+            self.subscribe(address=address, consume_cb=received[transport].append)
+        for samples in received.values():
+            self.assertTrue(wait_for(lambda: len(samples) >= 3))
+
+
+class TestZmqBroker(PubSubTestCase):
+
+    def test_drop_reports(self):
+        broker = self.start(ZmqBroker(context=self.context,
+                                      backend_address=self.address))
+        publisher = self.publish(address=broker.frontend_address,
+                                 connect=True, topic="topic")
+        socket = self.context.socket(zmq.XSUB)
+        socket.connect(self.address)
+        try:
+            socket.send(b"\x01topic")
+            self.assertTrue(socket.poll(2000))
+            socket.send(pack_drop_report("other", 2))
+            socket.send(pack_drop_report("topic", 3))
+            self.assertTrue(wait_for(
+                lambda: dropped(publisher, "topic") == 3))
+        finally:
+            socket.close()
+
+    def test_default_backend(self):
+        broker = self.start(ZmqBroker(context=self.context))
+        self.assertTrue(broker.backend_address.startswith("tcp://"))
+        self.assertTrue(int(broker.backend_address.rsplit(":", 1)[1]) > 0)
+
+    def test_forward(self):
+        broker = self.start(ZmqBroker(context=self.context,
+                                      backend_address=self.address))
+        self.publish(address=broker.frontend_address, connect=True,
+                     topic="a", auto_pause=True)
+        self.subscribe(topic="a")
+        self.assertTrue(wait_for(lambda: len(self.received) >= 3))
+        self.assertTrue(broker.subscriber_counts() == {"a": 1})
+        self.assertTrue(wait_for(lambda: broker.message_stats()["a"]["messages"] >= 3))
+
+
+class TestShmPublisherThread(PubSubTestCase):
+
+    def test_publish(self):
+        publisher = ShmPublisherThread(0.002, self.counter, shm_path(),
+                                       record_size=256, capacity=16)
+        subscriber = ShmSubscriberThread(self.received.append, publisher.writer.path)
+        self.start(subscriber)
+        self.start(publisher)
+        self.assertTrue(wait_for(lambda: len(self.received) >= 5))
+        self.assertConsecutive(self.received)
+        self.assertTrue(subscriber.message_stats()[""]["torn"] == 0)
+
+
+class TestPyro4PublisherThread(PubSubTestCase):
+
+    def test_fan_out(self):
+        handlers = [Handler(), Handler()]
+        publisher = self.start(Pyro4PublisherThread(
+            0.002, self.counter,
+            cb_info=[{"cb": "consume", "cb_handler": handler} for handler in handlers]))
+        for handler in handlers:
+            self.assertTrue(wait_for(lambda: len(handler.received) >= 5))
+            self.assertConsecutive(handler.received)
+        self.assertTrue(publisher.fanout_stats()["subscribers"] == 2)
+
+    def test_evict(self):
+        class Failing(object):
+            def consume(self, data):
+                raise RuntimeError("failed")
+        publisher = self.start(Pyro4PublisherThread(
+            0.002, self.counter, max_failures=2,
+            cb_info={"cb": "consume", "cb_handler": Failing()}))
+        self.assertTrue(wait_for(lambda: publisher.fanout_stats()["evicted"] == 1))
+        self.assertTrue(publisher.fanout_stats()["subscribers"] == 0)
+
+    def test_proxy(self):
+        handler = Pyro4.expose(Handler)()
+        daemon = Pyro4.Daemon()
+        uri = daemon.register(handler)
+        daemon_thread = threading.Thread(target=daemon.requestLoop)
+        daemon_thread.daemon = True
+        daemon_thread.start()
+        try:
+            publisher = self.start(Pyro4PublisherThread(
+                0.002, self.counter, fanout_workers=2,
+                cb_info={"cb": "consume", "cb_handler": Pyro4.Proxy(uri)}))
+            self.assertTrue(wait_for(lambda: len(handler.received) >= 5))
+            self.assertConsecutive(handler.received)
+            self.assertTrue(publisher.fanout_stats()["evicted"] == 0)
+        finally:
+            daemon.shutdown()
+            daemon_thread.join(2.0)
+
+    def test_evict_hung(self):
+        release = threading.Event()
+
+        class Hung(object):
+            @Pyro4.expose
+            def consume(self, data):
+                release.wait()
+
+        daemon = Pyro4.Daemon()
+        uri = daemon.register(Hung())
+        daemon_thread = threading.Thread(target=daemon.requestLoop)
+        daemon_thread.daemon = True
+        daemon_thread.start()
+        try:
+            publisher = self.start(Pyro4PublisherThread(
+                0.002, self.counter, callback_timeout=0.1, max_failures=2,
+                cb_info={"cb": "consume", "cb_handler": Pyro4.Proxy(uri)}))
+            self.assertTrue(wait_for(
+                lambda: publisher.fanout_stats()["evicted"] == 1, timeout=3.0))
+        finally:
+            release.set()
+            daemon.shutdown()
+            daemon_thread.join(2.0)
+
+    def test_batching(self):
+        handler = Handler()
+        self.start(Pyro4PublisherThread(
+            0.002, self.counter, batch_size=5,
+            cb_info={"cb": "consume", "cb_handler": handler}))
+        self.assertTrue(wait_for(lambda: len(handler.received) >= 2))
+        samples = [sample for batch in handler.received
+                   for sample in batch_samples(batch)]
+        self.assertTrue(len(samples) == 5 * len(handler.received))
+        self.assertConsecutive(samples)
+
+    def test_rate_controller(self):
+        class Slow(Handler):
+            def consume(self, data):
+                time.sleep(0.02)
+                super(Slow, self).consume(data)
+        publisher = self.start(Pyro4PublisherThread(
+            0.002, self.counter, queue_size=2,
+            rate_controller=RateController(interval=0.05),
+            cb_info={"cb": "consume", "cb_handler": Slow()}))
+        self.assertTrue(wait_for(lambda: publisher.rate_stats()["slowdown"] > 1))
+        self.assertTrue(publisher.rate_stats()["period"] > 0.002)
+
+    def test_fixed_rate(self):
+        publisher = self.start(Pyro4PublisherThread(
+            0.002, self.counter, fixed_rate=True,
+            cb_info={"cb": "consume", "cb_handler": Handler()}))
+        self.assertTrue(wait_for(
+            lambda: publisher.schedule_stats()["iterations"] >= 5))
+        publisher.change_rate(0.005)
+        self.assertTrue(publisher.schedule_stats()["period"] == 0.005)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+import glob
+import os
+import tempfile
+
+import zmq
+
+from support_pyro.support_pyro4.pubsub_benchmark import run_case
+
+
+class TestPubSubBenchmark(unittest.TestCase):
+
+    def test_run_case(self):
+        result = run_case(transport="inproc", payload_size=100, rate=200,
+                          serializer="json", subscribers=2, duration=0.2)
+        self.assertTrue(result["sent"] > 0)
+        self.assertTrue(result["received"] == 2 * result["sent"])
+        self.assertTrue(result["latency_p99"] >= result["latency_p50"] > 0)
+
+    @unittest.skipUnless(zmq.has("ipc"), "ipc isn't supported")
+    def test_ipc_cleanup(self):
+        pattern = os.path.join(tempfile.gettempdir(), "support_pyro_pubsub_benchmark_*")
+        before = set(glob.glob(pattern))
+        result = run_case(transport="ipc", payload_size=100, rate=200,
+                          duration=0.1)
+        self.assertTrue(result["received"] == result["sent"])
+        self.assertTrue(set(glob.glob(pattern)) == before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,260 @@
+import unittest
+import struct
+import time
+
+import serpent
+
+from support_pyro.support_pyro4.pubsub_util import (
+    pack_message,
+    unpack_message,
+    make_batch,
+    batch_samples,
+    SampleBatcher,
+    LastValueCache,
+    DeltaEncoder,
+    DeltaDecoder,
+    SequenceTracker,
+    SubscriptionTracker,
+    RateController,
+    pack_drop_report,
+    unpack_drop_report,
+    make_endpoints,
+    resolve_address,
+    MessageHeader,
+    unpack_header,
+    HEADER_FORMAT,
+    HEADER_VERSION,
+    FLAG_BATCH,
+    FLAG_DELTA
+)
+
+
+class TestFraming(unittest.TestCase):
+
+    def test_serialized(self):
+        data = {"something random": 0.5}
+        frames = pack_message("topic", data, serpent)
+        self.assertTrue(len(frames) == 3)
+        self.assertTrue(frames[0] == b"topic")
+        topic, header, res = unpack_message(frames, serpent)
+        self.assertTrue(topic == b"topic")
+        self.assertTrue(header.flags == 0)
+        self.assertTrue(res == data)
+
+    def test_raw(self):
+        data = bytearray(b"\x00\x01\x02")
+        frames = pack_message(b"topic", data, "numpy")
+        self.assertTrue(frames[2] is data)
+        topic, header, res = unpack_message(frames, "numpy")
+        self.assertTrue(isinstance(res, memoryview))
+        self.assertTrue(res.tobytes() == bytes(data))
+
+    def test_raw_unsupported(self):
+        # serializers that don't handle buffers encode them themselves
+        data = b"\x00\x01\x02"
+        frames = pack_message(b"topic", data, "marshal")
+        topic, header, res = unpack_message(frames, "marshal")
+        self.assertTrue(header.flags == 0)
+        self.assertTrue(res == data)
+
+    def test_header(self):
+        frames = pack_message("topic", 1, serpent, seq=5, timestamp=2.5)
+        header = unpack_header(frames[1])
+        self.assertTrue((header.seq, header.timestamp) == (5, 2.5))
+        self.assertTrue(header.version == HEADER_VERSION)
+        self.assertRaises(ValueError, unpack_header,
+                          struct.pack(HEADER_FORMAT, 2, 0, 0, 0.0, 0))
+
+
+class TestBatching(unittest.TestCase):
+
+    def test_columnar(self):
+        samples = [{"a": i, "b": 2*i} for i in range(5)]
+        batch = make_batch(samples)
+        self.assertTrue(batch["n"] == 5)
+        self.assertTrue(batch["columns"]["b"] == [0, 2, 4, 6, 8])
+        self.assertTrue(batch_samples(batch) == samples)
+
+    def test_rows(self):
+        samples = [{"a": 1}, {"b": 2}, 3]
+        batch = make_batch(samples)
+        self.assertTrue("rows" in batch)
+        self.assertTrue(batch_samples(batch) == samples)
+
+    def test_batch_size(self):
+        batcher = SampleBatcher(batch_size=3)
+        self.assertTrue(batcher.add(1) is None)
+        self.assertTrue(batcher.add(2) is None)
+        batch = batcher.add(3)
+        self.assertTrue(batch_samples(batch) == [1, 2, 3])
+        self.assertTrue(len(batcher) == 0)
+        self.assertTrue(batcher.flush() is None)
+
+    def test_batch_interval(self):
+        batcher = SampleBatcher(batch_interval=0.05)
+        self.assertTrue(batcher.add(1) is None)
+        time.sleep(0.06)
+        self.assertTrue(batch_samples(batcher.add(2)) == [1, 2])
+
+    def test_batch_message(self):
+        batch = make_batch([{"a": 1}, {"a": 2}])
+        frames = pack_message("topic", batch, serpent, flags=FLAG_BATCH)
+        topic, header, res = unpack_message(frames, serpent)
+        self.assertTrue(header.flags & FLAG_BATCH)
+        self.assertTrue(batch_samples(res) == [{"a": 1}, {"a": 2}])
+
+
+class TestLastValueCache(unittest.TestCase):
+
+    def test_snapshot(self):
+        cache = LastValueCache()
+        cache.update("a", 1)
+        cache.update(b"a", 2)
+        cache.update("b", bytearray(b"\x00\x01"))
+        self.assertTrue(len(cache) == 2)
+        self.assertTrue(cache.get("a") == 2)
+        snapshot = cache.snapshot()
+        self.assertTrue(snapshot == {"a": 2, "b": b"\x00\x01"})
+        self.assertTrue(isinstance(snapshot["b"], bytes))
+        cache.clear()
+        self.assertTrue(cache.snapshot() == {})
+
+
+class TestDelta(unittest.TestCase):
+
+    def test_round_trip(self):
+        encoder = DeltaEncoder(keyframe_interval=3)
+        decoder = DeltaDecoder()
+        samples = [{"a": i, "b": 0, "c": i % 2} for i in range(7)]
+        samples[4] = {"a": 4, "b": 0}
+        payloads = []
+        for sample in samples:
+            payload, flags = encoder.encode(sample)
+            self.assertTrue(flags == FLAG_DELTA)
+            payloads.append(payload)
+            self.assertTrue(decoder.decode(b"topic", payload) == sample)
+        self.assertTrue("full" in payloads[0] and "full" in payloads[3])
+        self.assertTrue(payloads[1]["set"] == {"a": 1, "c": 1})
+        self.assertTrue(payloads[4]["del"] == ["c"])
+
+    def test_missed_keyframe(self):
+        encoder = DeltaEncoder(keyframe_interval=3)
+        decoder = DeltaDecoder()
+        payloads = [encoder.encode({"a": i})[0] for i in range(4)]
+        self.assertTrue(decoder.decode(b"topic", payloads[1]) is None)
+        # deltas are against the keyframe, so they can be skipped
+        decoder.decode(b"topic", payloads[0])
+        self.assertTrue(decoder.decode(b"topic", payloads[2]) == {"a": 2})
+
+    def test_force_keyframe(self):
+        encoder = DeltaEncoder(keyframe_interval=100)
+        payloads = [encoder.encode({"a": i})[0] for i in range(2)]
+        encoder.force_keyframe()
+        payloads.append(encoder.encode({"a": 2})[0])
+        self.assertTrue([("full" in payload) for payload in payloads] ==
+                        [True, False, True])
+        self.assertTrue(payloads[2]["key"] != payloads[1]["key"])
+
+    def test_not_dict(self):
+        encoder = DeltaEncoder()
+        self.assertTrue(encoder.encode([1, 2]) == ([1, 2], 0))
+
+
+class TestSequenceTracker(unittest.TestCase):
+
+    def track(self, tracker, seqs):
+        for seq in seqs:
+            tracker.track(b"topic", MessageHeader(1, 0, seq, 1.0, 0), now=1.5)
+
+    def test_gaps(self):
+        tracker = SequenceTracker()
+        self.track(tracker, [3, 4, 7, 8, 6, 10, 1, 2])
+        stats = tracker.as_dict()["topic"]
+        self.assertTrue(stats["received"] == 8)
+        self.assertTrue(stats["gaps"] == 2)
+        self.assertTrue(stats["missing"] == 2)
+        self.assertTrue(stats["reordered"] == 1)
+        self.assertTrue(stats["restarts"] == 1)
+        self.assertTrue(stats["last_seq"] == 2)
+        self.assertTrue(stats["latency"]["p50"] == 0.5)
+
+    def test_missing(self):
+        tracker = SequenceTracker()
+        missing = [tracker.track(b"topic", MessageHeader(1, 0, seq, 1.0, 0))
+                   for seq in (1, 2, 5, 4)]
+        self.assertTrue(missing == [0, 0, 2, 0])
+
+    def test_unnumbered(self):
+        tracker = SequenceTracker()
+        self.track(tracker, [0, 0])
+        stats = tracker.as_dict()["topic"]
+        self.assertTrue(stats["received"] == 2)
+        self.assertTrue("latency" not in stats)
+
+
+class TestSubscriptionTracker(unittest.TestCase):
+
+    def test_counts(self):
+        tracker = SubscriptionTracker()
+        self.assertTrue(tracker.update(b"\x01temp") == (b"temp", 0, 1))
+        tracker.update(b"\x01temp")
+        tracker.update(b"\x01")
+        self.assertTrue(tracker.subscribers(b"temperature") == 3)
+        self.assertTrue(tracker.subscribers(b"pressure") == 1)
+        self.assertTrue(tracker.update(b"data") is None)
+        tracker.update(b"\x00temp")
+        tracker.update(b"\x00temp")
+        tracker.update(b"\x00temp")
+        self.assertTrue(tracker.as_dict() == {"": 1})
+
+    def test_drop_report(self):
+        report = pack_drop_report("temp", 3)
+        self.assertTrue(unpack_drop_report(report) == (b"temp", 3))
+        self.assertTrue(unpack_drop_report(b"\x01temp") is None)
+        self.assertTrue(SubscriptionTracker().update(report) is None)
+
+
+class TestRateController(unittest.TestCase):
+
+    def test_backoff(self):
+        controller = RateController(max_slowdown=4.0, recovery=0.5, interval=1.0)
+        controller.update(now=0.0)
+        self.assertTrue(controller.update(dropped=1, now=0.5) == 1.0)
+        self.assertTrue(controller.update(now=1.0) == 2.0)
+        self.assertTrue(controller.effective_rate == 3.0)
+        controller.update(lag=0.9, now=2.0)
+        self.assertTrue(controller.update(dropped=1, now=3.0) == 4.0)
+        self.assertTrue(controller.update(now=4.0) == 2.0)
+        self.assertTrue(controller.update(now=5.0) == 1.0)
+        self.assertTrue(controller.update(now=6.0) == 1.0)
+
+    def test_decimate(self):
+        controller = RateController(mode="decimate")
+        controller.slowdown = 3.0
+        skipped = [controller.skip() for i in range(6)]
+        self.assertTrue(skipped == [True, True, False] * 2)
+        self.assertFalse(RateController().skip())
+
+
+class TestEndpoints(unittest.TestCase):
+
+    def test_resolve(self):
+        endpoints = make_endpoints(port=50000, name="test")
+        addresses = endpoints["addresses"]
+        self.assertTrue(addresses["tcp"] == "tcp://*:50000")
+        self.assertTrue(resolve_address(endpoints) == addresses["inproc"])
+        endpoints["pid"] = -1
+        if "ipc" in addresses:
+            self.assertTrue(resolve_address(endpoints) == addresses["ipc"])
+        endpoints["host"] = "elsewhere"
+        self.assertTrue(resolve_address(endpoints) == "tcp://localhost:50000")
+        endpoints = make_endpoints(transports=("inproc",))
+        endpoints["pid"] = -1
+        with self.assertRaises(ValueError):
+            resolve_address(endpoints)
+        with self.assertRaises(ValueError):
+            make_endpoints(transports=("tcp",))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+import itertools
+import shutil
+import tempfile
+import time
+
+from support_pyro.support_pyro4.pyro4_publisher import Pyro4PublisherServer
+from support_pyro.support_pyro4.serializers import RecordSchema, SchemaSerializer
+
+_names = itertools.count()
+
+
+class CountingPublisher(Pyro4PublisherServer):
+
+    def __init__(self, *args, **kwargs):
+        super(CountingPublisher, self).__init__(*args, **kwargs)
+        self._count = itertools.count()
+
+    def get_publisher_data(self):
+        return next(self._count)
+
+
+class RecordPublisher(CountingPublisher):
+
+    def get_publisher_data(self):
+        return {"count": super(RecordPublisher, self).get_publisher_data()}
+
+
+def wait_for(condition, timeout=2.0):
+    t0 = time.time()
+    while not condition() and time.time() - t0 < timeout:
+        time.sleep(0.005)
+    return condition()
+
+
+class TestPyro4PublisherServer(unittest.TestCase):
+
+    def setUp(self):
+        self.publisher = CountingPublisher(
+            name="CountingPublisher{}".format(next(_names)))
+        self.publisher.create_zmq_context(transports=("inproc",))
+
+    def tearDown(self):
+        self.publisher.stop_publishing()
+
+    def test_init(self):
+        publisher = CountingPublisher()
+        self.assertTrue(publisher.name == "CountingPublisher")
+        self.assertTrue(publisher.publisher_stats() is None)
+        self.assertTrue(publisher.publisher_schema() is None)
+
+    def test_publisher_stats(self):
+        self.publisher.start_publishing(0.002)
+        self.assertTrue(self.publisher.publisher_thread is not None)
+        stats = self.publisher.publisher_stats()
+        self.assertTrue(set(stats.keys()) == set(
+            ["schedule", "messages", "fanout", "subscribers", "idle", "rate"]))
+        self.assertTrue(stats["fanout"] is None)
+        self.assertTrue(isinstance(stats["messages"], dict))
+
+    def test_report_drops(self):
+        self.publisher.start_publishing(0.002)
+        self.assertTrue(wait_for(
+            lambda: "" in self.publisher.publisher_stats()["messages"]))
+        self.publisher.report_drops(3)
+        messages = self.publisher.publisher_stats()["messages"]
+        self.assertTrue(messages[""]["dropped"] == 3)
+
+    def test_publisher_snapshot(self):
+        self.assertTrue(self.publisher.publisher_snapshot() == {})
+        self.publisher.start_publishing(0.002)
+        self.assertTrue(wait_for(
+            lambda: "" in self.publisher.publisher_snapshot()))
+        self.assertTrue(isinstance(self.publisher.publisher_snapshot()[""], int))
+
+    def test_replay(self):
+        self.assertRaises(RuntimeError, self.publisher.replay)
+        directory = tempfile.mkdtemp()
+        log = self.publisher.create_replay_log(directory, segment_size=1024*1024)
+        try:
+            self.publisher.start_publishing(0.002)
+            self.assertTrue(wait_for(lambda: log.first_seq() is not None and
+                                     log.last_seq() - log.first_seq() >= 5))
+            records = [record for chunk in self.publisher.replay(chunk_size=2)
+                       for record in chunk]
+            self.assertTrue(len(records) >= 5)
+            self.assertTrue(set(records[0].keys()) == set(["seq", "time", "data"]))
+            seqs = [record["seq"] for record in records]
+            self.assertTrue(seqs == list(range(seqs[0], seqs[0] + len(seqs))))
+            data = [record["data"] for record in records]
+            self.assertTrue(data == list(range(data[0], data[0] + len(data))))
+            tail = [record for chunk in self.publisher.replay(from_seq=seqs[2])
+                    for record in chunk]
+            self.assertTrue(tail[0]["seq"] == seqs[2])
+        finally:
+            self.publisher.stop_publishing()
+            log.close()
+            shutil.rmtree(directory)
+
+    def test_publisher_schema(self):
+        publisher = RecordPublisher(name="RecordPublisher{}".format(next(_names)))
+        publisher.create_zmq_context(transports=("inproc",))
+        schema = publisher.register_schema([("count", "q")])
+        self.assertTrue(publisher.publisher_schema() == RecordSchema([("count", "q")]).as_dict())
+        try:
+            publisher.start_publishing(0.002)
+            self.assertTrue(isinstance(publisher.publisher_thread.serializer, SchemaSerializer))
+            self.assertTrue(publisher.publisher_thread.serializer.schema is schema)
+        finally:
+            publisher.stop_publishing()
+
+
+if __name__ == "__main__":
+    unittest.main()
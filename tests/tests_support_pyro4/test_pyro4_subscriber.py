@@ -0,0 +1,149 @@
+import unittest
+import itertools
+import shutil
+import tempfile
+import threading
+import time
+
+import Pyro5.api
+
+from support_pyro.support_pyro4.pyro4_publisher import Pyro4PublisherServer
+from support_pyro.support_pyro4.pyro4_subscriber import Pyro4Subscriber
+from support_pyro.support_pyro4.serializers import SchemaSerializer
+
+_names = itertools.count()
+
+
+class CountingPublisher(Pyro4PublisherServer):
+
+    def __init__(self, *args, **kwargs):
+        super(CountingPublisher, self).__init__(*args, **kwargs)
+        self._count = itertools.count()
+
+    def get_publisher_data(self):
+        return next(self._count)
+
+
+class RecordPublisher(CountingPublisher):
+
+    def get_publisher_data(self):
+        return {"count": super(RecordPublisher, self).get_publisher_data()}
+
+
+class CollectingSubscriber(Pyro4Subscriber):
+
+    def __init__(self, *args, **kwargs):
+        super(CollectingSubscriber, self).__init__(*args, **kwargs)
+        self.received = []
+
+    def consume(self, data):
+        self.received.append(data)
+
+
+class Tunnel(object):
+    """
+    Stands in for a trifeni tunnel, handing out proxies to objects on a
+    local daemon.
+    """
+    def __init__(self, daemon):
+        self.daemon = daemon
+        self.uris = {}
+
+    def register(self, obj, name):
+        self.uris[name] = self.daemon.register(obj, objectId=name)
+
+    def get_remote_object(self, name, auto=False):
+        return Pyro5.api.Proxy(self.uris[name])
+
+
+def wait_for(condition, timeout=2.0):
+    t0 = time.time()
+    while not condition() and time.time() - t0 < timeout:
+        time.sleep(0.005)
+    return condition()
+
+
+class TestPyro4Subscriber(unittest.TestCase):
+
+    def setUp(self):
+        self.name = "CountingPublisher{}".format(next(_names))
+        self.publisher = CountingPublisher(name=self.name)
+        self.publisher.create_zmq_context(transports=("inproc",))
+        self.daemon = Pyro5.api.Daemon(host="localhost")
+        self.tunnel = Tunnel(self.daemon)
+        self.tunnel.register(self.publisher, self.name)
+        self.daemon_thread = threading.Thread(target=self.daemon.requestLoop)
+        self.daemon_thread.daemon = True
+        self.daemon_thread.start()
+        self.subscriber = CollectingSubscriber(self.tunnel, self.name)
+
+    def tearDown(self):
+        self.subscriber.stop_subscribing()
+        self.subscriber.server._pyroRelease()
+        self.publisher.stop_publishing()
+        self.daemon.shutdown()
+        self.daemon_thread.join()
+
+    def test_start_subscribing(self):
+        self.publisher.start_publishing(0.002)
+        self.subscriber.start_subscribing(snapshot=False)
+        self.assertTrue(self.subscriber.subscriber_address.startswith("inproc://"))
+        self.assertTrue(wait_for(lambda: len(self.subscriber.received) > 3))
+        received = list(self.subscriber.received)
+        self.assertTrue(received == sorted(received))
+
+    def test_consume_snapshot(self):
+        self.assertTrue(self.subscriber.consume_snapshot() == 0)
+        self.publisher.start_publishing(0.002)
+        self.assertTrue(wait_for(
+            lambda: "" in self.publisher.publisher_snapshot()))
+        self.assertTrue(self.subscriber.consume_snapshot() == 1)
+        self.assertTrue(len(self.subscriber.received) == 1)
+        self.assertTrue(isinstance(self.subscriber.received[0], int))
+
+    def test_catch_up(self):
+        directory = tempfile.mkdtemp()
+        log = self.publisher.create_replay_log(directory, segment_size=1024*1024)
+        try:
+            self.publisher.start_publishing(0.002)
+            self.assertTrue(wait_for(lambda: log.first_seq() is not None and
+                                     log.last_seq() - log.first_seq() >= 5))
+            publisher_thread = self.publisher.publisher_thread
+            self.publisher.stop_publishing()
+            publisher_thread.join()
+            last_seq = self.subscriber.catch_up()
+            self.assertTrue(last_seq == log.last_seq())
+            received = self.subscriber.received
+            self.assertTrue(received == list(range(received[0], received[0] + len(received))))
+            del received[:]
+            self.assertTrue(self.subscriber.catch_up(from_seq=last_seq) == last_seq)
+            self.assertTrue(len(received) == 1)
+        finally:
+            log.close()
+            shutil.rmtree(directory)
+
+    def test_publisher_serializer(self):
+        self.assertTrue(self.subscriber.publisher_serializer().name == "serpent")
+        name = "RecordPublisher{}".format(next(_names))
+        publisher = RecordPublisher(name=name)
+        publisher.create_zmq_context(transports=("inproc",))
+        publisher.register_schema([("count", "q")])
+        self.tunnel.register(publisher, name)
+        subscriber = CollectingSubscriber(self.tunnel, name)
+        try:
+            serializer = subscriber.publisher_serializer()
+            self.assertTrue(isinstance(serializer, SchemaSerializer))
+            self.assertTrue(serializer.schema.as_dict() == publisher.schema.as_dict())
+            publisher.start_publishing(0.002)
+            subscriber.start_subscribing(snapshot=False)
+            self.assertTrue(wait_for(lambda: len(subscriber.received) > 3))
+            counts = [data["count"] for data in subscriber.received]
+            self.assertTrue(counts == sorted(counts))
+        finally:
+            subscriber.stop_subscribing()
+            subscriber.server._pyroRelease()
+            publisher.stop_publishing()
+
+
+if __name__ == "__main__":
+    unittest.main()
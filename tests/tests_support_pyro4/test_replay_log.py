@@ -0,0 +1,67 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from support_pyro.support_pyro4.replay_log import ReplayLog
+
+
+class TestReplayLog(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.log = ReplayLog(self.directory, segment_size=256)
+
+    def tearDown(self):
+        self.log.close()
+        shutil.rmtree(self.directory)
+
+    def append(self, n):
+        for i in range(n):
+            self.log.append(str(i).encode(), timestamp=float(i))
+
+    def test_read(self):
+        self.append(50)
+        self.assertTrue(len(os.listdir(self.directory)) > 1)
+        records = list(self.log.read())
+        self.assertTrue([r[0] for r in records] == list(range(1, 51)))
+        self.assertTrue(records[10][3] == b"10")
+        records = list(self.log.read(from_seq=20, max_records=5))
+        self.assertTrue([r[0] for r in records] == list(range(20, 25)))
+
+    def test_from_time(self):
+        self.append(50)
+        self.assertTrue(self.log.seq_at(30.0) == 31)
+        self.assertTrue(self.log.seq_at(29.5) == 31)
+        self.assertTrue(self.log.seq_at(100.0) == 51)
+        records = list(self.log.read(from_time=48.0))
+        self.assertTrue([r[3] for r in records] == [b"48", b"49"])
+
+    def test_max_segments(self):
+        self.log.max_segments = 2
+        self.append(50)
+        self.assertTrue(len(os.listdir(self.directory)) == 2)
+        first_seq = self.log.first_seq()
+        self.assertTrue(first_seq > 1)
+        self.assertTrue(self.log.get(1)[0] == first_seq)
+
+    def test_seq(self):
+        for seq in (5, 6, 10):
+            self.assertTrue(self.log.append(str(seq).encode(), seq=seq) == seq)
+        self.assertTrue([r[0] for r in self.log.read()] == [5, 6, 10])
+        self.assertTrue(self.log.get(8)[3] == b"10")
+        self.assertTrue(self.log.append(b"next") == 11)
+        self.assertRaises(ValueError, self.log.append, b"old", seq=11)
+
+    def test_reopen(self):
+        self.append(20)
+        self.log.close()
+        self.log = ReplayLog(self.directory, segment_size=256)
+        self.assertTrue(self.log.last_seq() == 20)
+        self.assertTrue(self.log.append(b"more") == 21)
+        self.assertTrue(self.log.get(21)[3] == b"more")
+        self.assertTrue(self.log.get(5)[3] == b"4")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+
+import numpy
+import serpent
+
+from support_pyro.support_pyro4.serializers import (
+    Serializer,
+    PickleSerializer,
+    RecordSchema,
+    SchemaSerializer,
+    register_serializer,
+    get_serializer,
+    serializer_names
+)
+from support_pyro.support_pyro4.pubsub_util import (
+    pack_message,
+    unpack_message,
+    make_batch,
+    batch_samples,
+    FLAG_BATCH
+)
+
+
+class Reversed(Serializer):
+    name = "reversed"
+    codec_id = 200
+
+    def dumps(self, data):
+        return data[::-1].encode("utf-8")
+
+    def loads(self, payload):
+        return bytes(payload).decode("utf-8")[::-1]
+
+
+class TestSerializers(unittest.TestCase):
+
+    def test_round_trip(self):
+        data = {"a": [1, 2.5, "three"]}
+        for name in ("serpent", "json", "marshal", "pickle"):
+            serializer = get_serializer(name)
+            self.assertTrue(serializer.loads(serializer.dumps(data)) == data)
+            frames = serializer.dumps_frames(data)
+            self.assertTrue(serializer.loads_frames(frames) == data)
+
+    def test_lookup(self):
+        self.assertTrue(get_serializer("json") is get_serializer(2))
+        self.assertTrue(get_serializer(serpent).name == "serpent")
+        self.assertTrue("marshal" in serializer_names())
+        with self.assertRaises(ValueError):
+            get_serializer("nope")
+
+    def test_numpy(self):
+        serializer = get_serializer("numpy")
+        data = numpy.arange(12, dtype="f4").reshape(3, 4)
+        frames = serializer.dumps_frames(data)
+        self.assertTrue(len(frames) == 2)
+        res = serializer.loads_frames([memoryview(frame) for frame in frames])
+        self.assertTrue(res.dtype == data.dtype and res.shape == (3, 4))
+        self.assertTrue((res == data).all())
+        self.assertTrue((serializer.loads(serializer.dumps(data)) == data).all())
+        with self.assertRaises(TypeError):
+            serializer.dumps([1, 2])
+
+    def test_numpy_batch(self):
+        samples = [numpy.arange(4, dtype="f4") + i for i in range(3)]
+        frames = pack_message("topic", make_batch(samples), "numpy",
+                              flags=FLAG_BATCH)
+        topic, header, batch = unpack_message(frames, "numpy")
+        self.assertTrue(batch["n"] == 3)
+        res = batch_samples(batch)
+        self.assertTrue(all((res[i] == samples[i]).all() for i in range(3)))
+        serializer = get_serializer("numpy")
+        batch = serializer.loads_batch_frames(
+            [serializer.dumps_batch(make_batch(samples))])
+        self.assertTrue((batch["rows"] == numpy.stack(samples)).all())
+        with self.assertRaises(TypeError):
+            pack_message("topic", make_batch([{"a": 1}]), "numpy",
+                         flags=FLAG_BATCH)
+
+    @unittest.skipUnless(PickleSerializer.supports_buffers, "needs pickle protocol 5")
+    def test_pickle_out_of_band(self):
+        serializer = get_serializer("pickle")
+        data = {"array": numpy.arange(1000)}
+        frames = serializer.dumps_frames(data)
+        self.assertTrue(len(frames) == 2)
+        res = serializer.loads_frames(frames)
+        self.assertTrue((res["array"] == data["array"]).all())
+
+    def test_register(self):
+        register_serializer(Reversed())
+        frames = pack_message("topic", "hello", "reversed")
+        topic, header, res = unpack_message(frames, "serpent")
+        self.assertTrue(header.codec == 200)
+        self.assertTrue(res == "hello")
+        other = Reversed()
+        other.name = "other"
+        with self.assertRaises(ValueError):
+            register_serializer(other)
+
+    def test_unsafe(self):
+        frames = pack_message("topic", {"a": 1}, "pickle")
+        with self.assertRaises(ValueError):
+            unpack_message(frames, "serpent")
+        topic, header, res = unpack_message(frames, "pickle")
+        self.assertTrue(res == {"a": 1})
+
+
+class TestSchemaSerializer(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = RecordSchema([("time", "d"), ("temperature", "f"),
+                                    ("status", "B")])
+        self.serializer = SchemaSerializer(self.schema)
+
+    def test_sample(self):
+        sample = {"time": 1.5, "temperature": 20.5, "status": 3}
+        payload = self.serializer.dumps(sample)
+        self.assertTrue(len(payload) == self.schema.size == 13)
+        self.assertTrue(len(payload) * 5 < len(get_serializer("serpent").dumps(sample)))
+        frames = pack_message("topic", sample, self.serializer)
+        topic, header, res = unpack_message(frames, self.serializer)
+        self.assertTrue(header.codec == SchemaSerializer.codec_id)
+        self.assertTrue(res == sample)
+        with self.assertRaises(ValueError):
+            unpack_message(frames, "serpent")
+
+    def test_batch(self):
+        samples = [{"time": float(i), "temperature": 20.0, "status": i}
+                   for i in range(10)]
+        frames = pack_message("topic", make_batch(samples), self.serializer,
+                              flags=FLAG_BATCH)
+        self.assertTrue(len(frames[2]) == 10 * self.schema.size)
+        topic, header, batch = unpack_message(frames, self.serializer)
+        self.assertTrue(batch["n"] == 10)
+        self.assertTrue((batch["columns"]["status"] == numpy.arange(10)).all())
+        self.assertTrue(batch_samples(batch)[4] == samples[4])
+
+    def test_schema(self):
+        schema = RecordSchema.from_dict(self.schema.as_dict())
+        self.assertTrue(schema == self.schema)
+        self.assertTrue(SchemaSerializer(self.schema.as_dict()).schema == self.schema)
+        with self.assertRaises(ValueError):
+            RecordSchema([("name", "s")])
+
+
+if __name__ == "__main__":
+    unittest.main()
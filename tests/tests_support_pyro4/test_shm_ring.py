@@ -0,0 +1,50 @@
+import unittest
+import os
+
+from support_pyro.support_pyro4.shm_ring import (
+    ShmRingWriter,
+    ShmRingReader,
+    shm_path
+)
+
+
+class TestShmRing(unittest.TestCase):
+
+    def setUp(self):
+        self.writer = ShmRingWriter(shm_path(), record_size=16, capacity=4)
+        self.reader = ShmRingReader(self.writer.path)
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+
+    def test_read(self):
+        self.assertTrue(self.reader.read() is None)
+        self.writer.write(b"hello", flags=1)
+        self.writer.write(bytearray(b"world"))
+        seq, flags, res = self.reader.read()
+        self.assertTrue((seq, flags, res.tobytes()) == (1, 1, b"hello"))
+        self.assertTrue(self.reader.valid(seq))
+        seq, flags, res = self.reader.read()
+        self.assertTrue((seq, flags, res.tobytes()) == (2, 0, b"world"))
+        self.assertTrue(self.reader.read() is None)
+
+    def test_overrun(self):
+        for i in range(6):
+            self.writer.write(str(i).encode())
+        self.assertFalse(self.reader.valid(1))
+        seq, flags, res = self.reader.read()
+        self.assertTrue(seq == 3 and res.tobytes() == b"2")
+        self.assertTrue(self.reader.overruns == 2)
+
+    def test_too_large(self):
+        with self.assertRaises(ValueError):
+            self.writer.write(b"x" * 17)
+
+    def test_unlink(self):
+        self.writer.close()
+        self.assertFalse(os.path.exists(self.writer.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+
+import zmq
+
+from support_pyro.support_pyro4.stream_recorder import (
+    StreamRecorder,
+    StreamReplayer,
+    read_recording
+)
+from support_pyro.support_pyro4.pubsub_util import (
+    pack_message,
+    unpack_message,
+    send_frames,
+    recv_frames
+)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+class TestStreamRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "stream.rec")
+        self.context = zmq.Context.instance()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, n):
+        publisher = self.context.socket(zmq.PUB)
+        publisher.bind("inproc://test_stream_recorder_pub")
+        recorder = StreamRecorder("inproc://test_stream_recorder_pub", self.path,
+                                  context=self.context, max_messages=n)
+        recorder.start()
+        # PUB drops everything until the subscription has propagated
+        time.sleep(0.1)
+        for i in range(n):
+            send_frames(publisher, pack_message("topic{}".format(i % 2), {"i": i},
+                                                "serpent", seq=i + 1))
+            time.sleep(0.01)
+        recorder.join(2.0)
+        publisher.close()
+        return recorder
+
+    def test_record(self):
+        recorder = self.record(10)
+        self.assertFalse(recorder.is_alive())
+        self.assertTrue(recorder.message_stats()["topic0"]["messages"] == 5)
+        records = list(read_recording(self.path))
+        self.assertTrue(len(records) == 10)
+        self.assertTrue(records[-1][0] - records[0][0] >= 0.09)
+        topic, header, data = unpack_message(records[3][1], "serpent")
+        self.assertTrue(topic == b"topic1" and header.seq == 4 and data == {"i": 3})
+
+    def test_replay(self):
+        self.record(10)
+        replayer = StreamReplayer(self.path, "inproc://test_stream_recorder_replay",
+                                  speed=None, context=self.context)
+        subscriber = self.context.socket(zmq.SUB)
+        subscriber.connect("inproc://test_stream_recorder_replay")
+        subscriber.setsockopt(zmq.SUBSCRIBE, b"")
+        replayer.start()
+        received = []
+        while len(received) < 10 and subscriber.poll(1000):
+            received.append(unpack_message(recv_frames(subscriber), "serpent"))
+        replayer.join(2.0)
+        subscriber.close()
+        self.assertTrue([data["i"] for topic, header, data in received] == list(range(10)))
+        self.assertTrue(replayer.rate_stats()["sent"] == 10)
+
+    def test_replay_subscriptions(self):
+        self.record(4)
+        address = "inproc://test_stream_recorder_replay_loop"
+        replayer = StreamReplayer(self.path, address, speed=10.0, loop=True,
+                                  context=self.context)
+        subscribers = []
+        try:
+            for i in range(2):
+                subscriber = self.context.socket(zmq.SUB)
+                subscriber.connect(address)
+                subscriber.setsockopt(zmq.SUBSCRIBE, "topic{}".format(i).encode())
+                subscribers.append(subscriber)
+                if i == 0:
+                    replayer.start()
+            self.assertTrue(wait_for(
+                lambda: replayer.subscriber_counts() == {"topic0": 1, "topic1": 1}))
+            for subscriber in subscribers:
+                self.assertTrue(subscriber.poll(2000))
+        finally:
+            replayer.stop_thread()
+            replayer.join(2.0)
+            for subscriber in subscribers:
+                subscriber.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,257 @@
+import unittest
+import itertools
+import time
+
+import zmq
+
+from support_pyro.support_pyro4.publisher_threads import ZmqPublisherThread
+from support_pyro.support_pyro4.subscriber_threads import (
+    ZmqSubscriberThread,
+    ShmSubscriberThread,
+    ZmqSubscriberHub
+)
+from support_pyro.support_pyro4.pubsub_util import pack_message, send_frames
+from support_pyro.support_pyro4.serializers import (
+    Serializer,
+    RecordSchema,
+    SchemaSerializer
+)
+from support_pyro.support_pyro4.shm_ring import ShmRingWriter, shm_path
+
+_ids = itertools.count()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def dropped(publisher, topic=""):
+    # topics only show up in message_stats once something was sent on them
+    return publisher.message_stats().get(topic, {}).get("dropped", 0)
+
+
+class Counter(object):
+
+    def __init__(self):
+        self.i = 0
+
+    def __call__(self):
+        self.i += 1
+        return {"i": self.i}
+
+
+class LappingSerializer(Serializer):
+    """
+    Has the writer lap the reader while the first record is being decoded.
+    """
+    name = "lapping"
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.lapped = False
+
+    def dumps(self, data):
+        return bytes(data)
+
+    def loads(self, payload):
+        if not self.lapped:
+            self.lapped = True
+            for i in range(self.writer.capacity):
+                self.writer.write(b"new")
+        return bytes(payload)
+
+
+class SubscriberTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.context = zmq.Context.instance()
+        self.threads = []
+
+    def tearDown(self):
+        for thread in self.threads:
+            thread.stop_thread()
+        for thread in self.threads:
+            thread.join(2.0)
+
+    def start(self, thread):
+        self.threads.append(thread)
+        thread.start()
+        return thread
+
+    def publish(self, topic="", **kwargs):
+        address = "inproc://test_subscriber_threads_{}".format(next(_ids))
+        self.start(ZmqPublisherThread(0.002, Counter(), self.context, address,
+                                      topic=topic, **kwargs))
+        return address
+
+    def send_undecodable(self, subscribe, received):
+        """
+        Bind a PUB socket, call subscribe with its address, then send a
+        message encoded with a serializer that isn't registered, followed by
+        a good one, until the good one is received.
+        """
+        address = "inproc://test_subscriber_threads_{}".format(next(_ids))
+        socket = self.context.socket(zmq.PUB)
+        socket.bind(address)
+        unregistered = SchemaSerializer(RecordSchema([("i", "q")]))
+
+        def send():
+            send_frames(socket, pack_message("", {"i": 1}, unregistered))
+            send_frames(socket, pack_message("", {"i": 2}, "serpent"))
+            return len(received) > 0
+
+        try:
+            subscriber = subscribe(address)
+            self.assertTrue(wait_for(send))
+        finally:
+            socket.close()
+        return subscriber
+
+
+class TestZmqSubscriberThread(SubscriberTestCase):
+
+    def test_consumer_pool(self):
+        received = []
+        address = self.publish()
+        subscriber = self.start(ZmqSubscriberThread(
+            received.append, self.context, address, queue_size=10))
+        self.assertTrue(wait_for(lambda: len(received) >= 5))
+        stats = subscriber.consumer_stats()
+        self.assertTrue(stats["tasks_done"] >= 5 and stats["lag"]["count"] >= 5)
+
+    def test_pause_consumer_pool(self):
+        received = []
+        address = self.publish()
+        subscriber = self.start(ZmqSubscriberThread(
+            received.append, self.context, address, queue_size=10))
+        self.assertTrue(wait_for(lambda: len(received) >= 3))
+        subscriber.pause_thread()
+        time.sleep(0.05)
+        count = len(received)
+        time.sleep(0.1)
+        self.assertTrue(len(received) == count)
+        subscriber.unpause_thread()
+        self.assertTrue(wait_for(lambda: len(received) > count))
+
+    def test_conflate(self):
+        received = []
+
+        def consume(data):
+            received.append(data)
+            time.sleep(0.02)
+
+        address = self.publish()
+        subscriber = self.start(ZmqSubscriberThread(
+            consume, self.context, address, conflate=True))
+        self.assertTrue(wait_for(
+            lambda: subscriber.message_stats().get("", {}).get("conflated", 0) > 0))
+        values = [sample["i"] for sample in received]
+        self.assertTrue(values == sorted(values))
+
+    def test_consume_cb_args(self):
+        received = []
+        address = self.publish()
+        self.start(ZmqSubscriberThread(
+            lambda data, name: received.append((name, data)), self.context,
+            address, consume_cb_args=("a",)))
+        self.assertTrue(wait_for(lambda: len(received) >= 1))
+        self.assertTrue(received[0][0] == "a")
+
+    def test_decode_error(self):
+        received = []
+        subscriber = self.send_undecodable(
+            lambda address: self.start(ZmqSubscriberThread(
+                received.append, self.context, address)),
+            received)
+        self.assertTrue(subscriber.is_alive())
+        self.assertTrue(received[0] == {"i": 2})
+        self.assertTrue(subscriber.message_stats()[""]["errors"] > 0)
+
+
+class TestShmSubscriberThread(SubscriberTestCase):
+
+    def test_torn(self):
+        writer = ShmRingWriter(shm_path(), record_size=64, capacity=4)
+        received = []
+        try:
+            subscriber = ShmSubscriberThread(received.append, writer.path,
+                                             serializer=LappingSerializer(writer))
+            writer.write(b"old")
+            self.start(subscriber)
+            self.assertTrue(wait_for(lambda: len(received) == writer.capacity))
+            self.assertTrue(received == [b"new"] * writer.capacity)
+            self.assertTrue(subscriber.message_stats()[""]["torn"] == 1)
+        finally:
+            writer.close()
+
+
+class TestZmqSubscriberHub(SubscriberTestCase):
+
+    def test_subscribe(self):
+        hub = self.start(ZmqSubscriberHub(context=self.context))
+        received = {"a": [], "b": []}
+        ids = dict((topic, hub.subscribe(self.publish(topic=topic),
+                                         received[topic].append, topic=topic))
+                   for topic in received)
+        for samples in received.values():
+            self.assertTrue(wait_for(lambda: len(samples) >= 3))
+        self.assertTrue(hub.message_stats()["a"]["received"] >= 3)
+        hub.unsubscribe(ids["a"])
+        self.assertTrue(wait_for(lambda: len(hub.subscriptions()) == 1))
+        time.sleep(0.05)
+        count = len(received["a"])
+        time.sleep(0.05)
+        self.assertTrue(len(received["a"]) == count)
+        self.assertTrue(len(received["b"]) > 3)
+
+    def test_sequence_stats(self):
+        # both publishers number their messages from 1, on the same topic
+        hub = self.start(ZmqSubscriberHub(context=self.context))
+        received = []
+        addresses = [self.publish() for i in range(2)]
+        for address in addresses:
+            hub.subscribe(address, received.append)
+        self.assertTrue(wait_for(lambda: len(received) >= 20))
+        stats = hub.sequence_stats()
+        self.assertTrue(sorted(stats) == sorted(addresses))
+        for address in addresses:
+            self.assertTrue(stats[address][""]["received"] > 0)
+            self.assertTrue(stats[address][""]["reordered"] == 0)
+            self.assertTrue(stats[address][""]["restarts"] == 0)
+
+    def test_report_drops(self):
+        hub = self.start(ZmqSubscriberHub(context=self.context, rcvhwm=1))
+        address = self.publish(sndhwm=1)
+        publisher = self.threads[-1]
+        hub.subscribe(address, lambda sample: time.sleep(0.01))
+        self.assertTrue(wait_for(
+            lambda: dropped(publisher) > 0, timeout=5.0))
+
+    def test_pause_subscription(self):
+        hub = self.start(ZmqSubscriberHub(context=self.context))
+        received = []
+        subscription = hub.subscribe(self.publish(), received.append)
+        self.assertTrue(wait_for(lambda: len(received) >= 3))
+        hub.pause_subscription(subscription)
+        time.sleep(0.02)
+        count = len(received)
+        time.sleep(0.05)
+        self.assertTrue(len(received) == count)
+        hub.unpause_subscription(subscription)
+        self.assertTrue(wait_for(lambda: len(received) > count))
+
+    def test_decode_error(self):
+        hub = self.start(ZmqSubscriberHub(context=self.context))
+        received = []
+        self.send_undecodable(
+            lambda address: hub.subscribe(address, received.append), received)
+        self.assertTrue(hub.is_alive())
+        self.assertTrue(received[0] == {"i": 2})
+        self.assertTrue(hub.message_stats()[""]["errors"] > 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
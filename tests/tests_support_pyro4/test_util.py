@@ -3,7 +3,22 @@ import unittest
 import time
 import threading
 
-from support.pyro.support_pyro.support_pyro4.util import CoopPausableThread
+from support.pyro.support_pyro.support_pyro4.util import (
+    CoopPausableThread,
+    CoopPausableScheduler,
+    FixedRateScheduler,
+    PausableThreadPool,
+    PausableProcess,
+    Pause
+)
+
+
+def sum_squares(n):
+    return sum(i**2 for i in range(n))
+
+
+def big_result(n):
+    return b"x" * n
 
 
 class TrackableGenerator(object):
@@ -12,7 +27,7 @@ class TrackableGenerator(object):
         self.idx = 0
 
     def __call__(self):
-        for i in xrange(10):
+        for i in range(10):
             time.sleep(0.1)
             self.idx = i
             yield i
@@ -30,6 +45,278 @@ class TestCoopPausableThread(unittest.TestCase):
         coop_thread.join()
         self.assertTrue(generator.idx == 4)
 
+    def test_pause(self):
+
+        generator = TrackableGenerator()
+        coop_thread = CoopPausableThread(target=generator)
+        coop_thread.start()
+        time.sleep(0.25)
+        with Pause(coop_thread):
+            idx = generator.idx
+            time.sleep(0.3)
+            self.assertTrue(generator.idx == idx)
+        coop_thread.stop()
+        coop_thread.join()
+
+    def test_pause_after_error(self):
+
+        def failing():
+            yield 0
+            raise RuntimeError("failed")
+
+        coop_thread = CoopPausableThread(target=failing)
+        coop_thread.start()
+        coop_thread.join(1.0)
+        self.assertFalse(coop_thread.running())
+        with Pause(coop_thread):
+            pass
+
+
+class TestCoopPausableScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = CoopPausableScheduler()
+        self.counts = {}
+
+    def tearDown(self):
+        self.scheduler.stop()
+        self.scheduler.join()
+
+    def counter(self, name, delay=None):
+        while True:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            time.sleep(0.001)
+            yield delay
+
+    def test_priority(self):
+        self.scheduler.add_task(self.counter, args=("low",), priority=1)
+        self.scheduler.add_task(self.counter, args=("high",), priority=4)
+        self.scheduler.start()
+        time.sleep(0.3)
+        with Pause(self.scheduler):
+            self.assertTrue(self.counts["high"] > 2*self.counts["low"])
+
+    def test_sleep(self):
+        self.scheduler.add_task(self.counter, args=("slow", 0.1), name="slow")
+        self.scheduler.add_task(self.counter, args=("fast",), name="fast")
+        self.scheduler.start()
+        time.sleep(0.35)
+        with Pause(self.scheduler):
+            self.assertTrue(self.counts["slow"] <= 4)
+            self.assertTrue(self.counts["fast"] > 10)
+            stats = self.scheduler.task_stats()
+            self.assertTrue(stats["fast"]["steps"] == self.counts["fast"])
+
+    def test_pause(self):
+        self.scheduler.add_task(self.counter, args=("task",))
+        self.scheduler.start()
+        time.sleep(0.05)
+        with Pause(self.scheduler):
+            count = self.counts["task"]
+            time.sleep(0.05)
+            self.assertTrue(self.counts["task"] == count)
+
+    def test_finished(self):
+        name = self.scheduler.add_task(lambda: (i for i in [None]*3))
+        self.scheduler.start()
+        time.sleep(0.05)
+        self.assertTrue(self.scheduler.task_stats()[name]["state"] == "done")
+
+    def test_failed(self):
+        def failing():
+            yield
+            raise RuntimeError("failed")
+        name = self.scheduler.add_task(failing)
+        self.scheduler.add_task(self.counter, args=("task",))
+        self.scheduler.start()
+        time.sleep(0.05)
+        self.assertTrue(self.scheduler.task_stats()[name]["state"] == "failed")
+        self.assertTrue(self.scheduler.is_alive())
+        count = self.counts["task"]
+        time.sleep(0.05)
+        self.assertTrue(self.counts["task"] > count)
+
+
+class TestFixedRateScheduler(unittest.TestCase):
+
+    def test_grid(self):
+        scheduler = FixedRateScheduler(0.05)
+        deadlines = []
+        for i in range(4):
+            scheduler.wait()
+            deadlines.append(scheduler.last_deadline)
+        for i in range(1, len(deadlines)):
+            self.assertAlmostEqual(deadlines[i] - deadlines[i-1], 0.05)
+
+    def test_skip(self):
+        scheduler = FixedRateScheduler(0.05, policy="skip")
+        scheduler.wait()
+        t0 = scheduler.last_deadline
+        time.sleep(0.13)
+        scheduler.wait()
+        stats = scheduler.stats()
+        self.assertTrue(stats["missed_deadlines"] == 1)
+        self.assertTrue(stats["skipped_ticks"] == 1)
+        scheduler.wait()
+        self.assertAlmostEqual(scheduler.last_deadline - t0, 0.15)
+
+    def test_catchup(self):
+        scheduler = FixedRateScheduler(0.05, policy="catchup")
+        scheduler.wait()
+        t0 = scheduler.last_deadline
+        time.sleep(0.13)
+        scheduler.wait()
+        scheduler.wait()
+        stats = scheduler.stats()
+        self.assertTrue(stats["skipped_ticks"] == 0)
+        self.assertTrue(stats["missed_deadlines"] == 1)
+        self.assertAlmostEqual(scheduler.last_deadline - t0, 0.10)
+
+    def test_stop_event(self):
+        scheduler = FixedRateScheduler(10.0)
+        stop_event = threading.Event()
+        scheduler.wait(stop_event)
+        stop_event.set()
+        self.assertFalse(scheduler.wait(stop_event))
+
+
+class TestPausableThreadPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = PausableThreadPool(3)
+        self.pool.start()
+
+    def tearDown(self):
+        self.pool.stop()
+        self.pool.join()
+
+    def test_submit(self):
+        futures = [self.pool.submit(lambda x: x**2, i) for i in range(10)]
+        self.assertTrue([f.result() for f in futures] ==
+                        [i**2 for i in range(10)])
+        self.assertTrue(self.pool.stats()["tasks_done"] == 10)
+
+    def test_pause(self):
+        with Pause(self.pool):
+            self.assertTrue(self.pool.paused())
+            future = self.pool.submit(lambda: "hello")
+            time.sleep(0.1)
+            self.assertFalse(future.done())
+            self.assertTrue(self.pool.queue_depth() == 1)
+        self.assertTrue(future.result(timeout=1.0) == "hello")
+
+    def test_submit_while_paused(self):
+        self.pool.pause()
+        futures = [self.pool.submit(lambda x: x**2, i) for i in range(20)]
+        time.sleep(0.2)
+        self.assertTrue(not any(f.done() for f in futures))
+        self.assertTrue(self.pool.stats()["tasks_done"] == 0)
+        self.pool.unpause()
+        self.assertTrue([f.result(timeout=1.0) for f in futures] ==
+                        [i**2 for i in range(20)])
+
+    def test_stop(self):
+        self.pool.pause()
+        future = self.pool.submit(lambda: "hello")
+        self.pool.stop()
+        self.pool.join()
+        self.assertTrue(future.cancelled())
+
+    def test_overflow(self):
+        for overflow, cancelled in (("drop_oldest", 0), ("drop_newest", 2)):
+            pool = PausableThreadPool(1, maxsize=2, overflow=overflow)
+            pool.start()
+            pool.pause()
+            futures = [pool.submit(lambda: "hello") for i in range(3)]
+            self.assertTrue(futures[cancelled].cancelled())
+            self.assertTrue(pool.stats()["dropped"] == 1)
+            pool.unpause()
+            self.assertTrue(futures[1].result(timeout=1.0) == "hello")
+            pool.stop()
+            pool.join()
+
+    def test_pause_requeue(self):
+        # a worker waiting on the queue when the pool is paused may pick up
+        # the next task; it should go back to the head of the queue.
+        for i in range(10):
+            order = []
+            pool = PausableThreadPool(1, maxsize=2, overflow="drop_oldest")
+            pool.start()
+            time.sleep(0.005)
+            pool.pause()
+            futures = [pool.submit(order.append, j) for j in range(3)]
+            time.sleep(0.02)
+            self.assertTrue(pool.queue_depth() == 2)
+            self.assertTrue(futures[0].cancelled())
+            self.assertTrue(pool.stats()["dropped"] == 1)
+            pool.unpause()
+            futures[2].result(timeout=1.0)
+            self.assertTrue(order == [1, 2])
+            pool.stop()
+            pool.join()
+
+
+class TestPausableProcess(unittest.TestCase):
+
+    def test_recv(self):
+        process = PausableProcess(target=sum_squares, args=(10,))
+        process.start()
+        self.assertTrue(process.recv(timeout=5.0) == 285)
+        process.stop()
+        process.join()
+
+    def test_pause(self):
+        process = PausableProcess(target=sum_squares, args=(10,))
+        process.start()
+        process.recv(timeout=5.0)
+        with Pause(process):
+            # a result computed before pausing may still be on its way
+            time.sleep(0.1)
+            process.drain()
+            time.sleep(0.1)
+            self.assertTrue(process.drain() == [])
+        process.stop()
+        process.join()
+
+    def test_result_cb(self):
+        results = []
+        process = PausableProcess(target=sum_squares, args=(10,),
+                                  result_cb=results.append)
+        process.start()
+        time.sleep(0.2)
+        process.stop()
+        process.join()
+        self.assertTrue(len(results) > 0)
+        self.assertTrue(all(res == 285 for res in results))
+
+    def test_join_unread(self):
+        # results too big for the pipe's buffer block the child in send
+        process = PausableProcess(target=big_result, args=(1 << 20,))
+        process.start()
+        time.sleep(0.2)
+        process.stop()
+        process.join(timeout=5.0)
+        self.assertFalse(process.is_alive())
+        self.assertTrue(process.recv(timeout=0.0) == b"x" * (1 << 20))
+
+    def test_pause_unread(self):
+        process = PausableProcess(target=big_result, args=(1 << 20,))
+        process.start()
+        time.sleep(0.2)
+
+        def pause():
+            with Pause(process):
+                pass
+
+        pauser = threading.Thread(target=pause)
+        pauser.daemon = True
+        pauser.start()
+        pauser.join(2.0)
+        self.assertFalse(pauser.is_alive())
+        process.stop()
+        process.join(timeout=5.0)
+        self.assertFalse(process.is_alive())
+
 
 if __name__ == "__main__":
     unittest.main()